@@ -7,10 +7,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 django_asgi_app = get_asgi_application()
 
+# Imported after Django is set up
+from core.routing import websocket_urlpatterns  # noqa: E402
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    # WebSocket support can be added here in future
-    # "websocket": AuthMiddlewareStack(
-    #     URLRouter([])
-    # ),
+    "websocket": AuthMiddlewareStack(
+        URLRouter(websocket_urlpatterns)
+    ),
 })
@@ -28,14 +28,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RequestProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -59,13 +62,215 @@ TEMPLATES = [
 WSGI_APPLICATION = 'app.wsgi.application'
 ASGI_APPLICATION = 'app.asgi.application'
 
-DATABASES = {
+# Serve the quiz draw, leaderboard, profile and challenge-status reads, plus
+# registration, from native async views (core/async_views.py).
+# Meant for the ASGI deployment; under WSGI each async view would pay for its
+# own event loop.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
+# Database configuration is env-driven. DATABASE_ENGINE=mysql uses the
+# DATABASE_* variables passed by docker-compose/k8s; anything else is SQLite.
+# Read replicas are optional: DATABASE_REPLICA_HOSTS (comma-separated) for
+# MySQL, or DATABASE_REPLICA_NAME as a second SQLite file standing in for a
+# replica locally (refresh it with `manage.py sync_sqlite_replica`).
+DATABASE_ENGINE = os.getenv('DATABASE_ENGINE', 'sqlite3')
+
+if DATABASE_ENGINE == 'mysql':
+    def _mysql_database(host):
+        return {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.getenv('DATABASE_NAME', 'quizdb'),
+            'USER': os.getenv('DATABASE_USER', 'quizuser'),
+            'PASSWORD': os.getenv('DATABASE_PASSWORD', ''),
+            'HOST': host,
+            'PORT': os.getenv('DATABASE_PORT', '3306'),
+            'CONN_MAX_AGE': int(os.getenv('DATABASE_CONN_MAX_AGE', '60')),
+            'OPTIONS': {'charset': 'utf8mb4'},
+        }
+
+    DATABASES = {'default': _mysql_database(os.getenv('DATABASE_HOST', 'localhost'))}
+    replica_hosts = [h.strip() for h in os.getenv('DATABASE_REPLICA_HOSTS', '').split(',') if h.strip()]
+    for index, host in enumerate(replica_hosts, start=1):
+        DATABASES[f'replica{index}'] = {**_mysql_database(host), 'TEST': {'MIRROR': 'default'}}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DATABASE_NAME', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+    if os.getenv('DATABASE_REPLICA_NAME'):
+        DATABASES['replica1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DATABASE_REPLICA_NAME'),
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Single-node SQLite mode: WAL + tuned pragmas on every connection, and
+# score/profile writes funnelled through one batching writer thread.
+SQLITE_TUNED = os.getenv('SQLITE_TUNED', 'True') == 'True'
+SQLITE_SINGLE_WRITER = SQLITE_TUNED and os.getenv('SQLITE_SINGLE_WRITER', 'True') == 'True'
+SQLITE_WRITE_TIMEOUT = float(os.getenv('SQLITE_WRITE_TIMEOUT', '10'))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,  # 64 MB
+    'mmap_size': 268435456,  # 256 MB
+    'temp_store': 'MEMORY',
+}
+for _alias in DATABASES.values():
+    if _alias['ENGINE'] == 'django.db.backends.sqlite3':
+        _alias.setdefault('OPTIONS', {})['timeout'] = 20
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# How long a user's reads stay on the primary after they write, and how long
+# ETag'd catalog and leaderboard reads do after a version bump (db_router.py)
+DATABASE_REPLICA_PIN_SECONDS = int(os.getenv('DATABASE_REPLICA_PIN_SECONDS', '10'))
+
+# Shared cache backs the catalog/leaderboard version counters used for ETags.
+# Every process must see the same counters and bump them atomically, so with
+# several workers or replicas this has to be Redis or memcached, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://redis:6379/0. LocMemCache is per process, and
+# FileBasedCache's incr() is a get+set that loses concurrent bumps.
+# gunicorn.conf.py refuses to fork more than one worker on anything else.
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'quiz-battle-arena'),
     }
 }
 
+# Prebuilt, gzipped question sets served by CategoryViewSet.questions.
+# Staleness is tracked through the catalog version counter in CACHES, so
+# multi-worker deployments need the shared cache backend configured above.
+CATALOG_SNAPSHOTS_ENABLED = os.getenv('CATALOG_SNAPSHOTS_ENABLED', 'True') == 'True'
+CATALOG_SNAPSHOT_DIR = os.getenv('CATALOG_SNAPSHOT_DIR', str(BASE_DIR / 'snapshots'))
+CATALOG_SNAPSHOT_REBUILD_DELAY = float(os.getenv('CATALOG_SNAPSHOT_REBUILD_DELAY', '2.0'))
+
+# Request metrics (Prometheus format at /api/metrics/). A sampled fraction of
+# requests also records SQL count/time, serializer time and N+1 suspects.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', '0.1'))
+METRICS_NPLUS1_THRESHOLD = int(os.getenv('METRICS_NPLUS1_THRESHOLD', '5'))
+# Bearer token required to scrape /api/metrics/ (open only with DEBUG when unset)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# On-demand profiling: signed X-Profile-Token header or admin toggle, plus an
+# optional baseline sample rate (statistical sampler, 0 disables).
+PROFILING_DIR = os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiles'))
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SAMPLE_INTERVAL = float(os.getenv('PROFILING_SAMPLE_INTERVAL', '0.005'))
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '200'))
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', '3600'))
+
+# Live leaderboard websocket (ws/leaderboard/): subscribers get the top N as
+# diffs, coalesced to at most one broadcast per tick.
+LIVE_LEADERBOARD_SIZE = int(os.getenv('LIVE_LEADERBOARD_SIZE', '10'))
+LIVE_LEADERBOARD_TICK = float(os.getenv('LIVE_LEADERBOARD_TICK', '1.0'))
+
+# Battle websocket: events sent to a room within one tick go out as one frame
+# (0 sends every event immediately). See core/battle_protocol.py.
+BATTLE_COALESCE_TICK = float(os.getenv('BATTLE_COALESCE_TICK', '0.02'))
+BATTLE_MAX_BATCH = int(os.getenv('BATTLE_MAX_BATCH', '64'))
+
+# Battle spectators (ws/battle/<room>/watch/, core/spectators.py): viewers
+# per room per process, and how far (bytes of unsent frames) one may fall
+# behind before its backlog is dropped.
+BATTLE_SPECTATOR_LIMIT = int(os.getenv('BATTLE_SPECTATOR_LIMIT', '1000'))
+BATTLE_SPECTATOR_MAX_BACKLOG = int(os.getenv('BATTLE_SPECTATOR_MAX_BACKLOG', str(256 * 1024)))
+
+# Append-only binary battle event log (core/battle_log.py), one segment per
+# worker per day. Batches are dropped (and counted) past MAX_PENDING.
+BATTLE_LOG_ENABLED = os.getenv('BATTLE_LOG_ENABLED', 'True') == 'True'
+BATTLE_LOG_DIR = os.getenv('BATTLE_LOG_DIR', str(BASE_DIR / 'battle_logs'))
+BATTLE_LOG_FSYNC = os.getenv('BATTLE_LOG_FSYNC', 'False') == 'True'
+BATTLE_LOG_MAX_PENDING = int(os.getenv('BATTLE_LOG_MAX_PENDING', '100000'))
+
+# Timing wheel (core/timers.py). `manage.py run_timers` cancels challenges
+# left PENDING past CHALLENGE_ACCEPT_TIMEOUT or ACTIVE past
+# CHALLENGE_ACTIVE_TIMEOUT seconds, re-scanning the table every
+# TIMER_RESCAN_SECONDS for new ones.
+TIMER_WHEEL_TICK = float(os.getenv('TIMER_WHEEL_TICK', '0.1'))
+TIMER_RESCAN_SECONDS = float(os.getenv('TIMER_RESCAN_SECONDS', '15'))
+CHALLENGE_ACCEPT_TIMEOUT = int(os.getenv('CHALLENGE_ACCEPT_TIMEOUT', str(24 * 3600)))
+CHALLENGE_ACTIVE_TIMEOUT = int(os.getenv('CHALLENGE_ACTIVE_TIMEOUT', '3600'))
+# Question deadlines a battle room may have pending at once (per process)
+BATTLE_ROOM_MAX_DEADLINES = int(os.getenv('BATTLE_ROOM_MAX_DEADLINES', '16'))
+
+# Badge engine (core/badges.py): per-user counters are folded forward from new
+# scores and challenge wins by a job queued BADGE_EVAL_DELAY seconds after a
+# submit, BADGE_BATCH_SIZE events per transaction.
+BADGES_ENABLED = os.getenv('BADGES_ENABLED', 'True') == 'True'
+BADGE_EVAL_DELAY = float(os.getenv('BADGE_EVAL_DELAY', '2.0'))
+BADGE_BATCH_SIZE = int(os.getenv('BADGE_BATCH_SIZE', '5000'))
+# Events younger than this are not read yet: writes that commit out of id
+# order must have become visible before the cursor passes them
+BADGE_STREAM_LAG = float(os.getenv('BADGE_STREAM_LAG', '5'))
+BADGE_FAST_SECONDS = int(os.getenv('BADGE_FAST_SECONDS', '10'))
+BADGE_MASTERY_CORRECT = int(os.getenv('BADGE_MASTERY_CORRECT', '25'))
+
+# Local job queue (core/jobs.py), worked by `manage.py run_jobs`. Failed jobs
+# retry after JOB_RETRY_BACKOFF * 2**attempt seconds; finished jobs (and their
+# idempotency keys) are kept for JOB_RETENTION_SECONDS.
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '0.5'))
+JOB_BATCH_SIZE = int(os.getenv('JOB_BATCH_SIZE', '100'))
+JOB_RETRY_BACKOFF = float(os.getenv('JOB_RETRY_BACKOFF', '2.0'))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+# Signed quiz rounds (core/quiz_rounds.py): draws with ?round=1 return an
+# X-Quiz-Round token and submits carrying it are timed by the server. With
+# QUIZ_ROUND_REQUIRED, submits without a token are refused. Answered
+# questions are remembered in the shared cache for QUIZ_ROUND_MAX_AGE.
+QUIZ_ROUND_MAX_AGE = int(os.getenv('QUIZ_ROUND_MAX_AGE', str(2 * 3600)))
+QUIZ_ROUND_REQUIRED = os.getenv('QUIZ_ROUND_REQUIRED', 'False') == 'True'
+
+# Near-duplicate questions (core/dedup.py): estimated Jaccard similarity of
+# character shingles at which two questions count as duplicates. The admin
+# create endpoint refuses new questions at or above it unless ?force=1.
+DEDUP_THRESHOLD = float(os.getenv('DEDUP_THRESHOLD', '0.8'))
+
+# QUICK answer grading (core/answers.py): answers of at least this many
+# characters tolerate one typo, twice as long two. Numeric answers never do.
+QUICK_ANSWER_FUZZY_MIN_LENGTH = int(os.getenv('QUICK_ANSWER_FUZZY_MIN_LENGTH', '5'))
+
+# Admin changelists (core/paginators.py): counts stop at this many rows;
+# larger unfiltered tables are counted from database statistics.
+ADMIN_COUNT_LIMIT = int(os.getenv('ADMIN_COUNT_LIMIT', '100000'))
+
+# Password hashing (core/passwords.py) runs on a per-process pool of
+# PASSWORD_HASH_WORKERS threads. Up to PASSWORD_HASH_QUEUE more hashes may
+# wait; beyond that, sign-ups and logins get 503 with Retry-After.
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', '32'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+AUTHENTICATION_BACKENDS = ['core.backends.PooledModelBackend']
+
+# Bulk user provisioning (core/provisioning.py): users per insert
+# transaction, hashing threads for `manage.py provision_users` (the admin
+# endpoint hashes on the password hash pool), and the roster size the admin
+# endpoint accepts (larger rosters go through the command).
+PROVISION_CHUNK_SIZE = int(os.getenv('PROVISION_CHUNK_SIZE', '500'))
+PROVISION_HASH_WORKERS = int(os.getenv('PROVISION_HASH_WORKERS', str(os.cpu_count() or 1)))
+PROVISION_MAX_ROWS = int(os.getenv('PROVISION_MAX_ROWS', '1000'))
+
+# Warm start (core/warmup.py): gunicorn.conf.py loads the catalog, answer
+# keys and leaderboard in the master before forking; /api/health/ready/
+# answers 503 until that is done.
+WARM_START = os.getenv('WARM_START', 'True') == 'True'
+
+# Tournaments (core/tournaments.py): match results an admin or game server
+# may report in one request. They are tallied by the job workers.
+TOURNAMENT_REPORT_MAX_RESULTS = int(os.getenv('TOURNAMENT_REPORT_MAX_RESULTS', '1000'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,9 +317,25 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+# Lets the browser client read the quiz round token off the draw response
+CORS_EXPOSE_HEADERS = ['X-Quiz-Round']
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer'
+# Websocket groups (battle rooms and spectator hubs, inbox pushes, the live
+# leaderboard, tournament matches) have to span every worker process, so
+# with more than one gunicorn worker or pod set CHANNEL_REDIS_URL. The
+# in-memory layer only reaches sockets held by the same process, and
+# gunicorn.conf.py refuses to fork several workers on it.
+CHANNEL_REDIS_URL = os.getenv('CHANNEL_REDIS_URL', '')
+if CHANNEL_REDIS_URL:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [CHANNEL_REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer'
+        }
     }
-}
@@ -1,5 +1,33 @@
 from django.contrib import admin
-from .models import Category, Question, UserProfile, Score, Challenge
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from .models import Category, Question, UserProfile, Score, Challenge, Tournament, TournamentMatch
+from .paginators import EstimatedCountPaginator
+from . import search
+
+
+# The largest tables (users, profiles, scores, challenges) are listed with
+# estimated counts (core/paginators.py), joined rows and no second full
+# COUNT(*) for the "N total" link. Dates are drilled into with the
+# created_at list filter, whose ranges use the (created_at, id) indexes,
+# rather than date_hierarchy, which scans the table for its distinct
+# dates. Foreign keys are raw id inputs: a select of every user or
+# question would not render.
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # User foreign keys searched by exact username: an index lookup
+    # instead of LIKE over every row
+    username_search_fields = []
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not self.username_search_fields or not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        lookup = Q()
+        for field in self.username_search_fields:
+            lookup |= Q(**{f'{field}__username': search_term.strip()})
+        return queryset.filter(lookup), False
 
 
 @admin.register(Category)
@@ -9,17 +37,29 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ['created_at']
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(question_count=Count('questions'))
+    
     def question_count(self, obj):
-        return obj.questions.count()
+        return obj.question_count
     question_count.short_description = 'Questions'
+    question_count.admin_order_field = 'question_count'
 
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ['title', 'category', 'question_type', 'difficulty', 'language', 'points', 'created_at']
     list_filter = ['question_type', 'difficulty', 'language', 'category', 'created_at']
+    list_select_related = ['category']
     search_fields = ['title', 'question_text']
     readonly_fields = ['created_at', 'updated_at']
+    
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text index instead of LIKE '%term%' over every row
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+    
     fieldsets = (
         ('Basic Information', {
             'fields': ('title', 'category', 'question_type', 'difficulty', 'language', 'points')
@@ -28,7 +68,7 @@ class QuestionAdmin(admin.ModelAdmin):
             'fields': ('question_text', 'options', 'explanation')
         }),
         ('Answers', {
-            'fields': ('correct_option', 'correct_answer', 'solution_code'),
+            'fields': ('correct_option', 'correct_answer', 'answer_aliases', 'solution_code'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -39,26 +79,62 @@ class QuestionAdmin(admin.ModelAdmin):
 
 
 @admin.register(UserProfile)
-class UserProfileAdmin(admin.ModelAdmin):
+class UserProfileAdmin(LargeTableAdmin):
     list_display = ['user', 'total_points', 'created_at']
+    list_select_related = ['user']
+    raw_id_fields = ['user']
     search_fields = ['user__username', 'user__email']
     readonly_fields = ['created_at', 'updated_at']
     list_filter = ['created_at']
 
 
 @admin.register(Score)
-class ScoreAdmin(admin.ModelAdmin):
+class ScoreAdmin(LargeTableAdmin):
     list_display = ['user', 'question', 'points_awarded', 'is_correct', 'time_taken', 'created_at']
     list_filter = ['is_correct', 'created_at']
-    search_fields = ['user__username', 'question__title']
+    list_select_related = ['user', 'question']
+    raw_id_fields = ['user', 'question']
+    search_fields = ['user__username']
+    username_search_fields = ['user']
     readonly_fields = ['created_at']
-    date_hierarchy = 'created_at'
 
 
 @admin.register(Challenge)
-class ChallengeAdmin(admin.ModelAdmin):
+class ChallengeAdmin(LargeTableAdmin):
     list_display = ['id', 'challenger', 'opponent', 'category', 'status', 'winner', 'created_at']
     list_filter = ['status', 'created_at']
+    list_select_related = ['challenger', 'opponent', 'category', 'winner']
+    raw_id_fields = ['challenger', 'opponent', 'winner']
     search_fields = ['challenger__username', 'opponent__username']
+    username_search_fields = ['challenger', 'opponent']
     readonly_fields = ['created_at', 'started_at', 'completed_at']
-    date_hierarchy = 'created_at'
+
+
+@admin.register(Tournament)
+class TournamentAdmin(admin.ModelAdmin):
+    list_display = ['name', 'category', 'format', 'status', 'current_round', 'winner', 'starts_at']
+    list_filter = ['format', 'status']
+    list_select_related = ['category', 'winner']
+    raw_id_fields = ['winner']
+    search_fields = ['name']
+    readonly_fields = ['current_round', 'created_at', 'started_at', 'completed_at']
+
+
+@admin.register(TournamentMatch)
+class TournamentMatchAdmin(LargeTableAdmin):
+    list_display = ['tournament', 'round', 'table', 'player_a', 'player_b', 'winner', 'status']
+    list_filter = ['status']
+    list_select_related = ['tournament', 'player_a', 'player_b', 'winner']
+    raw_id_fields = ['tournament', 'player_a', 'player_b', 'winner']
+    search_fields = ['player_a__username', 'player_b__username']
+    username_search_fields = ['player_a', 'player_b']
+    readonly_fields = ['tallied', 'reported_at']
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class LargeUserAdmin(UserAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,135 @@
+"""
+Grading of free-text (QUICK) answers.
+
+Exact comparison marks "True.", " TRUE" or "T" wrong for an answer of
+"true". Each question's accepted answers are therefore compiled once into an
+AnswerMatcher:
+
+- every accepted form (correct_answer plus Question.answer_aliases, plus the
+  built-in ALIASES such as "t" for "true") is normalized: Unicode NFKC,
+  casefolded, surrounding punctuation and quotes stripped, inner whitespace
+  collapsed. Normalized forms go into a frozenset, so the common case, an
+  exact or trivially different answer, is one hash lookup;
+- forms long enough to tolerate typos also get an edit budget
+  (max_edits): one edit from QUICK_ANSWER_FUZZY_MIN_LENGTH characters, two
+  from twice that. Forms with a digit or an operator never get one:
+  "O(n^2)" is not "O(n^3)", nor "port 8080" "port 8081". An answer that
+  contains one is likewise only accepted exactly, so "python3" does not
+  pass for "python".
+  Anything that misses the set is checked with a bounded Levenshtein that
+  gives up as soon as the budget is exceeded. A length difference over
+  the budget is rejected before any work; otherwise only a diagonal band
+  of width 2k + 1 is computed, and the scan stops as soon as a whole row
+  is over budget.
+
+Matchers are cached per process by the question's accepted answers
+(matcher_for), so an edit to the answers compiles a new matcher without any
+explicit invalidation. post_save builds the new one (signals.py), so the
+first grade after an edit does not pay for it in the process that saved.
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.conf import settings
+
+# Built-in equivalents, keyed by normalized canonical answer
+ALIASES = {
+    'true': ('t', 'yes', 'y'),
+    'false': ('f', 'no', 'n'),
+}
+
+_SPACE = re.compile(r'\s+')
+_EDGE_PUNCTUATION = '.,;:!?\'"`()[]{}'
+# A digit or an operator carries the meaning; one edit there is a different answer
+_EXACT_ONLY = re.compile(r'[\d^*/+=<>%]')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return _SPACE.sub(' ', text).strip().strip(_EDGE_PUNCTUATION).strip()
+
+
+def max_edits(form):
+    """Typos tolerated in an answer of this form"""
+    if _EXACT_ONLY.search(form):
+        return 0
+    shortest = settings.QUICK_ANSWER_FUZZY_MIN_LENGTH
+    if len(form) >= 2 * shortest:
+        return 2
+    if len(form) >= shortest:
+        return 1
+    return 0
+
+
+def within_distance(a, b, k):
+    """True if the Levenshtein distance between a and b is at most k"""
+    if abs(len(a) - len(b)) > k:
+        return False
+    if a == b:
+        return True
+    if len(a) > len(b):
+        a, b = b, a
+    big = k + 1
+    # Row i only needs columns i - k .. i + k; everything outside is > k
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        low, high = max(1, i - k), min(len(b), i + k)
+        current = [big] * (len(b) + 1)
+        current[0] = i if i <= k else big
+        row_min = current[0]
+        char = a[i - 1]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > k:
+            return False
+        previous = current
+    return previous[len(b)] <= k
+
+
+class AnswerMatcher:
+    """The compiled accepted answers of one question"""
+
+    __slots__ = ('exact', 'fuzzy')
+
+    def __init__(self, answers):
+        forms = set()
+        for answer in answers:
+            form = normalize(answer)
+            if form:
+                forms.add(form)
+                forms.update(ALIASES.get(form, ()))
+        self.exact = frozenset(forms)
+        fuzzy = [(form, max_edits(form)) for form in forms]
+        self.fuzzy = tuple((form, k) for form, k in fuzzy if k)
+
+    def matches(self, answer):
+        form = normalize(answer)
+        if not form:
+            return False
+        if form in self.exact:
+            return True
+        if _EXACT_ONLY.search(form):
+            return False
+        return any(within_distance(form, accepted, k) for accepted, k in self.fuzzy)
+
+
+@lru_cache(maxsize=4096)
+def _compile(correct_answer, aliases):
+    return AnswerMatcher((correct_answer, *aliases))
+
+
+def matcher_for(question):
+    aliases = question.answer_aliases or ()
+    return _compile(question.correct_answer or '', tuple(str(alias) for alias in aliases))
+
+
+def is_correct(question, answer):
+    return matcher_for(question).matches(answer)
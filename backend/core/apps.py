@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Register cache invalidation handlers
+        from . import signals  # noqa: F401
+        
+        from django.conf import settings
+        if settings.METRICS_ENABLED:
+            from .metrics import install_serializer_timing
+            install_serializer_timing()
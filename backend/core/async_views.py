@@ -0,0 +1,257 @@
+"""
+Native async versions of the hot read endpoints.
+
+The quiz draw (a category's questions), leaderboard, profile and
+challenge-status GETs are served here when ASYNC_READ_VIEWS is on (deployed
+behind an ASGI server, see the Dockerfile), so a slow query parks a
+coroutine instead of a whole worker thread. Responses match the DRF views
+byte for byte (same serializers and JSON renderer, ETags and replica
+routing). Any other method on these URLs (admin writes, OPTIONS) falls
+through to the DRF views, and so does everything else, including the
+paginated catalog listings.
+
+Registration POSTs are served here too: they await the password hash pool
+(passwords.py) instead of blocking a thread on it. Login stays on
+simplejwt's view, which authenticates through AUTHENTICATION_BACKENDS
+(PooledModelBackend hashes on the same pool).
+
+Only what DRF and Django 4.2 can't do for a coroutine is done here: JWT
+authentication is awaited on a thread, errors go through DRF's exception
+handler, and conditional() stands in for Django's condition decorator,
+which can't wrap async views before Django 5.0.
+
+Nothing blocking runs on the event loop. The shared cache is Redis, so the
+version counters (ETags), replica pins, the per-process leaderboard check
+and snapshot file access are all network or disk I/O. The sync helpers
+that do them are called through off_loop(), on threads outside the ORM's
+single sync thread.
+"""
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.urls import re_path
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import exceptions, status
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import exception_handler
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from . import passwords, quiz_rounds, views
+from .db_router import enable_replica_reads
+from .models import Category, Question, UserProfile, Challenge
+from .serializers import QuestionDetailSerializer, UserProfileSerializer, ChallengeSerializer, RegisterSerializer
+from .snapshots import snapshot_response
+from .versioning import (
+    CATALOG, LEADERBOARD, accepts_gzip, catalog_last_modified, catalog_questions_etag, leaderboard_etag,
+    leaderboard_last_modified,
+)
+
+_jwt = JWTAuthentication()
+_renderer = JSONRenderer()
+
+
+def off_loop(func):
+    """Await a sync helper that touches the cache or the disk on a worker thread"""
+    return sync_to_async(func, thread_sensitive=False)
+
+
+def render(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(_renderer.render(data), content_type='application/json', status=status_code)
+
+
+def error_response(exc):
+    """Render an APIException through DRF's exception handler"""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # What APIView.handle_exception does for an authenticator with a header
+        exc.auth_header = _jwt.authenticate_header(None)
+    handled = exception_handler(exc, {})
+    response = render(handled.data, handled.status_code)
+    for header, value in handled.items():
+        response[header] = value
+    return response
+
+
+async def authenticate(request):
+    """JWT authentication; the user lookup runs through the ORM's thread pool"""
+    result = None
+    if _jwt.get_header(request) is not None:
+        result = await sync_to_async(_jwt.authenticate)(request)
+    user = result[0] if result else AnonymousUser()
+    request.user = user
+    return user
+
+
+async def load_profile(user):
+    # Loaded with its user so is_admin() never triggers a lazy (sync) query
+    return await UserProfile.objects.select_related('user').filter(user=user).afirst()
+
+
+def conditional(etag_func, last_modified_func):
+    """Async counterpart of django.views.decorators.http.condition"""
+    def validators(request):
+        return etag_func(request), last_modified_func(request)
+
+    def decorator(view):
+        async def wrapper(request, *args, **kwargs):
+            etag, last_modified = await off_loop(validators)(request)
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+                if timestamp:
+                    response.headers.setdefault('Last-Modified', http_date(timestamp))
+            return response
+        return wrapper
+    return decorator
+
+
+def api_read(fallback, authenticated=False, versions=()):
+    """
+    Wrap an async GET handler: authenticate, enable replica reads (see
+    db_router.replica_reads for `versions`), map API exceptions to
+    DRF-shaped errors, and hand other methods to `fallback`.
+    """
+    sync_fallback = sync_to_async(fallback)
+
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_fallback(request, *args, **kwargs)
+            try:
+                user = await authenticate(request)
+                if authenticated and not user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+                await off_loop(enable_replica_reads)(user, versions)
+                return await handler(request, user, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+        # Same as DRF's APIView: JWT requests carry no CSRF token. (Django 4.2's
+        # csrf_exempt decorator would turn the coroutine function into a sync one.)
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+def api_post(fallback):
+    """
+    Wrap an async POST handler taking the parsed body: map API exceptions to
+    DRF-shaped errors and hand other methods to `fallback`.
+    """
+    sync_fallback = sync_to_async(fallback)
+
+    def decorator(handler):
+        async def view(request, *args, **kwargs):
+            if request.method != 'POST':
+                return await sync_fallback(request, *args, **kwargs)
+            try:
+                if request.content_type == 'application/json':
+                    data = JSONParser().parse(BytesIO(request.body or b'{}'))
+                    if not isinstance(data, dict):
+                        raise exceptions.ParseError('Expected a JSON object')
+                else:
+                    data = request.POST
+                return await handler(request, data, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return error_response(exc)
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+@api_read(views.CategoryViewSet.as_view({'get': 'questions'}), versions=[CATALOG])
+@conditional(catalog_questions_etag, catalog_last_modified)
+async def category_questions(request, user, slug):
+    difficulty = request.GET.get('difficulty')
+    question_type = request.GET.get('type')
+    limit = request.GET.get('limit')
+    issue_round = quiz_rounds.requested(request) and user.is_authenticated
+
+    if not limit and not issue_round and accepts_gzip(request):
+        response = await off_loop(snapshot_response)(slug, difficulty, question_type)
+        if response is not None:
+            return response
+
+    category = await Category.objects.filter(slug=slug).afirst()
+    if category is None:
+        raise exceptions.NotFound('No Category matches the given query.')
+    questions = Question.objects.filter(category=category).select_related('category')
+    if difficulty:
+        questions = questions.filter(difficulty=difficulty.upper())
+    if question_type:
+        questions = questions.filter(question_type=question_type.upper())
+    if limit:
+        try:
+            questions = questions[:int(limit)]
+        except ValueError:
+            pass
+    rows = [q async for q in questions]
+    response = render(QuestionDetailSerializer(rows, many=True).data)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if issue_round:
+        await off_loop(quiz_rounds.attach)(response, user, [q.id for q in rows])
+    return response
+
+
+@api_read(views.leaderboard, versions=[LEADERBOARD])
+@conditional(leaderboard_etag, leaderboard_last_modified)
+async def leaderboard(request, user):
+    period = request.GET.get('period', 'overall')
+    state, rows = await off_loop(views.cached_leaderboard)(period)
+    if rows is None:
+        rows = [views.leaderboard_entry(p) async for p in views.leaderboard_queryset(period)]
+        views.store_leaderboard(period, state, rows)
+    return render({'period': period, 'leaderboard': rows})
+
+
+@api_read(views.user_profile, authenticated=True)
+async def user_profile(request, user):
+    profile = await load_profile(user)
+    if profile is None:
+        raise exceptions.NotFound()
+    return render(UserProfileSerializer(profile).data)
+
+
+@api_read(views.ChallengeViewSet.as_view({'get': 'status'}), authenticated=True)
+async def challenge_status(request, user, pk):
+    profile = await load_profile(user)
+    challenge = None
+    # Admins don't participate in challenges (same as ChallengeViewSet.get_queryset)
+    if profile is None or not profile.is_admin():
+        try:
+            challenge = await Challenge.objects.select_related(
+                'challenger', 'opponent', 'category', 'winner'
+            ).filter(Q(challenger=user) | Q(opponent=user), pk=pk).afirst()
+        except (TypeError, ValueError):
+            raise exceptions.NotFound()
+    if challenge is None:
+        raise exceptions.NotFound('No Challenge matches the given query.')
+    return render(ChallengeSerializer(challenge).data)
+
+
+@api_post(views.register_user)
+async def register(request, data):
+    serializer = RegisterSerializer(data=data)
+    # Field validation includes the username uniqueness query
+    if not await sync_to_async(serializer.is_valid)():
+        return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    encoded = await passwords.amake_password(serializer.validated_data['password'])
+    user = await sync_to_async(serializer.save)(password_hash=encoded)
+    return render(views.registration_data(user), status.HTTP_201_CREATED)
+
+
+# Mounted ahead of the DRF router in core/urls.py, under the router's names
+urlpatterns = [
+    re_path(r'^categories/(?P<slug>[^/.]+)/questions/$', category_questions, name='category-questions'),
+    re_path(r'^challenges/(?P<pk>[^/.]+)/status/$', challenge_status, name='challenge-status'),
+    re_path(r'^leaderboard/$', leaderboard, name='leaderboard'),
+    re_path(r'^user/profile/$', user_profile, name='user-profile'),
+    re_path(r'^auth/register/$', register, name='register'),
+]
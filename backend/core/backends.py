@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from . import passwords
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend with password hashing on the bounded hash pool (passwords.py)"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway, so unknown usernames take as long as wrong passwords
+            passwords.make_password(password)
+            return None
+        matches, outdated = passwords.check_password(password, user.password)
+        if not matches or not self.user_can_authenticate(user):
+            return None
+        if outdated:
+            # Hasher or iteration count changed since this password was set
+            user.password = passwords.make_password(password)
+            user.save(update_fields=['password'])
+        return user
@@ -0,0 +1,260 @@
+"""
+Incremental badge engine.
+
+Badges are never computed by rescanning a user's history. Each user has a
+small BadgeState (current and best streak, fast answers, correct answers per
+category, challenge wins) that is folded forward from two streams:
+
+* scores, in id order, from BadgeCursor.score_id;
+* completed challenges with a winner, in (completed_at, id) order.
+
+A batch reads up to BADGE_BATCH_SIZE events past the cursor, updates the
+states of the users involved, compares the badges each state earns before
+and after, and writes the new badges with one bulk_update of
+UserProfile.badges. States, profiles and the cursor are saved in the same
+transaction, so a batch is applied exactly once. A concurrent evaluator that
+read the same cursor loses the conditional cursor update and rolls back.
+
+Concurrent submits can commit out of id order (on MySQL, say), so a row
+that becomes visible after the cursor moved past its id would be skipped
+for good. The streams therefore stop BADGE_STREAM_LAG seconds short of now:
+a batch ends at the first score created more recently than that, and only
+wins completed before it are read. Whatever is held back is picked up by a
+follow-up job.
+
+Evaluation is off the request path: saving a Score (or a won challenge)
+queues a coalesced `badges.evaluate` job (core/jobs.py) that drains the
+streams in batches on a job worker. `manage.py evaluate_badges` does the
+same from the command line and is also the backfill for existing history.
+"""
+import logging
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import jobs
+from .models import BadgeCursor, BadgeState, Category, Challenge, Score, UserProfile
+from .sqlite import run_write
+from .versioning import bump_version, LEADERBOARD
+
+logger = logging.getLogger(__name__)
+
+STREAKS = (5, 10, 25)
+SPEED = (10, 50)
+WINS = (1, 10, 50)
+
+STREAK_NAMES = {5: 'Hot Streak', 10: 'On Fire', 25: 'Unstoppable'}
+SPEED_NAMES = {10: 'Quick Thinker', 50: 'Speed Demon'}
+WIN_NAMES = {1: 'First Victory', 10: 'Challenger', 50: 'Champion'}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+EVALUATE = 'badges.evaluate'
+
+
+# Rules: each maps a state to the badge ids it has earned
+
+def streak_badges(state):
+    return {f'streak_{n}' for n in STREAKS if state.best_streak >= n}
+
+
+def speed_badges(state):
+    return {f'speed_{n}' for n in SPEED if state.fast_correct >= n}
+
+
+def mastery_badges(state):
+    return {
+        f'mastery_{category_id}'
+        for category_id, correct in state.category_correct.items()
+        if correct >= settings.BADGE_MASTERY_CORRECT
+    }
+
+
+def win_badges(state):
+    return {f'wins_{n}' for n in WINS if state.challenge_wins >= n}
+
+
+RULES = [streak_badges, speed_badges, mastery_badges, win_badges]
+
+
+def earned(state):
+    badges = set()
+    for rule in RULES:
+        badges |= rule(state)
+    return badges
+
+
+def badge_name(badge_id, categories):
+    kind, _, value = badge_id.partition('_')
+    if kind == 'mastery':
+        category = categories.get(int(value))
+        return f'{category.name} Master' if category else 'Category Master'
+    names = {'streak': STREAK_NAMES, 'speed': SPEED_NAMES, 'wins': WIN_NAMES}[kind]
+    return names[int(value)]
+
+
+# Folding events into states
+
+def apply_score(state, category_id, is_correct, time_taken):
+    if not is_correct:
+        state.streak = 0
+        return
+    state.streak += 1
+    state.best_streak = max(state.best_streak, state.streak)
+    if time_taken < settings.BADGE_FAST_SECONDS:
+        state.fast_correct += 1
+    key = str(category_id)
+    state.category_correct[key] = state.category_correct.get(key, 0) + 1
+
+
+def apply_win(state):
+    state.challenge_wins += 1
+
+
+def stream_watermark():
+    """Events newer than this are left for a later batch"""
+    return timezone.now() - timedelta(seconds=settings.BADGE_STREAM_LAG)
+
+
+def _new_scores(cursor):
+    return Score.objects.filter(id__gt=cursor.score_id).order_by('id')
+
+
+def _new_wins(cursor):
+    since = cursor.challenge_completed_at or _EPOCH
+    return Challenge.objects.filter(
+        status='COMPLETED', winner__isnull=False, completed_at__gte=since,
+    ).exclude(completed_at=since, id__lte=cursor.challenge_id)
+
+
+def has_pending():
+    """Whether any event, held back or not, is past the cursor"""
+    cursor = BadgeCursor.objects.filter(pk=1).first() or BadgeCursor()
+    return _new_scores(cursor).exists() or _new_wins(cursor).exists()
+
+
+def evaluate_batch(batch_size=None):
+    """
+    Apply the next batch of events. Returns (events, badges awarded); 0 events
+    means the streams are drained.
+    """
+    batch_size = batch_size or settings.BADGE_BATCH_SIZE
+    with transaction.atomic():
+        cursor, _ = BadgeCursor.objects.get_or_create(pk=1)
+        watermark = stream_watermark()
+        scores = []
+        for row in _new_scores(cursor).values_list(
+                'id', 'user_id', 'question__category_id', 'is_correct', 'time_taken', 'created_at')[:batch_size]:
+            if row[5] > watermark:
+                # Anything from here on may still have lower ids in flight
+                break
+            scores.append(row[:5])
+        wins = list(
+            _new_wins(cursor).filter(completed_at__lte=watermark)
+            .order_by('completed_at', 'id').values_list('completed_at', 'id', 'winner_id')[:batch_size]
+        )
+        if not scores and not wins:
+            return 0, 0
+
+        user_ids = {row[1] for row in scores} | {row[2] for row in wins}
+        states = BadgeState.objects.in_bulk(user_ids, field_name='user_id')
+        created = []
+        for user_id in user_ids - states.keys():
+            states[user_id] = BadgeState(user_id=user_id)
+            created.append(states[user_id])
+        before = {user_id: earned(state) for user_id, state in states.items()}
+
+        for _, user_id, category_id, is_correct, time_taken in scores:
+            apply_score(states[user_id], category_id, is_correct, time_taken)
+        for _, _, winner_id in wins:
+            apply_win(states[winner_id])
+
+        new_badges = {}
+        for user_id, state in states.items():
+            gained = earned(state) - before[user_id]
+            if gained:
+                new_badges[user_id] = gained
+        awarded = _award(new_badges)
+
+        now = timezone.now()
+        existing = [state for state in states.values() if state.pk is not None]
+        for state in states.values():
+            state.updated_at = now
+        BadgeState.objects.bulk_create(created, batch_size=500)
+        BadgeState.objects.bulk_update(
+            existing,
+            ['streak', 'best_streak', 'fast_correct', 'category_correct', 'challenge_wins', 'updated_at'],
+            batch_size=500,
+        )
+
+        moved = {'score_id': scores[-1][0] if scores else cursor.score_id}
+        if wins:
+            moved['challenge_completed_at'], moved['challenge_id'] = wins[-1][0], wins[-1][1]
+        # Conditional on the position read above: a concurrent evaluator that
+        # got here first makes this batch roll back instead of applying twice
+        if not BadgeCursor.objects.filter(
+                pk=1, score_id=cursor.score_id, challenge_id=cursor.challenge_id).update(updated_at=now, **moved):
+            raise RuntimeError('badge cursor moved concurrently')
+        if awarded:
+            # bulk_update skips post_save; the leaderboard shows badges
+            transaction.on_commit(lambda: bump_version(LEADERBOARD))
+    return len(scores) + len(wins), awarded
+
+
+def _award(new_badges):
+    """Append newly earned badges to the profiles with one bulk_update"""
+    if not new_badges:
+        return 0
+    categories = Category.objects.in_bulk(
+        {int(badge.split('_')[1]) for badges in new_badges.values() for badge in badges if badge.startswith('mastery_')}
+    )
+    now = timezone.now()
+    profiles = list(UserProfile.objects.filter(user_id__in=new_badges).only('id', 'user_id', 'badges'))
+    awarded = 0
+    for profile in profiles:
+        have = {badge.get('id') for badge in profile.badges if isinstance(badge, dict)}
+        for badge_id in sorted(new_badges[profile.user_id] - have):
+            profile.badges.append({
+                'id': badge_id,
+                'name': badge_name(badge_id, categories),
+                'awarded_at': now.isoformat(),
+            })
+            awarded += 1
+        profile.updated_at = now
+    UserProfile.objects.bulk_update(profiles, ['badges', 'updated_at'], batch_size=500)
+    return awarded
+
+
+def evaluate_pending(batch_size=None, max_batches=None):
+    """Drain the streams batch by batch; returns (events, badges awarded)"""
+    events = awarded = batches = 0
+    while max_batches is None or batches < max_batches:
+        # Through the single writer on SQLite, like the submissions themselves
+        count, gained = run_write(evaluate_batch, batch_size)
+        events += count
+        awarded += gained
+        batches += 1
+        if not count:
+            break
+    return events, awarded
+
+
+@jobs.task(EVALUATE, batch_size=1000)
+def evaluate_job(batch):
+    # Every queued evaluation drains the same cursor, so one pass serves the batch
+    evaluate_pending()
+    if has_pending():
+        # Held back by the stream lag; this job is RUNNING, so it doesn't coalesce
+        jobs.enqueue(EVALUATE, delay=settings.BADGE_STREAM_LAG, coalesce=True)
+
+
+def schedule_evaluation():
+    """
+    Queue an evaluation unless one is already waiting. Call inside the
+    transaction that wrote the score. The delay lets a burst of submits share
+    one evaluation.
+    """
+    if settings.BADGES_ENABLED:
+        jobs.enqueue(EVALUATE, delay=settings.BADGE_EVAL_DELAY, coalesce=True)
@@ -0,0 +1,250 @@
+"""
+Append-only binary log of battle events, for replays, disputes and
+anti-cheat review.
+
+Every batch a room broadcasts (battle_protocol.RoomBatcher) is appended as
+one record, reusing the msgpack frame that was already encoded for the
+players. Records go into one segment per process per UTC day:
+
+    <BATTLE_LOG_DIR>/<YYYY-MM-DD>/<pid>-<start ns>.blog
+
+A segment starts with the 8-byte MAGIC. Each record after it is
+
+    u32 body length | u32 crc32(body) | body
+
+and the body is
+
+    u64 timestamp (ms) | u16 room length | room (utf-8) | msgpack [event, ...]
+
+All integers are little-endian. Consumers only enqueue; one writer thread
+per process does the file I/O, so the event loop never waits on the disk.
+When the queue is full, batches are dropped and counted rather than
+blocking.
+
+BattleLogReader memory-maps a segment, indexes it by room from the record
+headers alone, and streams one room's events without loading the file.
+replay() merges every segment for a room in timestamp order.
+"""
+import heapq
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import msgpack
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'QBLOG1\n\x00'
+PREFIX = struct.Struct('<II')
+HEADER = struct.Struct('<QH')
+
+
+def encode_record(room, events_msgpack, timestamp_ms=None):
+    room_bytes = room.encode()
+    if timestamp_ms is None:
+        timestamp_ms = int(time.time() * 1000)
+    body = HEADER.pack(timestamp_ms, len(room_bytes)) + room_bytes + events_msgpack
+    return PREFIX.pack(len(body), zlib.crc32(body)) + body
+
+
+class BattleLogWriter:
+    """Appends records from a bounded queue on one background thread"""
+
+    def __init__(self, max_batch=500):
+        self.max_batch = max_batch
+        self.dropped = 0
+        self._records = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._day = None
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork (threads don't survive fork)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._records = queue.Queue(maxsize=settings.BATTLE_LOG_MAX_PENDING)
+                self._pid = os.getpid()
+                self._file = None
+                self._day = None
+                self._thread = threading.Thread(target=self._loop, name='battle-log-writer', daemon=True)
+                self._thread.start()
+
+    def append(self, room, events_msgpack):
+        """Queue one batch for the log; never blocks"""
+        if not settings.BATTLE_LOG_ENABLED:
+            return
+        self._ensure_started()
+        try:
+            self._records.put_nowait(encode_record(room, events_msgpack))
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning('battle log queue full, %d batches dropped so far', self.dropped)
+
+    def qsize(self):
+        return self._records.qsize() if self._records is not None else 0
+
+    def _loop(self):
+        while True:
+            batch = [self._records.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._records.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(b''.join(batch))
+            except OSError:
+                logger.exception('battle log write of %d records failed', len(batch))
+                self._file = None
+            finally:
+                for _ in batch:
+                    self._records.task_done()
+
+    def _write(self, data):
+        day = datetime.now(dt_timezone.utc).strftime('%Y-%m-%d')
+        if self._file is None or day != self._day:
+            if self._file is not None:
+                self._file.close()
+            directory = Path(settings.BATTLE_LOG_DIR) / day
+            directory.mkdir(parents=True, exist_ok=True)
+            # A fresh file per process lifetime: a crash can only leave a torn
+            # tail at the end of a dead segment, never in front of new records
+            self._file = open(directory / f'{os.getpid()}-{time.time_ns()}.blog', 'xb')
+            self._file.write(MAGIC)
+            self._day = day
+        self._file.write(data)
+        self._file.flush()
+        if settings.BATTLE_LOG_FSYNC:
+            os.fsync(self._file.fileno())
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written (tests, shutdown)"""
+        if self._records is None:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._records.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            time.sleep(0.01)
+
+
+writer = BattleLogWriter()
+
+
+class BattleLogReader:
+    """Memory-mapped reader for one segment"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f'{self.path} is not a battle log segment')
+        self._index = None
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _headers(self):
+        """Yield (offset, timestamp_ms, room) for every complete record"""
+        data = self._map
+        offset = len(MAGIC)
+        end = len(data)
+        while offset + PREFIX.size + HEADER.size <= end:
+            length, _ = PREFIX.unpack_from(data, offset)
+            if offset + PREFIX.size + length > end:
+                # Torn tail: the writer was still appending (or crashed)
+                break
+            timestamp_ms, room_length = HEADER.unpack_from(data, offset + PREFIX.size)
+            start = offset + PREFIX.size + HEADER.size
+            try:
+                room = bytes(data[start:start + room_length]).decode()
+            except UnicodeDecodeError:
+                logger.warning('corrupt battle log header in %s at %d, ignoring the rest', self.path, offset)
+                break
+            yield offset, timestamp_ms, room
+            offset += PREFIX.size + length
+
+    def index(self):
+        """{room: [record offsets]}, built from the headers only"""
+        if self._index is None:
+            index = {}
+            for offset, _, room in self._headers():
+                index.setdefault(room, []).append(offset)
+            self._index = index
+        return self._index
+
+    def rooms(self):
+        return list(self.index())
+
+    def read(self, offset, verify=True):
+        """Return (timestamp_ms, room, events) for the record at `offset`"""
+        length, crc = PREFIX.unpack_from(self._map, offset)
+        body = self._map[offset + PREFIX.size:offset + PREFIX.size + length]
+        if verify and zlib.crc32(body) != crc:
+            raise ValueError(f'corrupt record at {self.path}:{offset}')
+        timestamp_ms, room_length = HEADER.unpack_from(body)
+        room = body[HEADER.size:HEADER.size + room_length].decode()
+        events = msgpack.unpackb(body[HEADER.size + room_length:], raw=False)
+        return timestamp_ms, room, events
+
+    def records(self, room=None):
+        """Stream (timestamp_ms, room, events) records, optionally for one room"""
+        offsets = self.index().get(room, []) if room is not None else (o for o, _, _ in self._headers())
+        for offset in offsets:
+            try:
+                yield self.read(offset)
+            except ValueError:
+                logger.warning('skipping corrupt battle log record in %s at %d', self.path, offset)
+
+
+def segments(day=None):
+    """Segment paths, oldest day first, optionally for one YYYY-MM-DD day"""
+    root = Path(settings.BATTLE_LOG_DIR)
+    if not root.is_dir():
+        return []
+    days = [root / day] if day else sorted(p for p in root.iterdir() if p.is_dir())
+    return [path for directory in days if directory.is_dir() for path in sorted(directory.glob('*.blog'))]
+
+
+def replay(room, day=None):
+    """Yield (timestamp_ms, event) for a room across all segments, in time order"""
+    readers = []
+    for path in segments(day):
+        try:
+            readers.append(BattleLogReader(path))
+        except ValueError:
+            # Empty or foreign file (a segment that was just created)
+            continue
+    try:
+        streams = [
+            ((timestamp_ms, event) for timestamp_ms, _, events in reader.records(room) for event in events)
+            for reader in readers
+        ]
+        yield from heapq.merge(*streams, key=lambda item: item[0])
+    finally:
+        for reader in readers:
+            reader.close()
@@ -0,0 +1,171 @@
+"""
+Wire protocol for the battle websocket (ws/battle/<room>/).
+
+The encoding is negotiated per connection through the websocket subprotocol.
+A client offering `battle.msgpack` gets binary msgpack frames. Anything else,
+including `battle.json` or no subprotocol at all, gets JSON text frames.
+
+Every outgoing frame is a list of events. Events sent to a room within one
+BATTLE_COALESCE_TICK are delivered together as one frame, which is flushed
+early once it holds BATTLE_MAX_BATCH events. A client may send a single event
+object or a list of them, in either encoding.
+
+Each batch is encoded once per encoding and the encoded frames travel
+through the channel layer, so group members only forward bytes they already
+have instead of re-encoding the batch for every player. The msgpack frame is
+also what gets appended to the battle log (battle_log.py). Spectators get
+the same encoded frames through a per-process hub (spectators.py).
+"""
+import asyncio
+import json
+import logging
+
+import msgpack
+from django.conf import settings
+
+from . import battle_log
+
+logger = logging.getLogger(__name__)
+
+MSGPACK = 'battle.msgpack'
+JSON = 'battle.json'
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def negotiate(subprotocols):
+    """Pick the wire format from the client's offered subprotocols"""
+    if MSGPACK in subprotocols:
+        return MSGPACK
+    if JSON in subprotocols:
+        return JSON
+    # Legacy clients that offer nothing keep plain JSON and no subprotocol header
+    return None
+
+
+def decode(text_data=None, bytes_data=None):
+    """Return the list of events carried by one incoming frame"""
+    try:
+        if bytes_data is not None:
+            payload = msgpack.unpackb(bytes_data, raw=False)
+        else:
+            payload = json.loads(text_data)
+    except (ValueError, msgpack.UnpackException) as exc:
+        raise ProtocolError(str(exc)) from exc
+    events = payload if isinstance(payload, list) else [payload]
+    if not all(isinstance(event, dict) for event in events):
+        raise ProtocolError('events must be objects')
+    # The room's batch is encoded in both formats, so an event only one of
+    # them can carry (a msgpack bin value, an integer wider than 64 bits,
+    # NaN) is refused here rather than failing the whole room's flush
+    try:
+        encode_frames(events)
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise ProtocolError(f'event cannot be relayed: {exc}') from exc
+    return events
+
+
+def encode_frames(events):
+    """Encode a batch once per wire format"""
+    return {
+        'json': json.dumps(events, separators=(',', ':'), allow_nan=False),
+        'msgpack': msgpack.packb(events, use_bin_type=True),
+    }
+
+
+def merge_frames(frames, fmt):
+    """
+    Join encoded frames of one wire format ('json' or 'msgpack') into one
+    frame carrying all their events, without decoding the events.
+    """
+    if len(frames) == 1:
+        return frames[0]
+    if fmt == 'json':
+        return '[' + ','.join(frame[1:-1] for frame in frames if frame[1:-1]) + ']'
+    count, bodies = 0, []
+    for frame in frames:
+        length, body = _msgpack_array(frame)
+        count += length
+        bodies.append(body)
+    return _msgpack_array_header(count) + b''.join(bodies)
+
+
+def _msgpack_array(frame):
+    """(length, encoded items) of a msgpack array"""
+    tag = frame[0]
+    if tag & 0xf0 == 0x90:
+        return tag & 0x0f, frame[1:]
+    if tag == 0xdc:
+        return int.from_bytes(frame[1:3], 'big'), frame[3:]
+    if tag == 0xdd:
+        return int.from_bytes(frame[1:5], 'big'), frame[5:]
+    raise ProtocolError('frame is not a msgpack array')
+
+
+def _msgpack_array_header(count):
+    if count < 16:
+        return bytes([0x90 | count])
+    if count < 1 << 16:
+        return b'\xdc' + count.to_bytes(2, 'big')
+    return b'\xdd' + count.to_bytes(4, 'big')
+
+
+def wire_format(protocol):
+    """Key of the encoded frame a connection using `protocol` receives"""
+    return 'msgpack' if protocol == MSGPACK else 'json'
+
+
+def send_kwargs(frames, protocol):
+    """Arguments for consumer.send() for a connection using `protocol`"""
+    if protocol == MSGPACK:
+        return {'bytes_data': frames['msgpack']}
+    return {'text_data': frames['json']}
+
+
+def group_name(room):
+    return f'battle_{room}'
+
+
+class RoomBatcher:
+    """
+    Collects the events sent to each room in this process and flushes them
+    as one encoded frame per tick. Every flushed batch is also appended to
+    the battle log.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    async def add(self, channel_layer, room, events):
+        tick = settings.BATTLE_COALESCE_TICK
+        if tick <= 0:
+            await self._send(channel_layer, room, events)
+            return
+        pending = self._pending.get(room)
+        if pending is None:
+            pending = self._pending[room] = []
+            asyncio.get_running_loop().call_later(
+                tick, lambda: asyncio.ensure_future(self._flush(channel_layer, room))
+            )
+        pending.extend(events)
+        if len(pending) >= settings.BATTLE_MAX_BATCH:
+            await self._flush(channel_layer, room)
+
+    async def _flush(self, channel_layer, room):
+        events = self._pending.pop(room, None)
+        if events:
+            try:
+                await self._send(channel_layer, room, events)
+            except Exception:
+                # Runs as a timer callback's task; nothing else would report it
+                logger.exception('battle room %s dropped a batch of %d events', room, len(events))
+
+    async def _send(self, channel_layer, room, events):
+        frames = encode_frames(events)
+        battle_log.writer.append(room, frames['msgpack'])
+        await channel_layer.group_send(group_name(room), {'type': 'battle.frame', **frames})
+
+
+batcher = RoomBatcher()
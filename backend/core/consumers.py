@@ -1,23 +1,48 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
 import json
+from urllib.parse import parse_qs
+
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, TokenError
+
+from . import battle_protocol, inbox, live_leaderboard, spectators, timers
+from .profiling import profile_ws_message
+
+
+def token_user_id(token):
+    """User id from a JWT access token, or None when it is invalid"""
+    if not token:
+        return None
+    try:
+        # Recent simplejwt versions store the claim as a string
+        return int(AccessToken(token)[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError, ValueError):
+        return None
 
 
 class BattleConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for real-time battle functionality.
     This is a placeholder for future multiplayer features.
+    
+    Frames use the protocol in battle_protocol.py: JSON or msgpack chosen
+    per connection, events coalesced per tick and encoded once per room.
+    A {"type": "question", "question": <id>, "time_limit": <s>} event arms a
+    deadline; when it passes the room gets {"type": "deadline", "question": <id>}.
+    Viewers connect to ws/battle/<room>/watch/ instead (BattleSpectatorConsumer).
     """
     
     async def connect(self):
         self.room_name = self.scope['url_route']['kwargs']['room_name']
-        self.room_group_name = f'battle_{self.room_name}'
+        self.room_group_name = battle_protocol.group_name(self.room_name)
+        self.protocol = battle_protocol.negotiate(self.scope.get('subprotocols', []))
         
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
         
-        await self.accept()
+        await self.accept(subprotocol=self.protocol)
     
     async def disconnect(self, close_code):
         await self.channel_layer.group_discard(
@@ -25,19 +50,117 @@ class BattleConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
     
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message_type = text_data_json.get('type')
+    @profile_ws_message('ws:battle')
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            events = battle_protocol.decode(text_data, bytes_data)
+        except battle_protocol.ProtocolError:
+            await self.close(code=4400)
+            return
         
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'battle_message',
-                'message': text_data_json
-            }
-        )
+        for event in events:
+            # A question announced with a valid time limit gets a room-wide deadline
+            if event.get('type') == 'question':
+                timers.arm_question_deadline(self.room_name, event.get('question'), event.get('time_limit'))
+        
+        await battle_protocol.batcher.add(self.channel_layer, self.room_name, events)
+    
+    async def battle_frame(self, event):
+        # Already encoded by the sender; just pick this connection's format
+        await self.send(**battle_protocol.send_kwargs(event, self.protocol))
+
+
+class BattleSpectatorConsumer(AsyncWebsocketConsumer):
+    """
+    Read-only view of a battle room: ws/battle/<room>/watch/. Receives the
+    players' frames, in the same negotiated format, through this process's
+    spectator hub (spectators.py) rather than the room's group.
+    """
     
-    async def battle_message(self, event):
-        message = event['message']
+    async def connect(self):
+        self.room_name = self.scope['url_route']['kwargs']['room_name']
+        self.protocol = battle_protocol.negotiate(self.scope.get('subprotocols', []))
+        self.hub = None
+        # Only checked here: the hub is created on subscribe, after accepting
+        if spectators.is_full(self.room_name):
+            await self.close(code=4429)
+            return
         
-        await self.send(text_data=json.dumps(message))
+        await self.accept(subprotocol=self.protocol)
+        # Looked up again: the hub may have closed or filled up while accepting
+        self.hub = spectators.subscribe(self.room_name, self, self.protocol)
+        if self.hub is None:
+            await self.close(code=4429)
+    
+    async def disconnect(self, close_code):
+        if self.hub is not None:
+            self.hub.unsubscribe(self)
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        # Spectators can't send events to the room
+        pass
+
+
+class LeaderboardConsumer(AsyncWebsocketConsumer):
+    """
+    Live leaderboard: ws/leaderboard/?period=weekly&token=<access token>.
+    The token is optional; with it the feed also tracks the user's own rank.
+    """
+    
+    async def connect(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        period = params.get('period', ['overall'])[0]
+        if period not in live_leaderboard.PERIODS:
+            await self.close(code=4400)
+            return
+        
+        self.user_id = None
+        token = params.get('token', [None])[0]
+        if token:
+            self.user_id = token_user_id(token)
+            if self.user_id is None:
+                await self.close(code=4401)
+                return
+        
+        await self.accept()
+        self.feed = live_leaderboard.get_feed(period)
+        await self.feed.subscribe(self, self.user_id)
+    
+    async def disconnect(self, close_code):
+        feed = getattr(self, 'feed', None)
+        if feed is not None:
+            feed.unsubscribe(self)
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        # Read-only feed
+        pass
+
+
+class ChallengeInboxConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes the user's challenge inbox entries as they are created or change
+    status: ws/challenges/?token=<access token>. Frames carry the same
+    entry shape as GET /api/challenges/inbox/.
+    """
+    
+    async def connect(self):
+        params = parse_qs(self.scope.get('query_string', b'').decode())
+        self.user_id = token_user_id(params.get('token', [''])[0])
+        if self.user_id is None:
+            await self.close(code=4401)
+            return
+        
+        self.group_name = inbox.group_name(self.user_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        if getattr(self, 'group_name', None):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive(self, text_data=None, bytes_data=None):
+        # Read-only feed
+        pass
+    
+    async def inbox_entry(self, event):
+        await self.send(text_data=json.dumps({'type': 'challenge', 'entry': event['entry']}))
@@ -0,0 +1,130 @@
+"""
+Primary/replica database routing.
+
+Writes always go to the primary ('default'). Reads go to a replica only inside
+views explicitly marked with @replica_reads (catalog, leaderboard and stats),
+and only when the current user has not written recently: every write pins the
+user to the primary for DATABASE_REPLICA_PIN_SECONDS so they read their own
+writes (e.g. the leaderboard right after a submit) while replicas catch up.
+
+Views whose responses are tagged with a version counter (versioning.py) name
+it: @replica_reads(versions=[CATALOG]). Their reads stay on the primary for
+DATABASE_REPLICA_PIN_SECONDS after every bump of the counter, for everyone.
+Otherwise a lagging replica would render the old rows under the new ETag,
+and they would be cached (views._boards) and answered 304 until the next
+bump.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .versioning import settled
+
+
+class RequestDBState:
+    __slots__ = ('use_replica', 'wrote')
+
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+# A mutable holder so flags set in a worker thread (sync_to_async) are visible
+# to the middleware that created it.
+_state = ContextVar('db_routing_state', default=None)
+
+
+def begin_request():
+    return _state.set(RequestDBState())
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def note_write():
+    """Record a write made on this request's behalf outside the router"""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Route this user's replica-eligible reads to the primary for a while"""
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), 1, timeout=settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+def replica_allowed(user, versions=()):
+    """True if this user's reads may go to a replica, given the view's version counters"""
+    return bool(settings.DATABASE_REPLICAS) and not is_pinned(user) and settled(*versions)
+
+
+def replica_reads(view_func=None, versions=()):
+    """
+    Let a read-only view be served from a replica. Works on @api_view
+    functions and (through method_decorator) on viewset actions; it runs after
+    DRF has authenticated the request, so stickiness can be checked per user.
+    `versions` names the counters the view's ETag is derived from.
+    """
+    if view_func is None:
+        return lambda view_func: replica_reads(view_func, versions)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None or not replica_allowed(request.user, versions):
+            return view_func(request, *args, **kwargs)
+        state.use_replica = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state.use_replica = False
+    return wrapper
+
+
+def enable_replica_reads(user, versions=()):
+    """
+    Async views' equivalent of @replica_reads: route the rest of this
+    request's reads to a replica unless the user is pinned to the primary
+    or one of `versions` was bumped too recently.
+    """
+    state = _state.get()
+    if state is not None and replica_allowed(user, versions):
+        state.use_replica = True
+
+
+class PrimaryReplicaRouter:
+    """Send writes to the primary and opted-in reads to a random replica"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is not None and state.use_replica and not state.wrote:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary and replicas hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,267 @@
+"""
+Near-duplicate question detection with MinHash and LSH.
+
+A question's text and options are normalized (lowercased, punctuation and
+whitespace collapsed to single spaces) and cut into character 5-gram
+shingles. Quiz questions are short, and character shingles keep a one-word
+edit from wiping out most of the set. Each shingle is hashed once (crc32).
+numpy then applies all NUM_PERM hash functions as one array expression,
+(a * x + b) mod p, and keeps the minimum per function. The resulting
+128 x uint32 signature estimates Jaccard similarity: the fraction of
+positions on which two signatures agree.
+
+The signature is stored on the question (Question.minhash). It is also
+split into BANDS bands of ROWS values, and each band is hashed to a row
+of QuestionLSHBucket, indexed on (band, bucket). Questions sharing any
+bucket are candidates; with 16 x 8 bands, pairs above ~0.7 similarity
+almost always share one and pairs below ~0.4 almost never do. Checking an
+incoming question therefore costs 16 index lookups plus a comparison with
+the few candidates, not a scan of the bank.
+
+Signatures are kept current from post_save (signals.py). Questions written
+without signals are picked up by index_missing(), which the
+`dedup_questions` command runs first and the INDEX job runs when an admin
+asks for it (POST /api/admin/questions/duplicates/index/). The admin report
+itself only reads, and says how many questions are still unsigned.
+"""
+import hashlib
+import re
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from . import jobs
+from .models import Question, QuestionLSHBucket
+from .sqlite import run_write
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+
+INDEX = 'dedup.index'
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+# Fixed seed: signatures must stay comparable across processes and releases
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)[:, None]
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def content(question_text, options):
+    """The text a question is compared on: its wording and its options"""
+    if isinstance(options, (list, tuple)):
+        question_text = f"{question_text} {' '.join(str(option) for option in options)}"
+    return question_text or ''
+
+
+def shingles(text):
+    text = _SEPARATORS.sub(' ', text.lower()).strip()
+    if len(text) <= SHINGLE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def signature(text):
+    """MinHash signature (NUM_PERM uint32) of a text"""
+    hashed = np.fromiter(
+        (zlib.crc32(shingle.encode()) for shingle in shingles(text)), dtype=np.uint64)
+    if not hashed.size:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    # uint64 products wrap around; that is part of the hash family
+    with np.errstate(over='ignore'):
+        permuted = ((_A * hashed[None, :] + _B) % _MERSENNE) & _MAX_HASH
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def bands(sig):
+    """One signed 64-bit bucket key per band"""
+    raw = sig.astype('<u4').tobytes()
+    width = ROWS * 4
+    return [
+        int.from_bytes(hashlib.blake2b(raw[i * width:(i + 1) * width], digest_size=8).digest(), 'little', signed=True)
+        for i in range(BANDS)
+    ]
+
+
+def similarity(sig, others):
+    """Estimated Jaccard similarity of `sig` to each row of `others`"""
+    return (np.asarray(others) == sig).mean(axis=-1)
+
+
+def from_bytes(blob):
+    return np.frombuffer(bytes(blob), dtype='<u4')
+
+
+# Index maintenance
+
+def index_questions(questions, using='default'):
+    """Store signatures and LSH buckets for saved questions"""
+    questions = list(questions)
+    if not questions:
+        return
+    signatures, buckets = [], []
+    for question in questions:
+        sig = signature(content(question.question_text, question.options))
+        question.minhash = sig.astype('<u4').tobytes()
+        signatures.append((question.minhash, question.pk))
+        buckets.extend((question.pk, band, bucket) for band, bucket in enumerate(bands(sig)))
+    # Plain executemany: at 16 bucket rows per question, building model
+    # instances costs several times more than the hashing
+    questions_table = Question._meta.db_table
+    buckets_table = QuestionLSHBucket._meta.db_table
+    ids = [question.pk for question in questions]
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.executemany(f'UPDATE {questions_table} SET minhash = %s WHERE id = %s', signatures)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor.execute(
+                f"DELETE FROM {buckets_table} WHERE question_id IN ({', '.join(['%s'] * len(chunk))})", chunk)
+        cursor.executemany(f'INSERT INTO {buckets_table} (question_id, band, bucket) VALUES (%s, %s, %s)', buckets)
+
+
+def index_missing(chunk_size=1000):
+    """Sign questions that have no signature yet; returns how many"""
+    count = 0
+    while True:
+        chunk = list(Question.objects.filter(minhash__isnull=True).only(
+            'id', 'question_text', 'options')[:chunk_size])
+        if not chunk:
+            return count
+        index_questions(chunk)
+        count += len(chunk)
+
+
+def unsigned_count():
+    return Question.objects.filter(minhash__isnull=True).count()
+
+
+def schedule_index():
+    """Queue an index_missing() pass unless one is already waiting; returns the job or None"""
+    return jobs.enqueue(INDEX, coalesce=True)
+
+
+@jobs.task(INDEX, batch_size=10)
+def index_job(batch):
+    # One pass signs everything unsigned, whatever number of requests queued it
+    run_write(index_missing)
+
+
+# Lookups
+
+def find_similar(question_text, options=None, threshold=None, exclude=None):
+    """
+    [(question_id, similarity)] for indexed questions at or above `threshold`,
+    most similar first. Cost grows with the number of candidates, not the bank.
+    """
+    threshold = settings.DEDUP_THRESHOLD if threshold is None else threshold
+    sig = signature(content(question_text, options))
+    lookup = Q()
+    for band, bucket in enumerate(bands(sig)):
+        lookup |= Q(band=band, bucket=bucket)
+    candidates = set(QuestionLSHBucket.objects.filter(lookup).values_list('question_id', flat=True))
+    candidates.discard(exclude)
+    if not candidates:
+        return []
+    rows = list(Question.objects.filter(id__in=candidates, minhash__isnull=False).values_list('id', 'minhash'))
+    if not rows:
+        # Every candidate's signature was cleared (dedup_questions --rebuild)
+        return []
+    ids, blobs = zip(*rows)
+    scores = similarity(sig, np.stack([from_bytes(blob) for blob in blobs]))
+    matches = [(question_id, float(score)) for question_id, score in zip(ids, scores) if score >= threshold]
+    return sorted(matches, key=lambda match: -match[1])
+
+
+def clusters(threshold=None, max_bucket=50):
+    """
+    Groups of near-duplicate question ids among everything indexed, largest
+    first. Pairs come from shared LSH buckets and are confirmed on their
+    signatures. In buckets larger than `max_bucket`, members are compared
+    to the first one only, to stay out of quadratic territory.
+    """
+    threshold = settings.DEDUP_THRESHOLD if threshold is None else threshold
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            parent[x] = parent.get(parent[x], parent[x])
+            x = parent[x]
+        return x
+
+    def union(x, y):
+        root_x, root_y = find(x), find(y)
+        if root_x != root_y:
+            parent[max(root_x, root_y)] = min(root_x, root_y)
+            # Roots are listed too, or they would be missing from their group
+            parent.setdefault(min(root_x, root_y), min(root_x, root_y))
+
+    pairs = set()
+    members = []
+    current = None
+    rows = QuestionLSHBucket.objects.order_by('band', 'bucket', 'question_id').values_list(
+        'band', 'bucket', 'question_id')
+    for band, bucket, question_id in rows.iterator(chunk_size=10000):
+        if (band, bucket) != current:
+            _bucket_pairs(members, max_bucket, pairs)
+            current, members = (band, bucket), []
+        members.append(question_id)
+    _bucket_pairs(members, max_bucket, pairs)
+    if not pairs:
+        return []
+
+    ids = sorted({question_id for pair in pairs for question_id in pair})
+    signatures = {}
+    for start in range(0, len(ids), 5000):
+        for question_id, blob in Question.objects.filter(
+                id__in=ids[start:start + 5000], minhash__isnull=False).values_list('id', 'minhash'):
+            signatures[question_id] = from_bytes(blob)
+    pairs = [pair for pair in pairs if pair[0] in signatures and pair[1] in signatures]
+    if not pairs:
+        return []
+    left = np.stack([signatures[a] for a, _ in pairs])
+    right = np.stack([signatures[b] for _, b in pairs])
+    scores = (left == right).mean(axis=1)
+    for (a, b), score in zip(pairs, scores):
+        if score >= threshold:
+            union(a, b)
+
+    groups = defaultdict(list)
+    for question_id in parent:
+        groups[find(question_id)].append(question_id)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: (-len(group), group[0]))
+
+
+def _bucket_pairs(members, max_bucket, pairs):
+    if len(members) < 2:
+        return
+    if len(members) > max_bucket:
+        pairs.update((members[0], other) for other in members[1:])
+        return
+    pairs.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+
+
+def report(threshold=None):
+    """Clusters with their questions, for the admin report"""
+    groups = clusters(threshold)
+    questions = Question.objects.select_related('category').in_bulk(
+        [question_id for group in groups for question_id in group])
+    return [
+        [
+            {
+                'id': question_id,
+                'title': questions[question_id].title,
+                'category': questions[question_id].category.name,
+                'question_text': questions[question_id].question_text,
+            }
+            for question_id in group if question_id in questions
+        ]
+        for group in groups
+    ]
@@ -0,0 +1,101 @@
+"""
+Challenge inbox: one denormalized ChallengeInboxEntry per participant and
+challenge, written in the same transaction as the challenge itself (see
+signals.py). The inbox endpoint (ChallengeViewSet.inbox) pages these rows by
+keyset without any joins.
+
+After commit, the participants' entries are also pushed to their open inbox
+websockets (ws/challenges/). Pushes go through the channel layer, so they
+reach sockets held by other worker processes only when CHANNEL_LAYERS is a
+shared backend such as Redis.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Challenge, ChallengeInboxEntry
+
+logger = logging.getLogger(__name__)
+
+
+def group_name(user_id):
+    return f'inbox_{user_id}'
+
+
+def _entry_fields(challenge):
+    common = {
+        'status': challenge.status,
+        'category_id': challenge.category_id,
+        'category_name': challenge.category.name,
+        'winner_id': challenge.winner_id,
+        'winner_name': challenge.winner.username if challenge.winner else '',
+        'created_at': challenge.created_at,
+    }
+    sides = {
+        challenge.challenger_id: dict(
+            role='SENT', counterpart_id=challenge.opponent_id,
+            counterpart_name=challenge.opponent.username if challenge.opponent else '', **common
+        ),
+    }
+    if challenge.opponent_id:
+        sides[challenge.opponent_id] = dict(
+            role='RECEIVED', counterpart_id=challenge.challenger_id,
+            counterpart_name=challenge.challenger.username, **common
+        )
+    return sides
+
+
+def sync_challenge(challenge):
+    """Upsert the inbox entries of a saved challenge; push them after commit"""
+    challenge = Challenge.objects.select_related('challenger', 'opponent', 'category', 'winner').get(pk=challenge.pk)
+    sides = _entry_fields(challenge)
+    # An opponent that was removed from the challenge loses the entry
+    ChallengeInboxEntry.objects.filter(challenge=challenge).exclude(user_id__in=sides).delete()
+    entries = [
+        ChallengeInboxEntry.objects.update_or_create(user_id=user_id, challenge=challenge, defaults=fields)[0]
+        for user_id, fields in sides.items()
+    ]
+    transaction.on_commit(lambda: push(entries))
+
+
+def mark_status(challenge_ids, status):
+    """Mirror a bulk status change (queryset.update skips post_save)"""
+    challenge_ids = list(challenge_ids)
+    changed = []
+    for start in range(0, len(challenge_ids), 500):
+        entries = ChallengeInboxEntry.objects.filter(challenge_id__in=challenge_ids[start:start + 500])
+        entries.update(status=status, updated_at=timezone.now())
+        changed.extend(entries)
+    if changed:
+        transaction.on_commit(lambda: push(changed))
+
+
+def push(entries):
+    from .serializers import ChallengeInboxSerializer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for entry in entries:
+        try:
+            async_to_sync(channel_layer.group_send)(group_name(entry.user_id), {
+                'type': 'inbox.entry', 'entry': ChallengeInboxSerializer(entry).data,
+            })
+        except Exception:
+            # The inbox endpoint stays authoritative; a lost push is not fatal
+            logger.exception('inbox push for user %s failed', entry.user_id)
+
+
+def rename_user(user):
+    ChallengeInboxEntry.objects.filter(counterpart=user).exclude(
+        counterpart_name=user.username).update(counterpart_name=user.username)
+    ChallengeInboxEntry.objects.filter(winner=user).exclude(
+        winner_name=user.username).update(winner_name=user.username)
+
+
+def rename_category(category):
+    ChallengeInboxEntry.objects.filter(category=category).exclude(
+        category_name=category.name).update(category_name=category.name)
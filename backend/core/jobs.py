@@ -0,0 +1,234 @@
+"""
+Local job queue for work that doesn't need to finish inside the request.
+
+Jobs are rows in the Job table, so there is no broker to run. enqueue()
+called inside a transaction commits (or rolls back) together with the
+write that caused it. Workers (`manage.py run_jobs`) poll for ready jobs,
+claim a batch with a conditional UPDATE, and hand each task all of its
+claimed jobs at once.
+
+* Batching: a task handler receives a list of jobs, so e.g. a burst of
+  submits can be folded into one pass.
+* Retries: when a handler raises, its jobs are retried with exponential
+  backoff (JOB_RETRY_BACKOFF * 2**attempt) until max_attempts, then marked
+  FAILED. Handlers must therefore be idempotent.
+* Idempotency: an idempotency_key is unique. Enqueueing it again while
+  the job is still kept (JOB_RETENTION_SECONDS) does nothing. coalesce=True
+  instead skips the insert when the same task is already waiting, which
+  suits "catch up from a cursor" tasks.
+* Leases: a job left RUNNING for JOB_LEASE_SECONDS (a worker died) goes back
+  to PENDING.
+
+queue_depth() and the quiz_job_* gauges on /api/metrics/ show how much is
+waiting and how old the oldest ready job is.
+"""
+import logging
+import os
+import time
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+class Task:
+    def __init__(self, name, handler, batch_size, max_attempts):
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+
+
+def task(name, batch_size=100, max_attempts=5):
+    """Register a handler taking a list of Job rows of this task"""
+    def register(handler):
+        TASKS[name] = Task(name, handler, batch_size, max_attempts)
+        return handler
+    return register
+
+
+def enqueue(name, payload=None, key=None, delay=0, coalesce=False):
+    """
+    Queue a job; returns it, or None when it was deduplicated. Call inside the
+    transaction that makes the job necessary so both commit together.
+    """
+    run_after = timezone.now() + timedelta(seconds=delay)
+    if coalesce and Job.objects.filter(status='PENDING', name=name).exists():
+        return None
+    job = Job(
+        name=name, payload=payload or {}, idempotency_key=key, run_after=run_after,
+        max_attempts=TASKS[name].max_attempts if name in TASKS else 5,
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        return None
+    return job
+
+
+def enqueue_many(name, payloads, delay=0):
+    """Queue one job per payload with bulk inserts; no idempotency keys or coalescing"""
+    run_after = timezone.now() + timedelta(seconds=delay)
+    max_attempts = TASKS[name].max_attempts if name in TASKS else 5
+    return Job.objects.bulk_create([
+        Job(name=name, payload=payload, run_after=run_after, max_attempts=max_attempts)
+        for payload in payloads
+    ], batch_size=500)
+
+
+def claim(limit=100, names=None):
+    """Lock up to `limit` ready jobs for this worker and return them"""
+    now = timezone.now()
+    ready = Job.objects.filter(status='PENDING', run_after__lte=now)
+    if names:
+        ready = ready.filter(name__in=names)
+    ids = list(ready.order_by('id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = f'{os.getpid()}-{uuid.uuid4().hex[:12]}'
+    # Only rows still PENDING are taken, so concurrent workers never share a job
+    Job.objects.filter(id__in=ids, status='PENDING').update(
+        status='RUNNING', locked_by=token, locked_at=now, attempts=F('attempts') + 1)
+    return list(Job.objects.filter(locked_by=token, status='RUNNING'))
+
+
+def run_batch(jobs):
+    """Run claimed jobs grouped by task; returns (done, retried, failed)"""
+    by_name = defaultdict(list)
+    for job in jobs:
+        by_name[job.name].append(job)
+    done = retried = failed = 0
+    for name, group in by_name.items():
+        registered = TASKS.get(name)
+        try:
+            if registered is None:
+                raise LookupError(f'no task registered as {name!r}')
+            for start in range(0, len(group), registered.batch_size):
+                chunk = group[start:start + registered.batch_size]
+                registered.handler(chunk)
+                _finish(chunk)
+                done += len(chunk)
+        except Exception:
+            # Chunks that already finished stay DONE; the rest is retried
+            remaining = [job for job in group if job.status == 'RUNNING']
+            logger.exception('%d %s jobs failed', len(remaining), name)
+            r, f = _retry(remaining, traceback.format_exc(limit=5))
+            retried += r
+            failed += f
+    return done, retried, failed
+
+
+def _finish(jobs):
+    Job.objects.filter(id__in=[job.id for job in jobs]).update(
+        status='DONE', finished_at=timezone.now(), locked_by='')
+    for job in jobs:
+        job.status = 'DONE'
+
+
+def _retry(jobs, error):
+    now = timezone.now()
+    retried = failed = 0
+    for job in jobs:
+        if job.attempts >= job.max_attempts:
+            Job.objects.filter(id=job.id).update(
+                status='FAILED', finished_at=now, locked_by='', last_error=error)
+            failed += 1
+        else:
+            backoff = settings.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            Job.objects.filter(id=job.id).update(
+                status='PENDING', run_after=now + timedelta(seconds=backoff), locked_by='', last_error=error)
+            retried += 1
+    return retried, failed
+
+
+def requeue_stale():
+    """Put jobs whose worker disappeared mid-run back in the queue"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    return Job.objects.filter(status='RUNNING', locked_at__lt=cutoff).update(status='PENDING', locked_by='')
+
+
+def purge_finished():
+    """Drop finished jobs past JOB_RETENTION_SECONDS (their keys become reusable)"""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_RETENTION_SECONDS)
+    deleted, _ = Job.objects.filter(status__in=['DONE', 'FAILED'], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def queue_depth():
+    """{'counts': {(name, status): n}, 'oldest_ready_seconds': float} for unfinished jobs"""
+    counts = {
+        (row['name'], row['status']): row['n']
+        for row in Job.objects.filter(status__in=['PENDING', 'RUNNING', 'FAILED'])
+        .values('name', 'status').annotate(n=Count('id'))
+    }
+    oldest = Job.objects.filter(status='PENDING', run_after__lte=timezone.now()).aggregate(at=Min('run_after'))['at']
+    lag = (timezone.now() - oldest).total_seconds() if oldest else 0.0
+    return {'counts': counts, 'oldest_ready_seconds': lag}
+
+
+def metric_lines():
+    """Prometheus gauges for the queue (shared by all processes, so no pid label)"""
+    depth = queue_depth()
+    lines = [
+        '# HELP quiz_job_queue_depth Unfinished and failed jobs by task and status.',
+        '# TYPE quiz_job_queue_depth gauge',
+    ]
+    for (name, status), count in sorted(depth['counts'].items()):
+        lines.append(f'quiz_job_queue_depth{{name="{name}",status="{status}"}} {count}')
+    lines += [
+        '# HELP quiz_job_queue_lag_seconds Age of the oldest job that is ready to run.',
+        '# TYPE quiz_job_queue_lag_seconds gauge',
+        f'quiz_job_queue_lag_seconds {depth["oldest_ready_seconds"]:.3f}',
+    ]
+    return lines
+
+
+class Worker:
+    """Poll, claim, run; also requeues stale leases and purges old jobs"""
+
+    def __init__(self, names=None, batch_size=None, poll=None):
+        self.names = names
+        self.batch_size = batch_size or settings.JOB_BATCH_SIZE
+        self.poll = settings.JOB_POLL_SECONDS if poll is None else poll
+        self._housekeeping_at = 0
+
+    def run_once(self):
+        """Run one claimed batch; returns the number of jobs processed"""
+        jobs = claim(self.batch_size, self.names)
+        if jobs:
+            run_batch(jobs)
+        return len(jobs)
+
+    def run(self, stop_when_idle=False):
+        while True:
+            if time.monotonic() - self._housekeeping_at > settings.JOB_LEASE_SECONDS / 2:
+                self._housekeeping_at = time.monotonic()
+                requeued = requeue_stale()
+                if requeued:
+                    logger.warning('requeued %d jobs with expired leases', requeued)
+                purge_finished()
+            try:
+                processed = self.run_once()
+            except Exception:
+                logger.exception('job worker iteration failed')
+                connection.close()
+                processed = 0
+            if not processed:
+                if stop_when_idle:
+                    return
+                time.sleep(self.poll)
@@ -0,0 +1,200 @@
+"""
+Live leaderboard feed served over ws/leaderboard/.
+
+Each worker process keeps one feed per period. While it has subscribers, the
+feed checks the leaderboard version counter (versioning.py) every
+LIVE_LEADERBOARD_TICK seconds. A burst of submits therefore costs one
+recompute and one broadcast per tick, and the check also picks up writes
+made by other workers. Nothing happens while the counter stays the same.
+
+Frames sent to a subscriber:
+
+    {"type": "snapshot", "seq": 7, "period": "overall", "leaderboard": [...], "me": {...}}
+    {"type": "diff", "seq": 8, "changes": [...], "removed": [user ids]}
+    {"type": "rank", "seq": 8, "me": {"rank": 12, "points": 340}}
+
+A snapshot is sent on connect. After that a subscriber gets a diff when
+the top LIVE_LEADERBOARD_SIZE changes. `changes` lists the entries whose
+rank or content changed. `removed` lists the users who dropped out of the
+top. Clients apply only the diffs with a seq greater than their snapshot's.
+A rank frame is sent when the subscriber's own rank or points change;
+anonymous subscribers get no "me" and no rank frames.
+
+The diff is encoded once per tick and the same string goes to every
+subscriber. Rank frames are encoded once per subscribed user.
+"""
+import asyncio
+import json
+import logging
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .versioning import leaderboard_state
+from .views import LEADERBOARD_PERIODS, leaderboard_entry, leaderboard_queryset
+
+logger = logging.getLogger(__name__)
+
+PERIODS = LEADERBOARD_PERIODS
+# Subscribers ranked per query by load_ranks()
+RANK_BATCH = 50
+
+
+def encode(frame):
+    return json.dumps(frame, separators=(',', ':'))
+
+
+def load_board(period, size):
+    return [
+        dict(leaderboard_entry(profile), rank=rank)
+        for rank, profile in enumerate(leaderboard_queryset(period, size), 1)
+    ]
+
+
+def load_ranks(period, user_ids):
+    """{user_id: (rank, points)} for the given users"""
+    if not user_ids:
+        return {}
+    # A user's rank is 1 + the profiles ahead of it on the board (more
+    # points, or as many and a lower id). Each is a filtered count, RANK_BATCH
+    # of them per query, over only the rows at or above the batch's lowest
+    # points, so the board is never sorted or read past its subscribers.
+    board = leaderboard_queryset(period, limit=None).order_by()
+    placed = sorted(
+        board.filter(user_id__in=user_ids).values_list('user_id', 'id', 'period_points'),
+        key=lambda row: -row[2])
+    ranks = {}
+    for start in range(0, len(placed), RANK_BATCH):
+        chunk = placed[start:start + RANK_BATCH]
+        ahead = board.filter(period_points__gte=chunk[-1][2]).aggregate(**{
+            f'ahead_{user_id}': Count('id', filter=Q(period_points__gt=points) | Q(
+                period_points=points, id__lt=profile_id))
+            for user_id, profile_id, points in chunk
+        })
+        for user_id, _, points in chunk:
+            ranks[user_id] = (ahead[f'ahead_{user_id}'] + 1, points)
+    return ranks
+
+
+def diff_boards(old, new):
+    """Entries of `new` that are new or changed, and user ids that left"""
+    previous = {entry['id']: entry for entry in old}
+    changes = [entry for entry in new if previous.get(entry['id']) != entry]
+    current = {entry['id'] for entry in new}
+    removed = [user_id for user_id in previous if user_id not in current]
+    return changes, removed
+
+
+def _me(rank):
+    return {'rank': rank[0], 'points': rank[1]} if rank else None
+
+
+class LeaderboardFeed:
+    """Top-N board for one period, shared by every subscriber in the process"""
+
+    def __init__(self, period, size):
+        self.period = period
+        self.size = size
+        self.subscribers = {}  # consumer -> user id (None when anonymous)
+        self.board = []
+        self.ranks = {}  # user id -> (rank, points) as last sent
+        self.seq = 0
+        self.state = None
+        self.recheck = set()  # user ids whose rank was read at another state
+        self._task = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self, consumer, user_id):
+        rank = rank_state = None
+        if user_id is not None:
+            # The rank is a count query; done outside the lock so connecting
+            # clients don't queue behind each other's queries
+            rank_state = await database_sync_to_async(leaderboard_state)(self.period)
+            ranks = await database_sync_to_async(load_ranks)(self.period, [user_id])
+            rank = ranks.get(user_id)
+        async with self._lock:
+            if self.state is None:
+                await self._refresh()
+            if user_id is not None:
+                self.ranks.setdefault(user_id, rank)
+                if rank_state != self.state:
+                    # A tick may have moved it meanwhile; the next one re-reads it
+                    self.recheck.add(user_id)
+            self.subscribers[consumer] = user_id
+            await consumer.send(text_data=encode({
+                'type': 'snapshot', 'seq': self.seq, 'period': self.period,
+                'leaderboard': self.board, 'me': _me(rank),
+            }))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, consumer):
+        user_id = self.subscribers.pop(consumer, None)
+        if user_id is not None and user_id not in self.subscribers.values():
+            self.ranks.pop(user_id, None)
+
+    async def _run(self):
+        while self.subscribers:
+            await asyncio.sleep(settings.LIVE_LEADERBOARD_TICK)
+            try:
+                async with self._lock:
+                    await self._tick()
+            except Exception:
+                logger.exception('live leaderboard tick failed (%s)', self.period)
+        # Forget the board so the next first subscriber reloads it
+        self.state = None
+
+    async def _refresh(self):
+        self.state = await database_sync_to_async(leaderboard_state)(self.period)
+        self.board = await database_sync_to_async(load_board)(self.period, self.size)
+
+    async def _tick(self):
+        state = await database_sync_to_async(leaderboard_state)(self.period)
+        recheck, self.recheck = self.recheck, set()
+        if not self.subscribers or (state == self.state and not recheck):
+            return
+        user_ids = {user_id for user_id in self.subscribers.values() if user_id is not None}
+        if state == self.state:
+            # Only ranks read during a subscribe need checking
+            board = self.board
+            user_ids &= recheck
+        else:
+            self.state = state
+            board = await database_sync_to_async(load_board)(self.period, self.size)
+        ranks = await database_sync_to_async(load_ranks)(self.period, user_ids)
+
+        changes, removed = diff_boards(self.board, board)
+        self.board = board
+        self.seq += 1
+        broadcast = encode({'type': 'diff', 'seq': self.seq, 'changes': changes, 'removed': removed}) \
+            if changes or removed else None
+
+        moved = {user_id for user_id in user_ids if ranks.get(user_id) != self.ranks.get(user_id)}
+        for user_id in moved:
+            self.ranks[user_id] = ranks.get(user_id)
+        rank_frames = {
+            user_id: encode({'type': 'rank', 'seq': self.seq, 'me': _me(ranks.get(user_id))})
+            for user_id in moved
+        }
+
+        sends = []
+        for consumer, user_id in list(self.subscribers.items()):
+            if broadcast is not None:
+                sends.append(consumer.send(text_data=broadcast))
+            if user_id in rank_frames:
+                sends.append(consumer.send(text_data=rank_frames[user_id]))
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.debug('live leaderboard send failed: %r', result)
+
+
+_feeds = {}
+
+
+def get_feed(period):
+    feed = _feeds.get(period)
+    if feed is None:
+        feed = _feeds[period] = LeaderboardFeed(period, settings.LIVE_LEADERBOARD_SIZE)
+    return feed
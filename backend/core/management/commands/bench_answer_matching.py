@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.answers import AnswerMatcher, normalize
+
+ANSWERS = [
+    'true', 'false', 'polymorphism', 'garbage collector', 'dependency injection', 'hypertext transfer protocol',
+    'binary search tree', '127.0.0.1', '42', 'O(log n)', 'kubernetes', 'transmission control protocol',
+]
+
+
+def levenshtein(a, b):
+    # Unbounded reference: what grading per request without matchers would do
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+def typo(text, rng):
+    if len(text) < 2:
+        return text
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice('abcdefghijklmnopqrstuvwxyz') + text[i + 1:]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks grading of QUICK answers with compiled matchers against per-request fuzzy matching'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grades', type=int, default=20_000)
+        parser.add_argument('--aliases', type=int, default=8, help='Extra aliases per question')
+
+    def handle(self, *args, **options):
+        rng = random.Random(3)
+        questions = []
+        for answer in ANSWERS:
+            aliases = [f'{answer} {rng.choice(ANSWERS)}' for _ in range(options['aliases'])]
+            questions.append((answer, aliases))
+
+        started = time.perf_counter()
+        matchers = [AnswerMatcher((answer, *aliases)) for answer, aliases in questions for _ in range(100)]
+        compile_us = (time.perf_counter() - started) / len(matchers) * 1e6
+        self.stdout.write(f'Compile: {compile_us:.1f} us per question ({1 + options["aliases"]} answers)')
+
+        kinds = {
+            'exact': lambda answer: answer,
+            'case/punct': lambda answer: f' {answer.upper()}. ',
+            'typo': lambda answer: typo(answer, rng),
+            'wrong': lambda answer: rng.choice(ANSWERS) + 'x',
+        }
+        for kind, make in kinds.items():
+            cases = []
+            for _ in range(options['grades']):
+                index = rng.randrange(len(questions))
+                cases.append((index, make(questions[index][0])))
+            compiled = self._time(lambda index, text: matchers[index * 100].matches(text), cases)
+            naive = self._time(lambda index, text: self._naive(questions[index], text), cases)
+            self.stdout.write(
+                f'  {kind:<11} compiled {statistics.mean(compiled) * 1e6:6.2f} us   '
+                f'per-request {statistics.mean(naive) * 1e6:7.2f} us   '
+                f'({statistics.mean(naive) / statistics.mean(compiled):.0f}x)'
+            )
+
+    def _naive(self, question, text):
+        answer, aliases = question
+        text = normalize(text)
+        for form in (answer, *aliases):
+            form = normalize(form)
+            if text == form or levenshtein(text, form) <= (2 if len(form) >= 10 else 1 if len(form) >= 5 else 0):
+                return True
+        return False
+
+    def _time(self, grade, cases):
+        timings = []
+        for index, text in cases:
+            started = time.perf_counter()
+            grade(index, text)
+            timings.append(time.perf_counter() - started)
+        return timings
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import random
+import time
+
+import msgpack
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from core import battle_protocol
+
+STRATEGIES = ('legacy', 'json', 'msgpack', 'coalesced')
+
+
+def _event(i):
+    return {'type': 'answer', 'player': f'player_{i % 8}', 'question': random.randrange(1000),
+            'answer': random.randrange(4), 'elapsed_ms': random.randrange(30000), 'seq': i}
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark of battle room fan-out: events and deliveries per second on one core'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=8, help='Players per room')
+        parser.add_argument('--events', type=int, default=20000, help='Incoming events per strategy')
+        parser.add_argument('--batch', type=int, default=16, help='Events per frame for the coalesced strategy')
+
+    def handle(self, *args, **options):
+        incoming_json = [json.dumps(_event(i)) for i in range(options['events'])]
+        incoming_msgpack = [msgpack.packb(_event(i), use_bin_type=True) for i in range(options['events'])]
+        self.stdout.write(
+            f"{options['members']} members per room, {options['events']} events, "
+            f"coalesced batch of {options['batch']} (CPU time, one core)"
+        )
+        for strategy in STRATEGIES:
+            incoming = incoming_msgpack if strategy == 'msgpack' else incoming_json
+            seconds, deliveries, frames, payload = asyncio.run(
+                self.run(strategy, incoming, options['members'], options['batch'])
+            )
+            events = len(incoming)
+            self.stdout.write(
+                f'{strategy:>10}: {events / seconds:>9.0f} events/s, {deliveries / seconds:>9.0f} event deliveries/s, '
+                f'{frames} frames, {payload / max(frames, 1):.0f} bytes/frame'
+            )
+
+    async def run(self, strategy, incoming, members, batch):
+        layer = InMemoryChannelLayer(capacity=len(incoming) + 1)
+        group = 'battle_bench'
+        channels = [await layer.new_channel() for _ in range(members)]
+        for channel in channels:
+            await layer.group_add(group, channel)
+
+        protocol = battle_protocol.MSGPACK if strategy == 'msgpack' else None
+        frames = 0
+        payload = 0
+        deliveries = 0
+        started = time.process_time()
+
+        async def deliver():
+            # What each member's consumer does with one group message
+            nonlocal frames, payload, deliveries
+            for channel in channels:
+                message = await layer.receive(channel)
+                if strategy == 'legacy':
+                    data = json.dumps(message['message'])
+                    deliveries += 1
+                else:
+                    kwargs = battle_protocol.send_kwargs(message, protocol)
+                    data = kwargs.get('text_data') or kwargs.get('bytes_data')
+                    deliveries += message['count']
+                frames += 1
+                payload += len(data)
+
+        if strategy == 'coalesced':
+            for start in range(0, len(incoming), batch):
+                events = [battle_protocol.decode(text) for text in incoming[start:start + batch]]
+                events = [event for chunk in events for event in chunk]
+                await layer.group_send(group, {
+                    'type': 'battle.frame', 'count': len(events), **battle_protocol.encode_frames(events)
+                })
+                await deliver()
+        else:
+            for data in incoming:
+                if strategy == 'legacy':
+                    await layer.group_send(group, {'type': 'battle_message', 'message': json.loads(data)})
+                else:
+                    if strategy == 'msgpack':
+                        events = battle_protocol.decode(bytes_data=data)
+                    else:
+                        events = battle_protocol.decode(data)
+                    await layer.group_send(group, {
+                        'type': 'battle.frame', 'count': len(events), **battle_protocol.encode_frames(events)
+                    })
+                await deliver()
+
+        return time.process_time() - started, deliveries, frames, payload
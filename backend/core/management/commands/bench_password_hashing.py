@@ -0,0 +1,70 @@
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+
+from core.passwords import HashPool, HashPoolBusy
+
+
+class Command(BaseCommand):
+    help = 'Measures password hashing throughput on its own, per hash pool width, and admission under a burst'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashes', type=int, default=200, help='Hashes per pool width')
+        parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--burst', type=int, default=500, help='Simultaneous requests in the admission test')
+
+    def handle(self, *args, **options):
+        hasher = hashers.get_hasher()
+        started = time.perf_counter()
+        for _ in range(20):
+            hashers.make_password('correct horse battery staple')
+        single = (time.perf_counter() - started) / 20
+        self.stdout.write(
+            f'{hasher.algorithm}, {getattr(hasher, "iterations", "-")} iterations: '
+            f'{single * 1000:.1f} ms per hash on one thread'
+        )
+
+        width = 1
+        while width <= options['max_workers']:
+            pool = HashPool(width, options['hashes'])
+            started = time.perf_counter()
+            futures = [pool.submit('make', hashers.make_password, 'correct horse battery staple')
+                       for _ in range(options['hashes'])]
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {width:>2} workers: {options["hashes"] / elapsed:7.1f} hashes/s')
+            width *= 2
+
+        # A burst of simultaneous sign-ups against the configured pool
+        pool = HashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+        latencies, rejected = [], []
+        lock = threading.Lock()
+
+        def request():
+            started = time.perf_counter()
+            try:
+                pool.submit('make', hashers.make_password, 'correct horse battery staple').result()
+            except HashPoolBusy:
+                with lock:
+                    rejected.append(time.perf_counter() - started)
+                return
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+        with ThreadPoolExecutor(64) as clients:
+            for _ in range(options['burst']):
+                clients.submit(request)
+        latencies.sort()
+        self.stdout.write(
+            f'Burst of {options["burst"]} (workers={settings.PASSWORD_HASH_WORKERS}, '
+            f'queue={settings.PASSWORD_HASH_QUEUE}): {len(latencies)} hashed, '
+            f'p50 {statistics.median(latencies) * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms; '
+            f'{len(rejected)} refused in {max(rejected, default=0) * 1000:.2f} ms or less'
+        )
@@ -0,0 +1,123 @@
+import itertools
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.search import CREATE_SQL, INSERT_SQL, SEARCH_SQL, TABLE, document, match_expression
+
+# Common words dominate real question text, so the synthetic vocabulary
+# follows a Zipf-like distribution over technical and filler words
+COMMON = (
+    'what which how does the of a in to is for function value return list python code '
+    'output error type data class method variable loop array string object'
+).split()
+TECH = (
+    'dictionary recursion closure decorator generator iterator lambda tuple pointer '
+    'reference inheritance polymorphism interface compiler interpreter thread process '
+    'mutex semaphore deadlock garbage collector heap stack queue hash tree graph sorting '
+    'binary search complexity kubernetes docker javascript typescript promise async await '
+    'goroutine channel template virtual constructor destructor exception unicode regex'
+).split()
+
+
+def synthetic_vocabulary(size):
+    rng = random.Random(7)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = COMMON + TECH
+    while len(words) < size:
+        words.append(''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return words, list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the FTS5 question search on a synthetic corpus in a scratch SQLite file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--questions', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=200, help='Queries per query kind')
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--like', action='store_true', help="Also time LIKE '%%term%%' for comparison")
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch database')
+
+    def handle(self, *args, **options):
+        count = options['questions']
+        words, cum_weights = synthetic_vocabulary(options['vocabulary'])
+        rng = random.Random(42)
+        path = tempfile.mktemp(suffix='.sqlite3', prefix='bench_search_')
+        db = sqlite3.connect(path)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=OFF')
+        db.execute('CREATE TABLE question (id INTEGER PRIMARY KEY, title TEXT, question_text TEXT)')
+        db.execute(CREATE_SQL)
+        insert = INSERT_SQL.replace('%s', '?')
+
+        def text(n):
+            return ' '.join(rng.choices(words, cum_weights=cum_weights, k=n))
+
+        started = time.perf_counter()
+        batch = []
+        for question_id in range(1, count + 1):
+            fields = document(text(6), text(30), [text(2) for _ in range(4)], text(15))
+            batch.append((question_id, *fields))
+            if len(batch) == 10_000:
+                db.executemany(insert, batch)
+                db.executemany('INSERT INTO question VALUES (?, ?, ?)', [row[:3] for row in batch])
+                batch = []
+        if batch:
+            db.executemany(insert, batch)
+            db.executemany('INSERT INTO question VALUES (?, ?, ?)', [row[:3] for row in batch])
+        db.commit()
+        build = time.perf_counter() - started
+        started = time.perf_counter()
+        db.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        db.commit()
+        optimize = time.perf_counter() - started
+        self.stdout.write(
+            f'Indexed {count:,} questions in {build:.1f}s ({count / build:,.0f}/s), optimize {optimize:.1f}s, '
+            f'database {os.path.getsize(path) / 2**20:,.0f} MiB'
+        )
+
+        search = SEARCH_SQL.replace('%s', '?')
+        rare = words[len(COMMON) + len(TECH):]
+        kinds = {
+            'common word': lambda: rng.choice(COMMON),
+            'tech word': lambda: rng.choice(TECH),
+            'rare word': lambda: rng.choice(rare),
+            'two words': lambda: f'{rng.choice(TECH)} {rng.choice(COMMON)}',
+            'prefix': lambda: rng.choice(TECH)[:4],
+        }
+        for kind, make in kinds.items():
+            timings = []
+            for _ in range(options['queries']):
+                expression = match_expression(make())
+                started = time.perf_counter()
+                db.execute(search, (expression, 20, 0)).fetchall()
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            self.stdout.write(
+                f'  {kind:<12} p50 {statistics.median(timings) * 1000:7.2f} ms   '
+                f'p95 {timings[int(len(timings) * 0.95) - 1] * 1000:7.2f} ms   max {timings[-1] * 1000:7.2f} ms'
+            )
+
+        if options['like']:
+            timings = []
+            for _ in range(5):
+                # What the admin changelist does: count every row matching the term
+                term = f'%{rng.choice(TECH)}%'
+                started = time.perf_counter()
+                db.execute('SELECT count(*) FROM question WHERE title LIKE ? OR question_text LIKE ?', (term, term))
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(f'  LIKE count   p50 {statistics.median(timings) * 1000:7.2f} ms')
+
+        db.close()
+        if options['keep']:
+            self.stdout.write(f'Kept {path}')
+        else:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
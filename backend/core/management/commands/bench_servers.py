@@ -0,0 +1,124 @@
+"""
+Side-by-side benchmark of the two deployments on a read-heavy mix.
+
+Starts gunicorn with sync workers (app.wsgi, DRF views) and gunicorn with
+uvicorn workers (app.asgi, ASYNC_READ_VIEWS on) on free local ports, runs the
+loadtest command against each at several concurrency levels and prints
+requests/second per worker and p50/p99 latency as JSON:
+
+    python manage.py bench_servers --workers 4 --players 16,64,256
+"""
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from .loadtest import parse_mix
+
+READ_MIX = 'browse=3,draw=2,leaderboard=3,profile=1'
+
+SERVERS = {
+    'wsgi': (['app.wsgi:application'], {'ASYNC_READ_VIEWS': 'False'}),
+    'asgi': (['app.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'], {
+        'ASYNC_READ_VIEWS': 'True',
+        # Django closes connections per request under ASGI anyway
+        'DATABASE_CONN_MAX_AGE': '0',
+    }),
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_up(url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'server exited with status {process.returncode}')
+        try:
+            urllib.request.urlopen(url + '/api/categories/', timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise CommandError(f'server at {url} did not come up within {timeout}s')
+
+
+class Command(BaseCommand):
+    help = 'Compares the WSGI (sync views) and ASGI (async read views) deployments under a read-heavy load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='gunicorn workers per server')
+        parser.add_argument('--players', default='16,64,256', help='Comma-separated concurrency levels')
+        parser.add_argument('--duration', type=float, default=15.0, help='Seconds per run')
+        parser.add_argument('--mix', type=parse_mix, default=parse_mix(READ_MIX), help='loadtest action weights')
+        parser.add_argument('--servers', default='wsgi,asgi', help='Which deployments to run')
+        parser.add_argument('--output', help='Also write the JSON comparison to this file')
+
+    def handle(self, *args, **options):
+        levels = [int(n) for n in options['players'].split(',')]
+        results = []
+        for name in options['servers'].split(','):
+            if name not in SERVERS:
+                raise CommandError(f'unknown server {name!r}')
+            for players in levels:
+                results.append(self.run(name, players, options))
+
+        output = json.dumps({'workers': options['workers'], 'mix': options['mix'], 'runs': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+    def run(self, name, players, options):
+        app, server_env = SERVERS[name]
+        port = _free_port()
+        url = f'http://127.0.0.1:{port}'
+        env = {**os.environ, **server_env, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'app.settings')}
+        command = [
+            sys.executable, '-m', 'gunicorn', *app, '--bind', f'127.0.0.1:{port}',
+            '--workers', str(options['workers']), '--log-level', 'warning',
+        ]
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            _wait_until_up(url, process)
+            self.stderr.write(f'{name}: {players} players against {url}')
+            with tempfile.TemporaryDirectory() as tmp:
+                report_path = Path(tmp) / 'report.json'
+                call_command(
+                    'loadtest', url=url, players=players, duration=options['duration'],
+                    mix=options['mix'], no_websockets=True, output=str(report_path), stdout=io.StringIO(),
+                )
+                report = json.loads(report_path.read_text())
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+        return {
+            'server': name,
+            'players': players,
+            'rps_per_worker': round(report['total']['throughput_rps'] / options['workers'], 1),
+            'total': _brief(report['total']),
+            'endpoints': {endpoint: _brief(stats) for endpoint, stats in report['endpoints'].items()},
+        }
+
+
+def _brief(stats):
+    return {
+        'rps': stats['throughput_rps'],
+        'p50_ms': stats['latency_ms']['p50'],
+        'p99_ms': stats['latency_ms']['p99'],
+        'errors': stats['errors'],
+    }
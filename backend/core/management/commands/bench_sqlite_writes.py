@@ -0,0 +1,85 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction, OperationalError
+from core.models import Category, Question
+from core.sqlite import writer_queue
+from core.views import _record_submission
+
+
+class Command(BaseCommand):
+    help = 'Measures sustained answer submits per second against the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent submitting threads')
+        parser.add_argument('--seconds', type=float, default=10.0, help='Duration of each run')
+        parser.add_argument(
+            '--mode', choices=['queue', 'direct', 'both'], default='both',
+            help='queue: through the single writer; direct: one transaction per submit per thread'
+        )
+
+    def handle(self, *args, **options):
+        # Everything the run creates is removed again, scores included (CASCADE)
+        category, created = Category.objects.get_or_create(
+            name='Benchmark', defaults={'description': 'bench_sqlite_writes'})
+        question = None
+        users = []
+        try:
+            question = Question.objects.create(
+                title='Benchmark question', category=category, question_type='QUICK',
+                question_text='Benchmark', correct_answer='x', points=10
+            )
+            for i in range(options['threads']):
+                users.append(User.objects.create_user(username=f'bench_writer_{i}_{int(time.time())}', password=None))
+            self.stdout.write(
+                f"Database: {connection.vendor}, threads: {options['threads']}, {options['seconds']}s per run")
+
+            modes = ['direct', 'queue'] if options['mode'] == 'both' else [options['mode']]
+            for mode in modes:
+                self.run(mode, users, question, options['seconds'])
+        finally:
+            User.objects.filter(id__in=[u.id for u in users]).delete()
+            if question is not None:
+                question.delete()
+            if created:
+                category.delete()
+
+    def run(self, mode, users, question, seconds):
+        counts = [0] * len(users)
+        errors = [0] * len(users)
+        deadline = time.perf_counter() + seconds
+
+        def player(index, user):
+            try:
+                while time.perf_counter() < deadline:
+                    kwargs = dict(
+                        user_id=user.id, question_id=question.id, points_awarded=10,
+                        time_taken=5, is_correct=True, submitted_answer='x'
+                    )
+                    try:
+                        if mode == 'queue':
+                            writer_queue.submit(_record_submission, **kwargs).result()
+                        else:
+                            with transaction.atomic():
+                                _record_submission(**kwargs)
+                        counts[index] += 1
+                    except OperationalError:
+                        # "database is locked"
+                        errors[index] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=player, args=(i, u)) for i, u in enumerate(users)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{mode:>6}: {sum(counts)} submits in {elapsed:.1f}s = '
+            f'{sum(counts) / elapsed:.0f} submits/s, {sum(errors)} lock errors'
+        )
@@ -0,0 +1,66 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.timers import TimingWheel
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the timing wheel with many pending timers (simulated clock, no sleeping)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timers', type=int, default=1_000_000, help='Timers to arm')
+        parser.add_argument('--horizon', type=float, default=48 * 3600, help='Deadlines spread over this many seconds')
+        parser.add_argument('--cancel', type=float, default=0.3, help='Fraction of timers cancelled before firing')
+        parser.add_argument('--tick', type=float, default=0.1)
+        parser.add_argument('--memory', action='store_true', help='Also measure memory held by the armed wheel')
+
+    def handle(self, *args, **options):
+        count = options['timers']
+        origin = 1_000_000.0
+        wheel = TimingWheel(tick=options['tick'], now=origin)
+        deadlines = [origin + random.random() * options['horizon'] for _ in range(count)]
+
+        if options['memory']:
+            tracemalloc.start()
+        started = time.perf_counter()
+        for i, when in enumerate(deadlines):
+            wheel.schedule(('bench', i), when)
+        schedule_seconds = time.perf_counter() - started
+        if options['memory']:
+            memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        cancelled = random.sample(range(count), int(count * options['cancel']))
+        started = time.perf_counter()
+        for i in cancelled:
+            wheel.cancel(('bench', i))
+        cancel_seconds = time.perf_counter() - started
+
+        # Walk the whole horizon in one-minute steps, checking every timer
+        # fires on its own tick
+        fired = 0
+        wrong = 0
+        started = time.perf_counter()
+        now = origin
+        while now < origin + options['horizon'] + 60:
+            now += 60
+            for timer in wheel.advance(now):
+                fired += 1
+                if timer.due > wheel.current or wheel.current - timer.due > 60 / options['tick']:
+                    wrong += 1
+        advance_seconds = time.perf_counter() - started
+        ticks = wheel.current
+
+        self.stdout.write(f'{count} timers over {options["horizon"] / 3600:.0f}h, tick {options["tick"]}s')
+        self.stdout.write(f'  schedule: {count / schedule_seconds:,.0f}/s')
+        if options['memory']:
+            self.stdout.write(f'  memory:   {memory / count:.0f} bytes per armed timer')
+        self.stdout.write(f'  cancel:   {len(cancelled) / cancel_seconds:,.0f}/s')
+        self.stdout.write(
+            f'  advance:  {ticks:,} ticks in {advance_seconds:.2f}s '
+            f'({advance_seconds / ticks * 1e6:.2f} us/tick), {fired} fired, '
+            f'{count - len(cancelled) - fired} missing, {wrong} out of window'
+        )
@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import tournaments
+from core.jobs import Worker
+from core.models import Category, Tournament, TournamentEntry, TournamentMatch, UserProfile
+
+PREFIX = 'bench_tournament_'
+
+
+class Command(BaseCommand):
+    help = 'Plays a tournament with random results and times how fast each round is tallied and advanced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entrants', type=int, default=2000)
+        parser.add_argument('--format', choices=['SINGLE_ELIMINATION', 'SWISS'], default='SWISS')
+        parser.add_argument('--keep', action='store_true', help='Keep the tournament and its bench users')
+
+    def handle(self, *args, **options):
+        category = Category.objects.first()
+        if category is None:
+            self.stderr.write(self.style.ERROR('Needs at least one category (manage.py seed_questions)'))
+            return
+        users = self.bench_users(options['entrants'])
+        tournament = Tournament.objects.create(
+            name='Bench tournament', category=category, format=options['format'], seeding='RANDOM',
+            entrant_count=len(users))
+        TournamentEntry.objects.bulk_create(
+            [TournamentEntry(tournament=tournament, user_id=user_id) for user_id in users], batch_size=1000)
+
+        started = time.perf_counter()
+        tables = tournaments.start(tournament.id)
+        self.stdout.write(f'{options["entrants"]} entrants, round 1 paired ({tables} tables) '
+                          f'in {time.perf_counter() - started:.2f}s')
+        worker = Worker(names=[tournaments.TALLY, tournaments.ADVANCE], poll=0)
+        try:
+            while True:
+                tournament.refresh_from_db()
+                if tournament.status != 'RUNNING':
+                    break
+                self.play_round(tournament, worker)
+            self.stdout.write(self.style.SUCCESS(
+                f'{tournament.get_format_display()} over {tournament.current_round} rounds, '
+                f'won by user {tournament.winner_id}, in {time.perf_counter() - started:.2f}s'
+            ))
+        finally:
+            if not options['keep']:
+                tournament.delete()
+                User.objects.filter(username__startswith=PREFIX).delete()
+
+    def bench_users(self, count):
+        existing = list(User.objects.filter(username__startswith=PREFIX).values_list('id', flat=True)[:count])
+        missing = count - len(existing)
+        if missing > 0:
+            # Unusable passwords: nobody logs in as a bench user, and nothing is hashed
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(username=f'{PREFIX}{len(existing) + i}', password=make_password(None))
+                    for i in range(missing)
+                ], batch_size=1000)
+                created = list(User.objects.filter(username__startswith=PREFIX).exclude(id__in=existing)
+                               .values_list('id', flat=True))
+                UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in created], batch_size=1000)
+            existing += created
+        return existing
+
+    def play_round(self, tournament, worker):
+        number = tournament.current_round
+        pending = list(TournamentMatch.objects.filter(tournament=tournament, round=number, status='PENDING')
+                       .values_list('id', 'player_a_id', 'player_b_id'))
+        started = time.perf_counter()
+        step = settings.TOURNAMENT_REPORT_MAX_RESULTS
+        for offset in range(0, len(pending), step):
+            results = [(match_id, random.choice((a, b))) for match_id, a, b in pending[offset:offset + step]]
+            with transaction.atomic():
+                tournaments.report_results(tournament, results)
+        reported = time.perf_counter() - started
+        worker.run(stop_when_idle=True)
+        self.stdout.write(
+            f'  round {number}: {len(pending)} results reported in {reported:.2f}s, '
+            f'tallied and advanced in {time.perf_counter() - started - reported:.2f}s'
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.snapshots import build_snapshots, snapshot_root
+
+
+class Command(BaseCommand):
+    help = 'Builds the prebuilt, gzipped catalog snapshots served by the questions endpoint'
+
+    def handle(self, *args, **kwargs):
+        build_id, files = build_snapshots()
+        self.stdout.write(self.style.SUCCESS(
+            f'Built catalog snapshot {build_id} ({files} files) in {snapshot_root()}'
+        ))
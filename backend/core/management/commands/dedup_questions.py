@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import dedup
+from core.models import Question
+from core.sqlite import run_write
+
+
+class Command(BaseCommand):
+    help = 'Signs questions for near-duplicate detection and reports clusters of near-duplicates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Re-sign every question, not only unsigned ones')
+        parser.add_argument('--threshold', type=float, default=None)
+        parser.add_argument('--limit', type=int, default=50, help='Clusters to print')
+
+    def handle(self, *args, **options):
+        threshold = settings.DEDUP_THRESHOLD if options['threshold'] is None else options['threshold']
+        if options['rebuild']:
+            run_write(lambda: Question.objects.update(minhash=None))
+        started = time.perf_counter()
+        count = run_write(dedup.index_missing)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'Signed {count} questions in {elapsed:.2f}s' + (
+            f' ({count / elapsed:,.0f}/s)' if count else ''))
+
+        started = time.perf_counter()
+        clusters = dedup.report(threshold)
+        self.stdout.write(
+            f'{len(clusters)} clusters at similarity >= {threshold} '
+            f'({sum(map(len, clusters))} questions) in {time.perf_counter() - started:.2f}s'
+        )
+        for cluster in clusters[:options['limit']]:
+            self.stdout.write('')
+            for question in cluster:
+                self.stdout.write(f"  #{question['id']} [{question['category']}] {question['title']}")
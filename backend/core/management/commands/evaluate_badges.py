@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.badges import evaluate_pending
+
+
+class Command(BaseCommand):
+    help = 'Folds new scores and challenge wins into the badge states and awards badges (also the backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Events per transaction (default BADGE_BATCH_SIZE)')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        events, awarded = evaluate_pending(options['batch_size'], options['max_batches'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {events} events in {elapsed:.2f}s ({events / max(elapsed, 1e-9):,.0f}/s), '
+            f'awarded {awarded} badges'
+        ))
@@ -0,0 +1,409 @@
+"""
+Load test driving a realistic player mix against the app.
+
+Each simulated player registers/logs in once, then loops over a weighted mix
+of catalog browsing, quiz draws, answer submits, leaderboard polling and
+short battle websocket sessions. Latencies are recorded per endpoint and the
+report (throughput, p50/p95/p99) is printed as JSON so runs can be diffed
+between commits:
+
+    python manage.py loadtest --players 50 --duration 30 --output before.json
+    python manage.py loadtest --url http://localhost:8000 --players 200
+    python manage.py loadtest --mix browse=3,leaderboard=3,profile=1 --no-websockets
+
+Without --url the app is driven in-process (Django test client for HTTP, the
+ASGI application for websockets) against the configured database. Against a
+URL, websocket sessions need the optional `websockets` package.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# Relative weights of the actions a player performs after logging in
+MIX = {
+    'browse': 3,
+    'draw': 2,
+    'submit': 4,
+    'leaderboard': 3,
+    'battle': 1,
+}
+# Actions available to --mix that the default mix leaves out
+EXTRA_ACTIONS = ('profile',)
+
+PASSWORD = 'loadtest-Passw0rd!'
+WS_TIMEOUT = 5
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency and error recorder"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._errors = defaultdict(int)
+
+    def record(self, endpoint, seconds, ok=True):
+        with self._lock:
+            self._latencies[endpoint].append(seconds)
+            if not ok:
+                self._errors[endpoint] += 1
+
+    def summary(self, elapsed):
+        endpoints = {}
+        everything = []
+        for endpoint in sorted(self._latencies):
+            values = sorted(self._latencies[endpoint])
+            everything.extend(values)
+            endpoints[endpoint] = _stats(values, self._errors[endpoint], elapsed)
+        total = _stats(sorted(everything), sum(self._errors.values()), elapsed)
+        return endpoints, total
+
+
+def _percentile(values, pct):
+    # Nearest-rank percentile on an already sorted list
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def _stats(values, errors, elapsed):
+    count = len(values)
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'mean': round(sum(values) / count * 1000, 2) if count else 0.0,
+            'p50': round(_percentile(values, 50) * 1000, 2),
+            'p95': round(_percentile(values, 95) * 1000, 2),
+            'p99': round(_percentile(values, 99) * 1000, 2),
+            'max': round(values[-1] * 1000, 2) if count else 0.0,
+        },
+    }
+
+
+def _decode(body, encoding):
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    try:
+        return json.loads(body) if body else None
+    except ValueError:
+        return None
+
+
+class InProcessTransport:
+    """Drives the WSGI stack through the test client and websockets through ASGI"""
+
+    _loop = None
+    _loop_lock = threading.Lock()
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def request(self, method, path, data=None, token=None):
+        extra = {'HTTP_ACCEPT_ENCODING': 'gzip'}
+        if token:
+            extra['HTTP_AUTHORIZATION'] = f'Bearer {token}'
+        if method == 'GET':
+            response = self.client.get(path, **extra)
+        else:
+            response = self.client.post(path, data=data or {}, content_type='application/json', **extra)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response.status_code, _decode(body, response.get('Content-Encoding'))
+
+    @classmethod
+    def _event_loop(cls):
+        # One loop for every websocket session: the in-memory channel layer's
+        # queues are bound to the loop that first uses them.
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, daemon=True).start()
+        return cls._loop
+
+    def battle(self, path, payload, on_connected):
+        future = asyncio.run_coroutine_threadsafe(self._battle(path, payload, on_connected), self._event_loop())
+        return future.result(timeout=WS_TIMEOUT * 3)
+
+    async def _battle(self, path, payload, on_connected):
+        from asgiref.testing import ApplicationCommunicator
+        from app.asgi import application
+
+        scope = {'type': 'websocket', 'path': path, 'headers': [], 'query_string': b'', 'subprotocols': []}
+        communicator = ApplicationCommunicator(application, scope)
+        await communicator.send_input({'type': 'websocket.connect'})
+        message = await communicator.receive_output(WS_TIMEOUT)
+        if message['type'] != 'websocket.accept':
+            return False
+        on_connected()
+        await communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(payload)})
+        try:
+            while True:
+                message = await communicator.receive_output(WS_TIMEOUT)
+                if message['type'] != 'websocket.send':
+                    return False
+                if payload['nonce'] in (message.get('text') or ''):
+                    return True
+        finally:
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(WS_TIMEOUT)
+
+    def close(self):
+        connection.close()
+
+
+class HttpTransport:
+    """Drives a running server over real sockets"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip'}
+        body = None
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if method != 'GET':
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(data or {}).encode()
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, _decode(response.read(), response.headers.get('Content-Encoding'))
+        except urllib.error.HTTPError as exc:
+            return exc.code, _decode(exc.read(), exc.headers.get('Content-Encoding'))
+
+    def battle(self, path, payload, on_connected):
+        from websockets.sync.client import connect
+
+        url = self.base_url.replace('http', 'ws', 1) + path
+        with connect(url, open_timeout=WS_TIMEOUT) as ws:
+            on_connected()
+            ws.send(json.dumps(payload))
+            while True:
+                if payload['nonce'] in str(ws.recv(timeout=WS_TIMEOUT)):
+                    return True
+
+    def close(self):
+        pass
+
+
+class Player:
+    def __init__(self, index, transport, recorder, run_id, rooms, websockets, mix=MIX):
+        self.index = index
+        self.mix = mix
+        self.transport = transport
+        self.recorder = recorder
+        self.rooms = rooms
+        self.websockets = websockets
+        self.username = f'loadtest_{run_id}_{index}'
+        self.room = f'loadtest-{run_id}-{index % rooms}'
+        self.token = None
+        self.categories = []
+        self.questions = []
+
+    def timed(self, endpoint, method, path, data=None, ok_statuses=(200, 201)):
+        started = time.perf_counter()
+        try:
+            status, body = self.transport.request(method, path, data, self.token)
+        except Exception:
+            self.recorder.record(endpoint, time.perf_counter() - started, ok=False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - started, ok=status in ok_statuses)
+        return body if status in ok_statuses else None
+
+    def setup(self):
+        # A 400 means the account is left over from an earlier run
+        self.timed('register', 'POST', '/api/auth/register/', {
+            'username': self.username, 'email': f'{self.username}@example.com',
+            'password': PASSWORD, 'password2': PASSWORD,
+        }, ok_statuses=(201, 400))
+        body = self.timed('login', 'POST', '/api/auth/login/', {'username': self.username, 'password': PASSWORD})
+        self.token = body and body.get('access')
+        self.browse()
+        return self.token is not None
+
+    def step(self):
+        action = random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if action == 'battle' and not self.websockets:
+            action = 'leaderboard'
+        getattr(self, action)()
+
+    def browse(self):
+        body = self.timed('categories', 'GET', '/api/categories/')
+        if body:
+            self.categories = [c['slug'] for c in body.get('results', []) if c.get('question_count')]
+
+    def draw(self):
+        if not self.categories:
+            return self.browse()
+        slug = random.choice(self.categories)
+        body = self.timed('quiz_draw', 'GET', f'/api/categories/{slug}/questions/')
+        if body:
+            self.questions = random.sample(body, min(10, len(body)))
+
+    def submit(self):
+        if not self.questions:
+            return self.draw()
+        question = self.questions.pop()
+        if question['question_type'] == 'MCQ':
+            answer = str(random.randrange(len(question.get('options') or [0])))
+        else:
+            answer = random.choice(['true', 'false'])
+        self.timed('submit', 'POST', f"/api/questions/{question['id']}/submit/", {
+            'answer': answer, 'time_taken': random.randint(3, 60),
+        })
+
+    def leaderboard(self):
+        period = random.choice(['overall', 'overall', 'weekly', 'daily'])
+        self.timed('leaderboard', 'GET', f'/api/leaderboard/?period={period}')
+
+    def profile(self):
+        self.timed('profile', 'GET', '/api/user/profile/')
+
+    def battle(self):
+        payload = {'type': 'answer', 'player': self.username, 'nonce': uuid.uuid4().hex}
+        started = time.perf_counter()
+        connected = []
+
+        def on_connected():
+            connected.append(time.perf_counter())
+            self.recorder.record('battle_connect', connected[0] - started)
+
+        try:
+            ok = self.transport.battle(f'/ws/battle/{self.room}/', payload, on_connected)
+        except Exception:
+            ok = False
+        if connected:
+            self.recorder.record('battle_message', time.perf_counter() - connected[0], ok=bool(ok))
+        else:
+            self.recorder.record('battle_connect', time.perf_counter() - started, ok=False)
+
+
+class Command(BaseCommand):
+    help = 'Runs a load test with concurrent simulated players and reports per-endpoint latency as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=20, help='Concurrent simulated players')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run after setup')
+        parser.add_argument('--url', help='Base URL of a running server (default: drive the app in-process)')
+        parser.add_argument('--rooms', type=int, default=10, help='Battle rooms shared by the players')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Seconds a player waits between actions')
+        parser.add_argument('--no-websockets', action='store_true', help='Skip battle websocket sessions')
+        parser.add_argument('--mix', type=parse_mix, default=MIX,
+                            help='Action weights, e.g. browse=3,leaderboard=3,profile=1 (default: the full player mix)')
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        websockets = not options['no_websockets']
+        if options['url'] and websockets:
+            try:
+                import websockets.sync.client  # noqa: F401
+            except ImportError:
+                self.stderr.write('websockets package not installed; skipping battle sessions')
+                websockets = False
+
+        def make_transport():
+            return HttpTransport(options['url']) if options['url'] else InProcessTransport()
+
+        recorder = Recorder()
+        run_id = uuid.uuid4().hex[:6]
+        players = [
+            Player(i, make_transport(), recorder, run_id, options['rooms'], websockets, options['mix'])
+            for i in range(options['players'])
+        ]
+        setup_done = threading.Barrier(len(players) + 1)
+        go = threading.Event()
+        state = {'deadline': None}
+
+        def run(player):
+            try:
+                ready = player.setup()
+                setup_done.wait()
+                go.wait()
+                if not ready:
+                    return
+                while time.perf_counter() < state['deadline']:
+                    player.step()
+                    if options['think_time']:
+                        time.sleep(options['think_time'])
+            finally:
+                player.transport.close()
+
+        threads = [threading.Thread(target=run, args=(p,), daemon=True) for p in players]
+        for t in threads:
+            t.start()
+
+        # Measure the steady-state mix only, after every player has logged in
+        setup_done.wait()
+        setup_endpoints, _ = recorder.summary(1)
+        measured = Recorder()
+        for p in players:
+            p.recorder = measured
+        started = time.perf_counter()
+        state['deadline'] = started if not any(p.token for p in players) else started + options['duration']
+        go.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        if not any(p.token for p in players):
+            raise CommandError('No player could log in; is the target reachable and migrated?')
+
+        endpoints, total = measured.summary(elapsed)
+        report = {
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'target': options['url'] or 'in-process',
+            'players': options['players'],
+            'mix': options['mix'],
+            'duration_s': round(elapsed, 2),
+            'setup': setup_endpoints,
+            'endpoints': endpoints,
+            'total': total,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(output + '\n')
+        self.stdout.write(output)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in MIX and name not in EXTRA_ACTIONS:
+            raise argparse.ArgumentTypeError(f'unknown action {name!r}')
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f'bad weight for {name!r}')
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError('the mix needs at least one positive weight')
+    return mix
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
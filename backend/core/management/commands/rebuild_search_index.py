@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.search import available, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the SQLite FTS5 question search index (after bulk imports that bypass signals)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if not available(options['database']):
+            self.stdout.write('Full-text index is SQLite only; nothing to rebuild')
+            return
+        started = time.perf_counter()
+        count = rebuild(options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} questions in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,41 @@
+import json
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.battle_log import BattleLogReader, replay, segments
+
+
+class Command(BaseCommand):
+    help = 'Streams a battle room\'s events from the binary battle log as JSON lines, or lists logged rooms'
+
+    def add_arguments(self, parser):
+        parser.add_argument('room', nargs='?', help='Room name (as in ws/battle/<room>/)')
+        parser.add_argument('--day', help='Only read segments for this YYYY-MM-DD day')
+        parser.add_argument('--list', action='store_true', help='List rooms with their record counts instead')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self.list_rooms(options['day'])
+        if not options['room']:
+            raise CommandError('Give a room name or --list')
+
+        count = 0
+        for timestamp_ms, event in replay(options['room'], options['day']):
+            at = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).isoformat()
+            self.stdout.write(json.dumps({'at': at, 'event': event}, default=str))
+            count += 1
+        self.stderr.write(f'{count} events')
+
+    def list_rooms(self, day):
+        counts = {}
+        for path in segments(day):
+            try:
+                reader = BattleLogReader(path)
+            except ValueError:
+                continue
+            with reader:
+                for room, offsets in reader.index().items():
+                    counts[room] = counts.get(room, 0) + len(offsets)
+        for room, records in sorted(counts.items()):
+            self.stdout.write(f'{room}\t{records}')
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import TASKS, Worker, queue_depth
+
+
+class Command(BaseCommand):
+    help = 'Runs a local job queue worker (deferred post-submit work such as badge evaluation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--task', action='append', dest='tasks', help='Only run these tasks (repeatable)')
+        parser.add_argument('--batch-size', type=int, help='Jobs claimed per batch (default JOB_BATCH_SIZE)')
+        parser.add_argument('--poll', type=float, help='Seconds to sleep when idle (default JOB_POLL_SECONDS)')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is ready')
+        parser.add_argument('--stats', action='store_true', help='Print the queue depth and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            depth = queue_depth()
+            for (name, status), count in sorted(depth['counts'].items()):
+                self.stdout.write(f'{name:<30} {status:<8} {count}')
+            self.stdout.write(f'oldest ready job: {depth["oldest_ready_seconds"]:.1f}s')
+            return
+
+        unknown = set(options['tasks'] or []) - set(TASKS)
+        if unknown:
+            self.stderr.write(self.style.ERROR(f'Unknown tasks: {", ".join(sorted(unknown))}'))
+            return
+        self.stdout.write(f'Job worker for {", ".join(options["tasks"] or sorted(TASKS))}')
+        started = time.perf_counter()
+        Worker(options['tasks'], options['batch_size'], options['poll']).run(stop_when_idle=options['once'])
+        if options['once']:
+            self.stdout.write(f'Queue drained in {time.perf_counter() - started:.2f}s')
@@ -0,0 +1,50 @@
+import asyncio
+import logging
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.timers import ChallengeTimers, TimerService, TimingWheel
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Runs the challenge timer service: expires unaccepted and overlong challenges in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Arm from the database, fire everything already due, and exit')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.serve(options['once']))
+
+    async def serve(self, once):
+        wheel = TimingWheel(tick=settings.TIMER_WHEEL_TICK)
+        challenges = ChallengeTimers(wheel)
+        service = TimerService(wheel, challenges.handlers())
+
+        started = time.perf_counter()
+        armed = await database_sync_to_async(challenges.scan)()
+        self.stdout.write(f'Armed {armed} challenge timers in {time.perf_counter() - started:.2f}s')
+
+        if once:
+            # Overdue timers land in the next slot
+            await service.fire(wheel.advance(time.time() + wheel.tick))
+            return
+
+        runner = asyncio.create_task(service.run())
+        try:
+            while True:
+                await asyncio.sleep(settings.TIMER_RESCAN_SECONDS)
+                try:
+                    armed = await database_sync_to_async(challenges.scan)()
+                except Exception:
+                    logger.exception('challenge timer rescan failed')
+                    continue
+                if armed:
+                    logger.info('armed %d new challenge timers (%d pending)', armed, len(wheel))
+        finally:
+            runner.cancel()
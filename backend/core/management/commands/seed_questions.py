@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
-from core.models import Category, Question
+from core.models import Category, Question, UserProfile
+from core.provisioning import provision
 import random
 
 
@@ -791,18 +791,16 @@ class Command(BaseCommand):
             {'username': 'eve_tech', 'email': 'eve@example.com', 'password': 'demo1234', 'points': 300},
         ]
         
-        for user_data in users_data:
-            user, created = User.objects.get_or_create(
-                username=user_data['username'],
-                defaults={
-                    'email': user_data['email'],
-                }
-            )
-            if created:
-                user.set_password(user_data['password'])
-                user.save()
-                user.profile.total_points = user_data['points']
-                user.profile.save()
-                self.stdout.write(f'Created demo user: {user.username}')
-            else:
-                self.stdout.write(f'Demo user already exists: {user.username}')
+        result = provision([
+            {'username': data['username'], 'email': data['email'], 'password': data['password']}
+            for data in users_data
+        ])
+        points = {data['username']: data['points'] for data in users_data}
+        created = [user['username'] for user in result['created']]
+        for profile in UserProfile.objects.filter(user__username__in=created).select_related('user'):
+            profile.total_points = points[profile.user.username]
+            profile.save(update_fields=['total_points', 'updated_at'])
+        for username in created:
+            self.stdout.write(f'Created demo user: {username}')
+        for username in result['existing']:
+            self.stdout.write(f'Demo user already exists: {username}')
@@ -0,0 +1,25 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copies the SQLite primary into the SQLite replica stand-in (local replica testing)'
+
+    def handle(self, *args, **kwargs):
+        primary = settings.DATABASES['default']
+        replica = settings.DATABASES.get('replica1')
+        if replica is None or 'sqlite3' not in primary['ENGINE'] or 'sqlite3' not in replica['ENGINE']:
+            raise CommandError('Requires SQLite primary and DATABASE_REPLICA_NAME to be set')
+        
+        # The backup API takes a consistent copy even while the primary is in use
+        source = sqlite3.connect(str(primary['NAME']))
+        target = sqlite3.connect(str(replica['NAME']))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        
+        self.stdout.write(self.style.SUCCESS(f"Synced {primary['NAME']} -> {replica['NAME']}"))
@@ -0,0 +1,220 @@
+"""
+Per-request instrumentation exposed in Prometheus text format.
+
+RequestMetricsMiddleware (middleware.py) times every request. A sampled fraction
+(METRICS_SAMPLE_RATE) additionally records query count, DB time and serializer
+time through a connection execute_wrapper and a hook on serializer .data.
+Sampled requests that run the same SQL shape METRICS_NPLUS1_THRESHOLD or
+more times are counted (and logged once per view/shape) as N+1 suspects.
+Django passes the SQL with %s placeholders, so the statement text is already
+the query shape.
+
+Metrics are kept per process. With several gunicorn workers each scrape sees
+one worker; the `pid` label keeps their series apart.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self, pid):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in sorted(items):
+            base = _labels(labels, pid)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+class CounterMetric:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._series = Counter()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._series[labels] += amount
+
+    def render(self, pid):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{{{_labels(labels, pid)}}} {value}')
+        return lines
+
+
+def _labels(labels, pid):
+    pairs = [('pid', pid)] + list(labels)
+    return ','.join('%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in pairs)
+
+
+REQUEST_SECONDS = Histogram(
+    'quiz_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS)
+DB_QUERIES = Histogram(
+    'quiz_request_db_queries', 'SQL queries per sampled request.', QUERY_COUNT_BUCKETS)
+DB_SECONDS = Histogram(
+    'quiz_request_db_seconds', 'Time spent in SQL per sampled request.', LATENCY_BUCKETS)
+SERIALIZER_SECONDS = Histogram(
+    'quiz_request_serializer_seconds', 'Time spent producing serializer .data per sampled request.', LATENCY_BUCKETS)
+NPLUS1_SUSPECTS = CounterMetric(
+    'quiz_nplus1_suspects_total', 'Sampled requests repeating one query shape past the N+1 threshold.')
+SAMPLED_REQUESTS = CounterMetric(
+    'quiz_sampled_requests_total', 'Requests that were instrumented for SQL and serializer time.')
+# Password hashing (passwords.py), measured apart from the requests waiting on it
+HASH_SECONDS = Histogram(
+    'quiz_password_hash_seconds', 'Time spent computing one password hash on the hash pool.', LATENCY_BUCKETS)
+HASH_WAIT_SECONDS = Histogram(
+    'quiz_password_hash_wait_seconds', 'Time a password hash waited for a hash pool thread.', LATENCY_BUCKETS)
+HASH_REJECTED = CounterMetric(
+    'quiz_password_hash_rejected_total', 'Password hashes refused because the hash pool queue was full.')
+# Battle spectators (spectators.py): frames merged into a later send, and
+# frames dropped from a lagging spectator's backlog
+SPECTATOR_FRAMES_CONFLATED = CounterMetric(
+    'quiz_battle_spectator_frames_conflated_total', 'Battle frames sent to a spectator merged with later ones.')
+SPECTATOR_FRAMES_DROPPED = CounterMetric(
+    'quiz_battle_spectator_frames_dropped_total', 'Battle frames dropped for spectators too far behind.')
+
+METRICS = [
+    REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, SERIALIZER_SECONDS, NPLUS1_SUSPECTS, SAMPLED_REQUESTS,
+    HASH_SECONDS, HASH_WAIT_SECONDS, HASH_REJECTED, SPECTATOR_FRAMES_CONFLATED, SPECTATOR_FRAMES_DROPPED,
+]
+
+
+class SampledRequest:
+    __slots__ = ('queries', 'db_time', 'shapes', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[sql] += 1
+
+
+_current = ContextVar('metrics_sample', default=None)
+_reported_shapes = set()
+
+
+def install_serializer_timing():
+    """Time serializer .data for sampled requests (outermost serializer only)"""
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data.fget
+    if getattr(original, 'timed', False):
+        return
+
+    def data(self):
+        sample = _current.get()
+        if sample is None:
+            return original(self)
+        sample.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            sample.serializer_depth -= 1
+            if sample.serializer_depth == 0:
+                sample.serializer_time += time.perf_counter() - started
+
+    data.timed = True
+    BaseSerializer.data = property(data)
+
+
+def begin_sample():
+    sample = SampledRequest()
+    return sample, _current.set(sample)
+
+
+def end_sample(token):
+    _current.reset(token)
+
+
+def record_request(view, method, status, elapsed, sample=None):
+    REQUEST_SECONDS.observe((('view', view), ('method', method), ('status', status)), elapsed)
+    if sample is None:
+        return
+
+    labels = (('view', view),)
+    SAMPLED_REQUESTS.inc(labels)
+    DB_QUERIES.observe(labels, sample.queries)
+    DB_SECONDS.observe(labels, sample.db_time)
+    SERIALIZER_SECONDS.observe(labels, sample.serializer_time)
+
+    repeated = [(sql, n) for sql, n in sample.shapes.items() if n >= settings.METRICS_NPLUS1_THRESHOLD]
+    if repeated:
+        NPLUS1_SUSPECTS.inc(labels)
+        for sql, n in repeated:
+            if (view, sql) not in _reported_shapes:
+                _reported_shapes.add((view, sql))
+                logger.warning('N+1 suspect in %s: %d x %s', view, n, sql)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN when set"""
+    if settings.METRICS_TOKEN:
+        if not constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {settings.METRICS_TOKEN}'):
+            return HttpResponseForbidden()
+    elif not settings.DEBUG:
+        return HttpResponseForbidden()
+
+    pid = os.getpid()
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(pid))
+    try:
+        from .jobs import metric_lines
+        lines.extend(metric_lines())
+    except Exception:
+        logger.exception('job queue metrics unavailable')
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,166 @@
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, profiling
+from .db_router import begin_request, end_request, pin_to_primary
+
+
+class HybridMiddleware:
+    """
+    Base for middleware usable in both sync (WSGI) and async (ASGI) chains.
+    A sync-only middleware would force async views back onto a thread.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.handle(request)
+    
+    def handle(self, request):
+        return self.get_response(request)
+    
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+
+def _attach_sample(sample):
+    for alias in settings.DATABASES:
+        connections[alias].execute_wrappers.append(sample)
+
+
+def _detach_sample(sample):
+    for alias in settings.DATABASES:
+        connections[alias].execute_wrappers.remove(sample)
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    """
+    Records latency for every request and, for a sampled fraction, SQL query
+    count/time, serializer time and N+1 suspects (see metrics.py).
+    """
+    
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        
+        started = time.perf_counter()
+        sample = None
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            sample, token = metrics.begin_sample()
+            # Under ASGI every ORM call of a request runs on one thread-sensitive
+            # worker thread, so the wrapper goes on that thread's connections.
+            await sync_to_async(_attach_sample)(sample)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(_detach_sample)(sample)
+                metrics.end_sample(token)
+        else:
+            response = await self.get_response(request)
+        
+        self._record(request, response, started, sample)
+        return response
+    
+    def handle(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        
+        started = time.perf_counter()
+        sample = None
+        if random.random() < settings.METRICS_SAMPLE_RATE:
+            sample, token = metrics.begin_sample()
+            try:
+                with ExitStack() as stack:
+                    for alias in settings.DATABASES:
+                        stack.enter_context(connections[alias].execute_wrapper(sample))
+                    response = self.get_response(request)
+            finally:
+                metrics.end_sample(token)
+        else:
+            response = self.get_response(request)
+        
+        self._record(request, response, started, sample)
+        return response
+    
+    def _record(self, request, response, started, sample):
+        match = getattr(request, 'resolver_match', None)
+        metrics.record_request(
+            match.view_name if match else 'unmatched',
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            sample,
+        )
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Tracks database routing state for the request and, when the request wrote
+    to the primary, pins the authenticated user to it (read-your-writes).
+    """
+    
+    def handle(self, request):
+        token = begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+        self._pin(request, state)
+        return response
+    
+    async def __acall__(self, request):
+        # The state object is shared with the threads sync_to_async copies the
+        # context into, so writes made there are seen here.
+        token = begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = end_request(token)
+        self._pin(request, state)
+        return response
+    
+    def _pin(self, request, state):
+        if state.wrote:
+            # DRF copies the authenticated (JWT) user onto the Django request
+            pin_to_primary(getattr(request, 'user', None))
+
+
+class RequestProfilerMiddleware(HybridMiddleware):
+    """
+    Runs selected views under a profiler (see profiling.py). Must be the last
+    middleware so every other process_view hook (CSRF) has already run.
+    Async views are not profiled: their work runs on the event loop, outside
+    the thread this hook executes on.
+    """
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func):
+            return None
+        
+        view_name = request.resolver_match.view_name if request.resolver_match else ''
+        mode = profiling.select_mode(view_name, request.META.get('HTTP_X_PROFILE_TOKEN'))
+        if mode is None:
+            return None
+        
+        capture = profiling.Capture(mode)
+        with capture:
+            response = view_func(request, *view_args, **view_kwargs)
+            # DRF responses render lazily; include rendering in the profile
+            if hasattr(response, 'render') and callable(response.render):
+                response = response.render()
+        path = capture.save(view_name or 'unmatched')
+        response['X-Profile-File'] = path.name
+        return response
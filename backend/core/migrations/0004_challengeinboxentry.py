@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_inbox(apps, schema_editor):
+    Challenge = apps.get_model('core', 'Challenge')
+    ChallengeInboxEntry = apps.get_model('core', 'ChallengeInboxEntry')
+    entries = []
+    challenges = Challenge.objects.select_related('challenger', 'opponent', 'category', 'winner')
+    for challenge in challenges.iterator(chunk_size=1000):
+        common = {
+            'challenge_id': challenge.id, 'status': challenge.status,
+            'category_id': challenge.category_id, 'category_name': challenge.category.name,
+            'winner_id': challenge.winner_id, 'winner_name': challenge.winner.username if challenge.winner else '',
+            'created_at': challenge.created_at,
+        }
+        entries.append(ChallengeInboxEntry(
+            user_id=challenge.challenger_id, role='SENT', counterpart_id=challenge.opponent_id,
+            counterpart_name=challenge.opponent.username if challenge.opponent else '', **common
+        ))
+        if challenge.opponent_id:
+            entries.append(ChallengeInboxEntry(
+                user_id=challenge.opponent_id, role='RECEIVED', counterpart_id=challenge.challenger_id,
+                counterpart_name=challenge.challenger.username, **common
+            ))
+        if len(entries) >= 1000:
+            ChallengeInboxEntry.objects.bulk_create(entries)
+            entries = []
+    ChallengeInboxEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_userprofile_role'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChallengeInboxEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('SENT', 'Sent'), ('RECEIVED', 'Received')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ACTIVE', 'Active'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], max_length=20)),
+                ('counterpart_name', models.CharField(blank=True, max_length=150)),
+                ('category_name', models.CharField(max_length=100)),
+                ('winner_name', models.CharField(blank=True, max_length=150)),
+                ('created_at', models.DateTimeField(help_text='When the challenge was created')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.category')),
+                ('challenge', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='core.challenge')),
+                ('counterpart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='challenge_inbox', to=settings.AUTH_USER_MODEL)),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', 'status', '-created_at', '-id'], name='inbox_user_status_idx'), models.Index(fields=['user', '-created_at', '-id'], name='inbox_user_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='challengeinboxentry',
+            constraint=models.UniqueConstraint(fields=('user', 'challenge'), name='unique_inbox_entry'),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0004_challengeinboxentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BadgeCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score_id', models.BigIntegerField(default=0)),
+                ('challenge_completed_at', models.DateTimeField(blank=True, null=True)),
+                ('challenge_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BadgeState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('streak', models.IntegerField(default=0, help_text='Current run of correct answers')),
+                ('best_streak', models.IntegerField(default=0)),
+                ('fast_correct', models.IntegerField(default=0, help_text='Correct answers under the speed threshold')),
+                ('category_correct', models.JSONField(blank=True, default=dict, help_text='Correct answers per category id')),
+                ('challenge_wins', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='badge_state', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+TABLE = 'core_question_fts'
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"title, question_text, options, explanation, tokenize='porter unicode61 remove_diacritics 2')"
+)
+BACKFILL_SQL = (
+    f"INSERT INTO {TABLE} (rowid, title, question_text, options, explanation) "
+    f"SELECT id, title, question_text, COALESCE(options, ''), explanation FROM core_question"
+)
+
+
+def create_index(apps, schema_editor):
+    # FTS5 is SQLite only; other databases use the icontains fallback
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(BACKFILL_SQL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
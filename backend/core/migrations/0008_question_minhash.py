@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_question_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='minhash',
+            field=models.BinaryField(blank=True, help_text='MinHash signature (core/dedup.py)', null=True),
+        ),
+        migrations.CreateModel(
+            name='QuestionLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.SmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='core.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band', 'bucket'], name='question_lsh_bucket_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_question_minhash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='answer_aliases',
+            field=models.JSONField(blank=True, default=list, help_text='Other accepted answers for QUICK type'),
+        ),
+    ]
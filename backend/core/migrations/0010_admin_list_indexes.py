@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_question_answer_aliases'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='challenge',
+            index=models.Index(fields=['-created_at', '-id'], name='challenge_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['-created_at', '-id'], name='score_created_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0010_admin_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150)),
+                ('format', models.CharField(choices=[('SINGLE_ELIMINATION', 'Single elimination'), ('SWISS', 'Swiss')], default='SINGLE_ELIMINATION', max_length=20)),
+                ('seeding', models.CharField(choices=[('POINTS', 'Total points'), ('WINS', 'Challenge wins'), ('RANDOM', 'Random')], default='POINTS', max_length=10)),
+                ('status', models.CharField(choices=[('REGISTRATION', 'Registration'), ('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('CANCELLED', 'Cancelled')], default='REGISTRATION', max_length=20)),
+                ('max_entrants', models.PositiveIntegerField(blank=True, help_text='Empty for no limit', null=True)),
+                ('swiss_rounds', models.PositiveIntegerField(blank=True, help_text='Empty for ceil(log2(entrants))', null=True)),
+                ('current_round', models.IntegerField(default=0)),
+                ('starts_at', models.DateTimeField(blank=True, help_text='Started automatically at this time', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tournaments', to='core.category')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tournaments_won', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentRound',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.IntegerField()),
+                ('matches_total', models.IntegerField(default=0)),
+                ('matches_done', models.IntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rounds', to='core.tournament')),
+            ],
+            options={
+                'ordering': ['number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('round', models.IntegerField()),
+                ('table', models.IntegerField(help_text='Position in the round, from 1')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done')], default='PENDING', max_length=10)),
+                ('tallied', models.BooleanField(default=False, help_text='Counted in the entries and the round')),
+                ('reported_at', models.DateTimeField(blank=True, null=True)),
+                ('player_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('player_b', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='core.tournament')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['round', 'table'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TournamentEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seed', models.IntegerField(blank=True, help_text='1 is the strongest; set at start', null=True)),
+                ('score', models.IntegerField(default=0)),
+                ('wins', models.IntegerField(default=0)),
+                ('losses', models.IntegerField(default=0)),
+                ('byes', models.IntegerField(default=0)),
+                ('eliminated', models.BooleanField(default=False)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='core.tournament')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tournament_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-score', 'seed', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tournamentround',
+            constraint=models.UniqueConstraint(fields=('tournament', 'number'), name='unique_tournament_round'),
+        ),
+        migrations.AddConstraint(
+            model_name='tournamentmatch',
+            constraint=models.UniqueConstraint(fields=('tournament', 'round', 'table'), name='unique_tournament_table'),
+        ),
+        migrations.AddIndex(
+            model_name='tournamententry',
+            index=models.Index(fields=['tournament', '-score', 'seed'], name='tournament_standings_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tournamententry',
+            constraint=models.UniqueConstraint(fields=('tournament', 'user'), name='unique_tournament_entry'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_tournaments'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', '-total_points', 'id'], name='profile_board_idx'),
+        ),
+    ]
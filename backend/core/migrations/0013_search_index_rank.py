@@ -0,0 +1,35 @@
+from django.db import migrations
+
+TABLE = 'core_question_fts'
+COLUMNS = "title, question_text, options, explanation, tokenize='porter unicode61 remove_diacritics 2'"
+BACKFILL_SQL = (
+    f"INSERT INTO {TABLE} (rowid, title, question_text, options, explanation) "
+    f"SELECT id, title, question_text, COALESCE(options, ''), explanation FROM core_question"
+)
+
+
+def recreate(prefix, rank):
+    def run(apps, schema_editor):
+        # FTS5 is SQLite only; other databases use the icontains fallback
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+        schema_editor.execute(f'CREATE VIRTUAL TABLE {TABLE} USING fts5({COLUMNS}{prefix})')
+        if rank:
+            schema_editor.execute(f"INSERT INTO {TABLE} ({TABLE}, rank) VALUES ('rank', '{rank}')")
+        schema_editor.execute(BACKFILL_SQL)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_profile_board_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            recreate(", prefix='2 3'", 'bm25(10.0, 4.0, 2.0, 1.0)'),
+            recreate('', None),
+        ),
+    ]
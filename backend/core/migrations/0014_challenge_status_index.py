@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_search_index_rank'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='challenge',
+            index=models.Index(fields=['status', 'id'], name='challenge_status_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_entries(apps, schema_editor):
+    Tournament = apps.get_model('core', 'Tournament')
+    TournamentEntry = apps.get_model('core', 'TournamentEntry')
+    entries = TournamentEntry.objects.filter(tournament=OuterRef('pk')).order_by().values(
+        'tournament').annotate(n=Count('id')).values('n')
+    Tournament.objects.update(entrant_count=Coalesce(Subquery(entries), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_challenge_status_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='entrant_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Entries; kept by tournaments.join() and signals.py'),
+        ),
+        migrations.RunPython(count_entries, migrations.RunPython.noop),
+    ]
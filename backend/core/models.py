@@ -56,9 +56,11 @@ class Question(models.Model):
     options = models.JSONField(null=True, blank=True, help_text='JSON array for MCQ options')
     correct_option = models.IntegerField(null=True, blank=True, help_text='Index of correct option for MCQ')
     correct_answer = models.TextField(null=True, blank=True, help_text='Correct answer for QUICK type')
+    answer_aliases = models.JSONField(default=list, blank=True, help_text='Other accepted answers for QUICK type')
     solution_code = models.TextField(null=True, blank=True, help_text='Solution code for CODING type')
     explanation = models.TextField(blank=True, help_text='Explanation of the answer')
     points = models.IntegerField(default=10)
+    minhash = models.BinaryField(null=True, blank=True, editable=False, help_text='MinHash signature (core/dedup.py)')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -69,6 +71,21 @@ class Question(models.Model):
         return f"{self.title} ({self.get_question_type_display()})"
 
 
+class QuestionLSHBucket(models.Model):
+    """One LSH band bucket of a question's MinHash signature (core/dedup.py)"""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='lsh_buckets')
+    band = models.SmallIntegerField()
+    bucket = models.BigIntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'bucket'], name='question_lsh_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Question {self.question_id} band {self.band}"
+
+
 class UserProfile(models.Model):
     ROLE_CHOICES = [
         ('admin', 'Admin'),
@@ -84,6 +101,12 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            # The overall board's order; also what live rank counts walk
+            models.Index(fields=['role', '-total_points', 'id'], name='profile_board_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.user.username}'s Profile ({self.role})"
     
@@ -103,6 +126,9 @@ class Score(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'question', 'created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='score_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.question.title} - {self.points_awarded}pts"
@@ -127,11 +153,229 @@ class Challenge(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='challenge_created_idx'),
+            # run_timers' rescan of open challenges reads only this index
+            models.Index(fields=['status', 'id'], name='challenge_status_idx'),
+        ]
     
     def __str__(self):
         return f"Challenge: {self.challenger.username} vs {self.opponent.username if self.opponent else 'Open'}"
 
 
+class ChallengeInboxEntry(models.Model):
+    """
+    One participant's view of a challenge, denormalized for the inbox feed
+    (names copied in, so listing a page needs no joins). Kept in sync by
+    core/inbox.py.
+    """
+    ROLE_CHOICES = [
+        ('SENT', 'Sent'),
+        ('RECEIVED', 'Received'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='challenge_inbox')
+    challenge = models.ForeignKey(Challenge, on_delete=models.CASCADE, related_name='inbox_entries')
+    role = models.CharField(max_length=10, choices=ROLE_CHOICES)
+    status = models.CharField(max_length=20, choices=Challenge.STATUS_CHOICES)
+    counterpart = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    counterpart_name = models.CharField(max_length=150, blank=True)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+')
+    category_name = models.CharField(max_length=100)
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    winner_name = models.CharField(max_length=150, blank=True)
+    created_at = models.DateTimeField(help_text='When the challenge was created')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'challenge'], name='unique_inbox_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'status', '-created_at', '-id'], name='inbox_user_status_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='inbox_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id}: challenge {self.challenge_id} ({self.status})"
+
+
+class BadgeState(models.Model):
+    """
+    The running per-user counters badge rules are evaluated against, updated
+    incrementally from the score and challenge streams by core/badges.py.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='badge_state')
+    streak = models.IntegerField(default=0, help_text='Current run of correct answers')
+    best_streak = models.IntegerField(default=0)
+    fast_correct = models.IntegerField(default=0, help_text='Correct answers under the speed threshold')
+    category_correct = models.JSONField(default=dict, blank=True, help_text='Correct answers per category id')
+    challenge_wins = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Badge state of user {self.user_id}"
+
+
+class BadgeCursor(models.Model):
+    """Single row: how far the badge engine has read the score and challenge streams"""
+    score_id = models.BigIntegerField(default=0)
+    challenge_completed_at = models.DateTimeField(null=True, blank=True)
+    challenge_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Badge cursor at score {self.score_id}"
+
+
+class Job(models.Model):
+    """A unit of deferred work for the local job queue (core/jobs.py)"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'name', 'run_after'], name='job_ready_idx'),
+            models.Index(fields=['locked_by'], name='job_locked_by_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class Tournament(models.Model):
+    """A scheduled bracket of 1v1 matches, run by core/tournaments.py"""
+    FORMAT_CHOICES = [
+        ('SINGLE_ELIMINATION', 'Single elimination'),
+        ('SWISS', 'Swiss'),
+    ]
+    
+    SEEDING_CHOICES = [
+        ('POINTS', 'Total points'),
+        ('WINS', 'Challenge wins'),
+        ('RANDOM', 'Random'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('REGISTRATION', 'Registration'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('CANCELLED', 'Cancelled'),
+    ]
+    
+    name = models.CharField(max_length=150)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='tournaments')
+    format = models.CharField(max_length=20, choices=FORMAT_CHOICES, default='SINGLE_ELIMINATION')
+    seeding = models.CharField(max_length=10, choices=SEEDING_CHOICES, default='POINTS')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='REGISTRATION')
+    max_entrants = models.PositiveIntegerField(null=True, blank=True, help_text='Empty for no limit')
+    entrant_count = models.PositiveIntegerField(
+        default=0, editable=False, help_text='Entries; kept by tournaments.join() and signals.py')
+    swiss_rounds = models.PositiveIntegerField(null=True, blank=True, help_text='Empty for ceil(log2(entrants))')
+    current_round = models.IntegerField(default=0)
+    winner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tournaments_won')
+    starts_at = models.DateTimeField(null=True, blank=True, help_text='Started automatically at this time')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+    
+    def __str__(self):
+        return f"{self.name} ({self.get_format_display()}, {self.status})"
+
+
+class TournamentEntry(models.Model):
+    """An entrant and their running totals; score counts wins and byes"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tournament_entries')
+    seed = models.IntegerField(null=True, blank=True, help_text='1 is the strongest; set at start')
+    score = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    byes = models.IntegerField(default=0)
+    eliminated = models.BooleanField(default=False)
+    joined_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-score', 'seed', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'user'], name='unique_tournament_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['tournament', '-score', 'seed'], name='tournament_standings_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} in tournament {self.tournament_id} (seed {self.seed})"
+
+
+class TournamentRound(models.Model):
+    """Progress of one round; matches_done is incremented as results are tallied"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='rounds')
+    number = models.IntegerField()
+    matches_total = models.IntegerField(default=0)
+    matches_done = models.IntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['number']
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'number'], name='unique_tournament_round'),
+        ]
+    
+    def __str__(self):
+        return f"Tournament {self.tournament_id} round {self.number}: {self.matches_done}/{self.matches_total}"
+
+
+class TournamentMatch(models.Model):
+    """One pairing of a round; a match without player_b is a bye, decided when created"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DONE', 'Done'),
+    ]
+    
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='matches')
+    round = models.IntegerField()
+    table = models.IntegerField(help_text='Position in the round, from 1')
+    player_a = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    player_b = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    winner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    tallied = models.BooleanField(default=False, help_text='Counted in the entries and the round')
+    reported_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['round', 'table']
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'round', 'table'], name='unique_tournament_table'),
+        ]
+    
+    def __str__(self):
+        return f"Tournament {self.tournament_id} round {self.round} table {self.table}"
+
+
 # Signal to automatically create user profile when user is created
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
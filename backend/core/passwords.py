@@ -0,0 +1,158 @@
+"""
+Password hashing off the request path.
+
+A PBKDF2 hash costs tens of milliseconds of CPU. When a class signs up at
+once, unbounded hashing in every request thread takes the CPU from the quiz
+endpoints. Registration and login therefore hash on one bounded pool per
+process (HashPool), PASSWORD_HASH_WORKERS threads wide. Threads are enough:
+hashlib's PBKDF2, like the argon2 and bcrypt bindings, releases the GIL
+while it runs.
+
+The pool also does admission control. At most PASSWORD_HASH_QUEUE hashes
+may wait behind the running ones. Beyond that, submit() raises HashPoolBusy
+(503 with Retry-After) at once, so a spike is turned away quickly rather
+than queueing until clients time out. A caller that waits longer than
+PASSWORD_HASH_TIMEOUT gets the same 503. If its hash has not started by
+then, it is cancelled and its slot freed.
+
+Sync callers (PooledModelBackend, used by simplejwt's login view and the
+Django admin) block on the result. The async register view
+(async_views.py) awaits it without holding a thread. The admin roster
+upload hashes on it too, one window of `workers` hashes at a time
+(make_passwords). Hash and queue-wait
+times are recorded apart from request latency (quiz_password_hash_* in
+metrics.py).
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .metrics import HASH_REJECTED, HASH_SECONDS, HASH_WAIT_SECONDS
+
+
+class HashPoolBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many sign-ins at once, try again shortly.'
+    default_code = 'hash_pool_busy'
+    # DRF's exception handler turns this into a Retry-After header
+    wait = 1
+
+
+class HashPool:
+    """Bounded hashing executor with a bounded wait queue"""
+
+    def __init__(self, workers, queue_size):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+
+    def _ensure_started(self):
+        # Created lazily, and again after a fork (threads don't survive fork)
+        if self._executor is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                self._pid = os.getpid()
+                self._pending = 0
+
+    @property
+    def pending(self):
+        """Hashes running or waiting"""
+        return self._pending
+
+    def submit(self, operation, fn, *args):
+        self._ensure_started()
+        with self._lock:
+            if self._pending >= self.workers + self.queue_size:
+                HASH_REJECTED.inc((('operation', operation),))
+                raise HashPoolBusy()
+            self._pending += 1
+        queued = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            HASH_WAIT_SECONDS.observe((('operation', operation),), started - queued)
+            try:
+                return fn(*args)
+            finally:
+                HASH_SECONDS.observe((('operation', operation),), time.perf_counter() - started)
+
+        try:
+            future = self._executor.submit(run)
+        except RuntimeError:
+            self._release()
+            raise
+        # Also fires for a future cancelled before it ran, which run() never sees
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+
+def _result(future):
+    """Wait for a pooled hash; a hash still queued at the timeout is dropped"""
+    try:
+        return future.result(timeout=settings.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        future.cancel()
+        raise HashPoolBusy()
+
+
+pool = HashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+
+
+def _check(raw, encoded):
+    """(matches, needs rehash) without a setter: upgrades are saved by the caller"""
+    if not hashers.check_password(raw, encoded):
+        return False, False
+    return True, hashers.identify_hasher(encoded).must_update(encoded)
+
+
+def make_password(raw):
+    return _result(pool.submit('make', hashers.make_password, raw))
+
+
+def check_password(raw, encoded):
+    return _result(pool.submit('check', _check, raw, encoded))
+
+
+def make_passwords(raws, operation='provision'):
+    """
+    Hash a batch on the pool, at most `workers` at a time: a sign-in that
+    arrives meanwhile waits behind one window, not behind the whole batch
+    """
+    encoded = []
+    for start in range(0, len(raws), pool.workers):
+        futures = []
+        try:
+            for raw in raws[start:start + pool.workers]:
+                futures.append(pool.submit(operation, hashers.make_password, raw))
+            encoded.extend(_result(future) for future in futures)
+        except HashPoolBusy:
+            for future in futures:
+                future.cancel()
+            raise
+    return encoded
+
+
+async def amake_password(raw):
+    # wait_for cancels the wrapped future on timeout, which cancels a queued hash
+    try:
+        return await asyncio.wait_for(
+            asyncio.wrap_future(pool.submit('make', hashers.make_password, raw)), settings.PASSWORD_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HashPoolBusy()
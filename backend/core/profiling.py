@@ -0,0 +1,226 @@
+"""
+On-demand request profiling.
+
+A request is profiled when it carries a valid signed X-Profile-Token header
+(minted by an admin through /api/admin/profiles/token/), or when an admin has
+switched profiling on for some views with a sample rate
+(/api/admin/profiles/toggle/). Battle websocket messages can be selected the
+same way through the toggle, using the view name 'ws:battle'. cProfile hooks
+the whole event-loop thread, so only one message per loop is captured with
+it at a time; messages overlapping that capture are sampled instead.
+
+Two capture modes:
+
+* cprofile: deterministic cProfile, saved as a .prof pstats file
+  (snakeviz, flameprof, `python -m pstats`);
+* sample: a background thread samples the handler thread's stack every
+  PROFILING_SAMPLE_INTERVAL seconds and writes collapsed stacks
+  (.collapsed, for flamegraph.pl or speedscope). Lower overhead.
+
+Files land in PROFILING_DIR and only the newest PROFILING_MAX_FILES are kept.
+"""
+import asyncio
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+MODES = ('cprofile', 'sample')
+TOKEN_SALT = 'core.profiling'
+TOGGLE_KEY = 'profiling:toggle'
+# The toggle is re-read from the cache at most this often per process
+TOGGLE_TTL = 5.0
+
+_toggle_cache = {'value': None, 'fetched': 0.0}
+# Event loops with a cProfile capture running
+_cprofile_loops = weakref.WeakSet()
+
+
+def make_token(mode='cprofile'):
+    return signing.dumps({'mode': mode}, salt=TOKEN_SALT)
+
+
+def _token_mode(token):
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return data.get('mode') if data.get('mode') in MODES else None
+
+
+def get_toggle():
+    now = time.monotonic()
+    if now - _toggle_cache['fetched'] > TOGGLE_TTL:
+        _toggle_cache['value'] = cache.get(TOGGLE_KEY)
+        _toggle_cache['fetched'] = now
+    return _toggle_cache['value']
+
+
+def set_toggle(enabled, views=None, sample_rate=1.0, mode='cprofile', minutes=10):
+    if enabled:
+        value = {
+            'views': list(views or []),
+            'sample_rate': float(sample_rate),
+            'mode': mode,
+            'until': time.time() + minutes * 60,
+        }
+        cache.set(TOGGLE_KEY, value, timeout=int(minutes * 60))
+    else:
+        value = None
+        cache.delete(TOGGLE_KEY)
+    _toggle_cache.update(value=value, fetched=time.monotonic())
+    return value
+
+
+def select_mode(view_name, token=None):
+    """Return the capture mode if this request/message should be profiled"""
+    if token:
+        mode = _token_mode(token)
+        if mode:
+            return mode
+    toggle = get_toggle()
+    if toggle and time.time() < toggle['until'] and (not toggle['views'] or view_name in toggle['views']):
+        if random.random() < toggle['sample_rate']:
+            return toggle['mode']
+    if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return 'sample'
+    return None
+
+
+class StackSampler:
+    """Samples one thread's stack from a helper thread"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Capture:
+    """Context manager capturing one profile in the given mode"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self._profiler = None
+        self._sampler = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL)
+            self._sampler.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profiler is not None:
+            self._profiler.disable()
+        else:
+            self._sampler.__exit__(*exc)
+        self.elapsed = time.perf_counter() - self.started
+
+    def save(self, label):
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        safe_label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label)
+        stem = f'{time.strftime("%Y%m%dT%H%M%S")}-{safe_label}-{int(self.elapsed * 1000)}ms-{uuid.uuid4().hex[:6]}'
+        if self._profiler is not None:
+            path = directory / f'{stem}.prof'
+            self._profiler.dump_stats(path)
+        else:
+            path = directory / f'{stem}.collapsed'
+            path.write_text(''.join(f'{stack} {count}\n' for stack, count in self._sampler.stacks.items()))
+        _prune(directory)
+        return path
+
+
+def _prune(directory):
+    for old, _ in profile_stats(directory)[settings.PROFILING_MAX_FILES:]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles(directory=None):
+    directory = Path(directory or settings.PROFILING_DIR)
+    if not directory.is_dir():
+        return []
+    return [p for p in directory.iterdir() if p.suffix in ('.prof', '.collapsed')]
+
+
+def profile_stats(directory=None):
+    """(path, stat) for every profile, newest first"""
+    stats = []
+    for path in list_profiles(directory):
+        try:
+            stats.append((path, path.stat()))
+        except FileNotFoundError:
+            # Pruned by another request or process since the listing
+            continue
+    return sorted(stats, key=lambda item: item[1].st_mtime, reverse=True)
+
+
+def profile_ws_message(view_name):
+    """Decorator for async consumer handlers, selected through the toggle"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(self, *args, **kwargs):
+            mode = select_mode(view_name)
+            if mode is None:
+                return await handler(self, *args, **kwargs)
+            loop = asyncio.get_running_loop()
+            if mode == 'cprofile' and loop in _cprofile_loops:
+                # A second profiler would replace the first one's hook on the
+                # loop thread, and disabling either would end both captures
+                mode = 'sample'
+            # Note: captures everything the event loop runs while the handler is suspended
+            capture = Capture(mode)
+            if mode == 'cprofile':
+                _cprofile_loops.add(loop)
+            try:
+                with capture:
+                    result = await handler(self, *args, **kwargs)
+            finally:
+                if mode == 'cprofile':
+                    _cprofile_loops.discard(loop)
+            # Dumping and pruning are disk I/O; keep them off the event loop
+            await sync_to_async(capture.save, thread_sensitive=False)(view_name)
+            return result
+        return wrapper
+    return decorator
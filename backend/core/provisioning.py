@@ -0,0 +1,180 @@
+"""
+Bulk user provisioning from a roster.
+
+A roster is CSV (with a header row) or JSONL (one object per line) with a
+`username` and, optionally, `email`, `password`, `first_name`, `last_name`
+and `role`. Rows without a password get a generated one, which is returned
+once so it can be handed out.
+
+Creating users one by one costs a User insert, a post_save signal and a
+UserProfile insert each, plus a PBKDF2 hash on the request thread.
+provision() instead:
+
+- validates every row first (username rules, duplicate usernames, roles);
+- skips usernames that already exist before hashing anything, so a re-run
+  of the same roster creates nothing and costs no hashing;
+- hashes the remaining passwords in parallel (PBKDF2 releases the GIL).
+  `manage.py provision_users` uses its own PROVISION_HASH_WORKERS threads.
+  The admin endpoint passes passwords.make_passwords instead, so a request
+  shares the bounded login hash pool rather than taking every core;
+- inserts users and profiles with bulk_create, PROVISION_CHUNK_SIZE rows
+  per transaction, through run_write. bulk_create sends no post_save, so
+  the profile signal does not fire. ignore_conflicts makes a username
+  registered concurrently a skip rather than an error. Rows are read back
+  by username and password hash: the salt makes each hash unique, so only
+  users this insert created get a profile and are reported as created.
+
+The leaderboard version is bumped once at the end, instead of once per user.
+"""
+import csv
+import io
+import json
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UserProfile
+from .sqlite import run_write
+from .versioning import bump_version, LEADERBOARD
+
+FIELDS = ('username', 'email', 'password', 'first_name', 'last_name', 'role')
+ROLES = dict(UserProfile.ROLE_CHOICES)
+
+
+class RosterError(Exception):
+    """The roster could not be read at all"""
+
+
+def parse_roster(text, fmt=None):
+    """Rows (dicts) from CSV or JSONL text; fmt is 'csv', 'jsonl' or None to sniff"""
+    if fmt is None:
+        fmt = 'jsonl' if text.lstrip().startswith('{') else 'csv'
+    if fmt == 'jsonl':
+        rows = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                raise RosterError(f'Line {number}: invalid JSON ({exc})')
+            if not isinstance(row, dict):
+                raise RosterError(f'Line {number}: expected a JSON object')
+            rows.append(row)
+        return rows
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames or 'username' not in [name.strip() for name in reader.fieldnames]:
+            raise RosterError('CSV roster needs a header row with a username column')
+        return [{(key or '').strip(): value for key, value in row.items()} for row in reader]
+    raise RosterError(f'Unknown roster format: {fmt}')
+
+
+def _clean(row):
+    cleaned = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    username = User.normalize_username(cleaned['username'])
+    field = User._meta.get_field('username')
+    field.run_validators(username)
+    if not username or len(username) > field.max_length:
+        raise ValidationError(f'username must be 1 to {field.max_length} characters')
+    cleaned['username'] = username
+    cleaned['email'] = User.objects.normalize_email(cleaned['email'])
+    cleaned['role'] = cleaned['role'].lower() or 'user'
+    if cleaned['role'] not in ROLES:
+        raise ValidationError(f"role must be one of: {', '.join(ROLES)}")
+    return cleaned
+
+
+def validate(rows):
+    """(valid rows, [{'row', 'username', 'errors'}]); later duplicates of a username are errors"""
+    valid, errors, seen = [], [], set()
+    for number, row in enumerate(rows, start=1):
+        try:
+            cleaned = _clean(row)
+        except ValidationError as exc:
+            errors.append({'row': number, 'username': row.get('username'), 'errors': exc.messages})
+            continue
+        if cleaned['username'] in seen:
+            errors.append({'row': number, 'username': cleaned['username'], 'errors': ['Duplicate username in roster']})
+            continue
+        seen.add(cleaned['username'])
+        valid.append(cleaned)
+    return valid, errors
+
+
+def _insert_chunk(rows):
+    """Insert one chunk of users (hashed) and their profiles; returns the usernames created"""
+    now = timezone.now()
+    usernames = [row['username'] for row in rows]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    User.objects.bulk_create([
+        User(
+            username=row['username'], email=row['email'], password=row['password_hash'],
+            first_name=row['first_name'], last_name=row['last_name'], date_joined=now,
+        )
+        for row in rows if row['username'] not in existing
+    ], ignore_conflicts=True)
+    # Ids are read back rather than returned by the insert: MySQL can't
+    # return them, and ignore_conflicts rows have none. A row whose hash is
+    # not ours was registered by someone else between the check and the insert.
+    hashes = {row['username']: row['password_hash'] for row in rows if row['username'] not in existing}
+    ours = {
+        username: user_id
+        for username, user_id, password in User.objects.filter(username__in=hashes).values_list(
+            'username', 'id', 'password')
+        if password == hashes[username]
+    }
+    roles = {row['username']: row['role'] for row in rows}
+    UserProfile.objects.bulk_create([
+        UserProfile(user_id=user_id, role=roles[username]) for username, user_id in ours.items()
+    ], ignore_conflicts=True)
+    return [username for username in usernames if username in ours]
+
+
+def provision(rows, chunk_size=None, workers=None, progress=None, make_passwords=None):
+    """
+    Create the roster's missing users. Returns {'created': [{'username',
+    'password' (generated ones only)}], 'existing': [usernames], 'errors': [...]}.
+    make_passwords hashes a list of passwords; by default `workers` local
+    threads do.
+    """
+    if make_passwords is None:
+        workers = workers or settings.PROVISION_HASH_WORKERS
+        with ThreadPoolExecutor(workers, thread_name_prefix='provision-hash') as hash_pool:
+            return provision(
+                rows, chunk_size, progress=progress,
+                make_passwords=lambda raws: list(hash_pool.map(hashers.make_password, raws)))
+    chunk_size = chunk_size or settings.PROVISION_CHUNK_SIZE
+    valid, errors = validate(rows)
+    created, existing = [], []
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        present = set(User.objects.filter(
+            username__in=[row['username'] for row in chunk]).values_list('username', flat=True))
+        existing.extend(row['username'] for row in chunk if row['username'] in present)
+        chunk = [row for row in chunk if row['username'] not in present]
+        if not chunk:
+            continue
+        for row in chunk:
+            if not row['password']:
+                row['password'] = row['generated'] = secrets.token_urlsafe(9)
+        for row, encoded in zip(chunk, make_passwords([row['password'] for row in chunk])):
+            row['password_hash'] = encoded
+        inserted = set(run_write(_insert_chunk, chunk))
+        for row in chunk:
+            if row['username'] in inserted:
+                created.append({'username': row['username'], 'password': row.get('generated')})
+            else:
+                # Registered by someone else between the check and the insert
+                existing.append(row['username'])
+        if progress:
+            progress(len(created), len(existing))
+    if created:
+        transaction.on_commit(lambda: bump_version(LEADERBOARD))
+    return {'created': created, 'existing': existing, 'errors': errors}
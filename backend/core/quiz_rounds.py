@@ -0,0 +1,92 @@
+"""
+Stateless signed quiz rounds.
+
+A quiz draw made with ?round=1 by a signed-in user returns, in the
+X-Quiz-Round header, a token signed with SECRET_KEY (django.core.signing)
+carrying the user id, the drawn question ids, the issue time and a random
+nonce. Each submit sends the token back. The server checks the signature
+and the round's contents without touching the database, and times the
+answer itself: from the previous answer in the same round, or from the draw
+for the first one. The client's own time_taken is ignored, and only timed
+answers can earn the speed bonus.
+
+Replays are refused through the shared cache, so they are caught whichever
+worker they reach. Each question of a round can be answered once: the first
+answer claims a `quiz_round:<nonce>:<question>` key with cache.add(), which
+is atomic on the shared backends (settings.SHARED_CACHE_BACKENDS), and the
+key lives as long as the token stays valid. It holds the answer time, which
+is what the next answer in the round is timed from. The cache must not
+evict these keys early (Redis' default noeviction policy, or enough memory).
+"""
+import math
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+SALT = 'core.quiz_rounds'
+HEADER = 'X-Quiz-Round'
+
+
+class RoundError(Exception):
+    pass
+
+
+def requested(request):
+    """True for a draw that should issue a round token"""
+    return request.GET.get('round') in ('1', 'true')
+
+
+def issue(user_id, question_ids, now=None):
+    return signing.dumps({
+        'u': user_id,
+        'q': list(question_ids),
+        't': time.time() if now is None else now,
+        'n': secrets.token_urlsafe(9),
+    }, salt=SALT, compress=True)
+
+
+def attach(response, user, question_ids):
+    """Add a round token for these questions to a draw response"""
+    if user.is_authenticated:
+        response[HEADER] = issue(user.id, question_ids)
+        # Per user and single use: never cache or revalidate it
+        response['Cache-Control'] = 'no-store'
+    return response
+
+
+def _answer_key(nonce, question_id):
+    return f'quiz_round:{nonce}:{question_id}'
+
+
+def consume(nonce, issued, questions, question_id, now):
+    """Record an answer; returns when the previous one in the round was given"""
+    # Kept until the token itself expires; a replay after that fails max_age
+    ttl = max(1, math.ceil(issued + settings.QUIZ_ROUND_MAX_AGE - now))
+    if not cache.add(_answer_key(nonce, question_id), now, timeout=ttl):
+        raise RoundError('Question already answered in this round')
+    answered = cache.get_many([_answer_key(nonce, other) for other in questions if other != question_id])
+    return max([issued] + [at for at in answered.values() if at <= now])
+
+
+def verify(token, user_id, question_id, now=None):
+    """
+    Check a round token for one answer and consume it. Returns the seconds
+    taken (server-side); raises RoundError.
+    """
+    now = time.time() if now is None else now
+    try:
+        data = signing.loads(token, salt=SALT, max_age=settings.QUIZ_ROUND_MAX_AGE)
+        owner, questions, issued, nonce = data['u'], data['q'], float(data['t']), data['n']
+    except signing.SignatureExpired:
+        raise RoundError('Quiz round has expired, draw a new one')
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise RoundError('Invalid quiz round token')
+    if owner != user_id:
+        raise RoundError('Quiz round belongs to another user')
+    if question_id not in questions:
+        raise RoundError('Question is not part of this quiz round')
+    since = consume(nonce, issued, questions, question_id, now)
+    return max(0, math.ceil(now - since))
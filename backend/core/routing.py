@@ -0,0 +1,9 @@
+from django.urls import path
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/battle/<str:room_name>/', consumers.BattleConsumer.as_asgi()),
+    path('ws/battle/<str:room_name>/watch/', consumers.BattleSpectatorConsumer.as_asgi()),
+    path('ws/leaderboard/', consumers.LeaderboardConsumer.as_asgi()),
+    path('ws/challenges/', consumers.ChallengeInboxConsumer.as_asgi()),
+]
@@ -0,0 +1,167 @@
+"""
+Full-text question search.
+
+On SQLite, questions are indexed in an FTS5 table, core_question_fts, whose
+rowid is the question id. Title, text, options and explanation are
+tokenized with unicode61 and porter stemming. Results are ranked by bm25
+over every match, with title matches weighted highest: the weights are the
+table's persistent `rank` configuration, so queries ORDER BY rank and FTS5
+keeps only the top offset + limit while it scores. Search input never
+reaches FTS5 syntax directly: it is split into words, each word is quoted,
+and all words must match, the last one as a prefix (search-as-you-type).
+The table keeps 2- and 3-character prefix indexes, so a short trailing
+prefix is one index lookup rather than a scan of every matching term.
+
+The index is written in the same transaction as the question itself
+(signals.py), so saves and deletes show up immediately. Writes that bypass
+model signals (bulk_create, queryset.update) need
+`manage.py rebuild_search_index`.
+
+Other databases have no embedded index here. search() falls back to an
+icontains filter over title and question_text, so the API behaves the same,
+only slower.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Question
+
+TABLE = 'core_question_fts'
+COLUMNS = ('title', 'question_text', 'options', 'explanation')
+# bm25 weights, in COLUMNS order
+WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+MAX_TERMS = 8
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"{', '.join(COLUMNS)}, tokenize='porter unicode61 remove_diacritics 2', prefix='2 3')"
+)
+RANK_SQL = f"INSERT INTO {TABLE} ({TABLE}, rank) VALUES ('rank', 'bm25({', '.join(map(str, WEIGHTS))})')"
+INSERT_SQL = f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) VALUES (%s, %s, %s, %s, %s)"
+BACKFILL_SQL = (
+    f"INSERT INTO {TABLE} (rowid, {', '.join(COLUMNS)}) "
+    f"SELECT id, title, question_text, COALESCE(options, ''), explanation FROM core_question"
+)
+SEARCH_SQL = f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s ORDER BY rank LIMIT %s OFFSET %s"
+# CROSS JOIN keeps the FTS query as the outer loop; the category is checked
+# per match through the questions' primary key
+SEARCH_CATEGORY_SQL = (
+    f"SELECT {TABLE}.rowid FROM {TABLE} CROSS JOIN core_question q ON q.id = {TABLE}.rowid "
+    f"WHERE {TABLE} MATCH %s AND q.category_id = %s ORDER BY {TABLE}.rank LIMIT %s OFFSET %s"
+)
+
+WORD = re.compile(r'\w+')
+# Dropped from multi-word queries: they match most rows, and ranking cost
+# grows with the number of matches
+STOPWORDS = frozenset(
+    'a an and are as at be by does for from how in is it of on or the to was what when which who why with'.split()
+)
+
+
+def available(using=None):
+    using = using or router.db_for_read(Question)
+    return connections[using].vendor == 'sqlite'
+
+
+def match_expression(text):
+    """Safe FTS5 query for free text: every word, the last one as a prefix"""
+    words = WORD.findall(text.lower())
+    words = ([word for word in words if word not in STOPWORDS] or words)[:MAX_TERMS]
+    if not words:
+        return None
+    return ' '.join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
+
+
+def document(title, question_text, options, explanation):
+    if isinstance(options, (list, tuple)):
+        options = ' '.join(str(option) for option in options)
+    return title or '', question_text or '', options or '', explanation or ''
+
+
+# Index maintenance
+
+def index_questions(questions, using='default'):
+    """(Re)index saved questions"""
+    if not available(using) or not questions:
+        return
+    rows = [(q.id, *document(q.title, q.question_text, q.options, q.explanation)) for q in questions]
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(rows))})", [row[0] for row in rows])
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def remove_questions(ids, using='default'):
+    if not available(using) or not ids:
+        return
+    ids = list(ids)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE} WHERE rowid IN ({', '.join(['%s'] * len(ids))})", ids)
+
+
+def rebuild(using='default'):
+    """Re-create the index from the questions table; returns the number indexed"""
+    if not available(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+        cursor.execute(CREATE_SQL)
+        cursor.execute(RANK_SQL)
+        # options is stored as JSON text; its punctuation tokenizes away
+        cursor.execute(BACKFILL_SQL)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+# Queries
+
+def _like_filter(queryset, text):
+    # Fallback without an index: every word somewhere in the title or text
+    for word in WORD.findall(text)[:MAX_TERMS]:
+        queryset = queryset.filter(Q(title__icontains=word) | Q(question_text__icontains=word))
+    return queryset
+
+
+def search_ids(text, limit=20, offset=0, category_id=None, using=None):
+    """Question ids matching `text`, best first"""
+    using = using or router.db_for_read(Question)
+    expression = match_expression(text)
+    if expression is None:
+        return []
+    if not available(using):
+        queryset = _like_filter(Question.objects.using(using), text)
+        if category_id is not None:
+            queryset = queryset.filter(category_id=category_id)
+        return list(queryset.order_by('-created_at').values_list('id', flat=True)[offset:offset + limit])
+    with connections[using].cursor() as cursor:
+        if category_id is None:
+            cursor.execute(SEARCH_SQL, [expression, limit, offset])
+        else:
+            cursor.execute(SEARCH_CATEGORY_SQL, [expression, category_id, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def next_offset(offset, limit, returned):
+    """Offset of the next page, or None once the matches run out"""
+    return offset + limit if returned == limit else None
+
+
+def search(text, limit=20, offset=0, category_id=None):
+    """Matching questions (with their category), best first"""
+    ids = search_ids(text, limit, offset, category_id)
+    found = Question.objects.select_related('category').in_bulk(ids)
+    return [found[question_id] for question_id in ids if question_id in found]
+
+
+def filter_queryset(queryset, text):
+    """Restrict a Question queryset to full-text matches (admin search)"""
+    expression = match_expression(text)
+    if expression is None:
+        return queryset
+    if not available(queryset.db):
+        return _like_filter(queryset, text)
+    return queryset.filter(id__in=RawSQL(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [expression]))
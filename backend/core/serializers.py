@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Category, Question, UserProfile, Score, Challenge
+from .models import (
+    Category, Question, UserProfile, Score, Challenge, ChallengeInboxEntry,
+    Tournament, TournamentEntry, TournamentMatch, TournamentRound,
+)
+from . import passwords, tournaments
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -12,7 +16,9 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at']
     
     def get_question_count(self, obj):
-        return obj.questions.count()
+        # Use the queryset annotation when present to avoid a COUNT per row
+        count = getattr(obj, 'question_count', None)
+        return count if count is not None else obj.questions.count()
 
 
 class QuestionSerializer(serializers.ModelSerializer):
@@ -89,11 +95,15 @@ class RegisterSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password2')
-        user = User.objects.create_user(
-            username=validated_data['username'],
-            email=validated_data.get('email', ''),
-            password=validated_data['password']
+        # Hashed on the bounded hash pool; the async view passes the hash in
+        # through save(password_hash=...) after awaiting it
+        encoded = validated_data.pop('password_hash', None) or passwords.make_password(validated_data['password'])
+        user = User(
+            username=User.normalize_username(validated_data['username']),
+            email=User.objects.normalize_email(validated_data.get('email', '')),
+            password=encoded
         )
+        user.save()
         return user
 
 
@@ -124,11 +134,96 @@ class ChallengeSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'started_at', 'completed_at', 'status', 'winner']
 
 
+class ChallengeInboxSerializer(serializers.ModelSerializer):
+    """Inbox row; every field comes from the denormalized entry itself"""
+    id = serializers.IntegerField(source='challenge_id', read_only=True)
+    counterpart = serializers.IntegerField(source='counterpart_id', read_only=True)
+    category = serializers.IntegerField(source='category_id', read_only=True)
+    winner = serializers.IntegerField(source='winner_id', read_only=True)
+    
+    class Meta:
+        model = ChallengeInboxEntry
+        fields = [
+            'id', 'role', 'status', 'counterpart', 'counterpart_name',
+            'category', 'category_name', 'winner', 'winner_name',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class TournamentSerializer(serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    winner_name = serializers.CharField(source='winner.username', read_only=True, allow_null=True)
+    entrants = serializers.IntegerField(source='entrant_count', read_only=True)
+    
+    class Meta:
+        model = Tournament
+        fields = [
+            'id', 'name', 'category', 'category_name', 'format', 'seeding', 'status',
+            'max_entrants', 'swiss_rounds', 'entrants', 'current_round', 'winner', 'winner_name',
+            'starts_at', 'created_at', 'started_at', 'completed_at'
+        ]
+        read_only_fields = fields
+
+
+class AdminTournamentSerializer(TournamentSerializer):
+    """Settings are editable until the tournament starts"""
+    
+    class Meta(TournamentSerializer.Meta):
+        read_only_fields = [
+            'status', 'current_round', 'winner', 'created_at', 'started_at', 'completed_at'
+        ]
+    
+    def validate(self, attrs):
+        if self.instance is not None and self.instance.status != 'REGISTRATION':
+            raise serializers.ValidationError('Tournament has already started')
+        return attrs
+
+
+class TournamentEntrySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    
+    class Meta:
+        model = TournamentEntry
+        fields = ['user', 'username', 'seed', 'score', 'wins', 'losses', 'byes', 'eliminated', 'joined_at']
+        read_only_fields = fields
+
+
+class TournamentRoundSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TournamentRound
+        fields = ['number', 'matches_total', 'matches_done', 'started_at', 'completed_at']
+        read_only_fields = fields
+
+
+class TournamentMatchSerializer(serializers.ModelSerializer):
+    player_a_name = serializers.CharField(source='player_a.username', read_only=True)
+    player_b_name = serializers.CharField(source='player_b.username', read_only=True, allow_null=True)
+    room = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = TournamentMatch
+        fields = [
+            'id', 'round', 'table', 'player_a', 'player_a_name', 'player_b', 'player_b_name',
+            'winner', 'status', 'room', 'reported_at'
+        ]
+        read_only_fields = fields
+    
+    def get_room(self, obj):
+        return tournaments.room_name(obj) if obj.player_b_id else None
+
+
+class TournamentResultSerializer(serializers.Serializer):
+    match = serializers.IntegerField()
+    winner = serializers.IntegerField()
+
+
 class AnswerSubmissionSerializer(serializers.Serializer):
     answer = serializers.CharField(required=False, allow_blank=True)
     code = serializers.CharField(required=False, allow_blank=True)
     language = serializers.CharField(required=False, allow_blank=True)
     time_taken = serializers.IntegerField(required=False, default=0)
+    round = serializers.CharField(required=False, allow_blank=True, help_text='X-Quiz-Round token from the draw')
 
 
 # Admin Serializers with full field access
@@ -141,10 +236,15 @@ class AdminQuestionSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'category', 'category_name', 'question_type',
             'difficulty', 'language', 'question_text', 'options',
-            'correct_option', 'correct_answer', 'solution_code',
+            'correct_option', 'correct_answer', 'answer_aliases', 'solution_code',
             'explanation', 'points', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
+    
+    def validate_answer_aliases(self, value):
+        if not isinstance(value, list) or not all(isinstance(alias, str) for alias in value):
+            raise serializers.ValidationError('Must be a list of strings')
+        return value
 
 
 class AdminUserSerializer(serializers.ModelSerializer):
@@ -173,5 +273,7 @@ class AdminCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['slug', 'created_at']
     
     def get_question_count(self, obj):
-        return obj.questions.count()
+        # Use the queryset annotation when present to avoid a COUNT per row
+        count = getattr(obj, 'question_count', None)
+        return count if count is not None else obj.questions.count()
 
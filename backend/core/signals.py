@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import answers, badges, dedup, inbox, search, tournaments
+from .models import Category, Question, UserProfile, Score, Challenge, Tournament, TournamentEntry
+from .snapshots import schedule_rebuild
+from .sqlite import apply_pragmas
+from .versioning import bump_version, CATALOG, LEADERBOARD
+
+
+# Bumps run on commit: bumping earlier would let a concurrent reader cache the
+# old data under the new ETag.
+
+# Catalog: category list (including question counts) and question sets
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_catalog(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(CATALOG))
+    transaction.on_commit(schedule_rebuild)
+
+
+# Leaderboard: points, period scores, usernames, avatars and badges
+@receiver(post_save, sender=Score)
+@receiver(post_delete, sender=Score)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_leaderboard(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(LEADERBOARD))
+
+
+# Full-text search index, written in the question's own transaction
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, using, **kwargs):
+    search.index_questions([instance], using=using)
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question(sender, instance, using, **kwargs):
+    search.remove_questions([instance.id], using=using)
+
+
+# Near-duplicate signatures; bucket rows go with the question on delete (CASCADE)
+@receiver(post_save, sender=Question)
+def sign_question(sender, instance, using, **kwargs):
+    dedup.index_questions([instance], using=using)
+
+
+# QUICK answer matchers: compile the saved answers now rather than on the first grade
+@receiver(post_save, sender=Question)
+def compile_answer_matcher(sender, instance, **kwargs):
+    if instance.question_type == 'QUICK':
+        answers.matcher_for(instance)
+
+
+# Challenge inbox: denormalized entries are written in the challenge's own
+# transaction; renames are copied into the entries that show the old name.
+@receiver(post_save, sender=Challenge)
+def sync_challenge_inbox(sender, instance, **kwargs):
+    inbox.sync_challenge(instance)
+
+
+@receiver(post_save, sender=User)
+def rename_inbox_user(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save last_login only; don't touch the inbox for those
+    if created or (update_fields is not None and 'username' not in update_fields):
+        return
+    inbox.rename_user(instance)
+
+
+@receiver(post_save, sender=Category)
+def rename_inbox_category(sender, instance, created, **kwargs):
+    if not created:
+        inbox.rename_category(instance)
+
+
+# Badges: a job queued in the same transaction evaluates the score and
+# challenge streams on a job worker
+@receiver(post_save, sender=Score)
+def evaluate_badges_on_score(sender, created, **kwargs):
+    if created:
+        badges.schedule_evaluation()
+
+
+@receiver(post_save, sender=Challenge)
+def evaluate_badges_on_win(sender, instance, **kwargs):
+    if instance.status == 'COMPLETED' and instance.winner_id:
+        badges.schedule_evaluation()
+
+
+# Tournaments start on a job queued for starts_at; moving starts_at queues another
+@receiver(post_save, sender=Tournament)
+def schedule_tournament_start(sender, instance, **kwargs):
+    tournaments.schedule_start(instance)
+
+
+# Every removed entry (leave, a deleted user) frees its place; join() counts them in
+@receiver(post_delete, sender=TournamentEntry)
+def uncount_tournament_entry(sender, instance, **kwargs):
+    Tournament.objects.filter(pk=instance.tournament_id, entrant_count__gt=0).update(
+        entrant_count=F('entrant_count') - 1)
+
+
+# Single-node SQLite tuning
+connection_created.connect(apply_pragmas, dispatch_uid='core.sqlite.apply_pragmas')
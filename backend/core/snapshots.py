@@ -0,0 +1,196 @@
+"""
+Prebuilt catalog snapshots.
+
+The public question sets served by CategoryViewSet.questions only change when
+admins edit the catalog, so they are compiled ahead of time into gzipped JSON
+blobs on disk, one per category and filter combination:
+
+    <CATALOG_SNAPSHOT_DIR>/<build_id>/<slug>/<difficulty>-<type>.json.gz
+    <CATALOG_SNAPSHOT_DIR>/manifest.json
+
+A build writes into a fresh directory and then atomically replaces the
+manifest, so readers always see a complete build. The manifest records the
+catalog version counter the build was made from; a snapshot whose version no
+longer matches is considered stale and the view falls back to the ORM while a
+debounced rebuild runs in the background.
+
+Snapshots are served with FileResponse, so nothing is serialized or
+compressed per request. Under the ASGI workers (uvicorn) the file is still
+read and streamed through Python in chunks; only a WSGI server with a
+file_wrapper (plain gunicorn sync workers) can sendfile it.
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse
+from rest_framework.renderers import JSONRenderer
+
+from .models import Category, Question
+from .versioning import get_version, CATALOG
+
+logger = logging.getLogger(__name__)
+
+ALL = 'all'
+DIFFICULTIES = [ALL] + [code for code, _ in Question.DIFFICULTY_LEVELS]
+QUESTION_TYPES = [ALL] + [code for code, _ in Question.QUESTION_TYPES]
+
+# Older builds are kept briefly so in-flight responses can finish streaming
+KEEP_BUILDS = 3
+
+_rebuild_lock = threading.Lock()
+_rebuild_timer = None
+_manifest_cache = {'mtime': None, 'data': None}
+
+
+def snapshot_root():
+    return Path(settings.CATALOG_SNAPSHOT_DIR)
+
+
+def snapshot_filename(difficulty, question_type):
+    return f'{difficulty.lower()}-{question_type.lower()}.json.gz'
+
+
+def build_snapshots():
+    """Compile every category/filter combination and publish the build"""
+    # Read the version before querying so a concurrent edit marks this build stale
+    catalog_version, _ = get_version(CATALOG)
+
+    # Imported here to avoid a circular import with serializers -> models
+    from .serializers import QuestionDetailSerializer
+
+    by_category = defaultdict(list)
+    questions = Question.objects.select_related('category').order_by('-created_at')
+    for row in QuestionDetailSerializer(questions, many=True).data:
+        by_category[row['category']].append(row)
+
+    root = snapshot_root()
+    build_id = f'{int(time.time())}-{uuid.uuid4().hex[:8]}'
+    tmp_dir = root / f'.{build_id}.tmp'
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    renderer = JSONRenderer()
+    files = 0
+    for category in Category.objects.all():
+        rows = by_category.get(category.id, [])
+        category_dir = tmp_dir / category.slug
+        category_dir.mkdir()
+        for difficulty in DIFFICULTIES:
+            for question_type in QUESTION_TYPES:
+                selected = [
+                    row for row in rows
+                    if difficulty in (ALL, row['difficulty'])
+                    and question_type in (ALL, row['question_type'])
+                ]
+                payload = gzip.compress(renderer.render(selected), mtime=0)
+                (category_dir / snapshot_filename(difficulty, question_type)).write_bytes(payload)
+                files += 1
+
+    os.replace(tmp_dir, root / build_id)
+    _write_manifest(root, {'build': build_id, 'catalog_version': catalog_version})
+    _prune_builds(root, build_id)
+    logger.info('Built catalog snapshot %s (%d files)', build_id, files)
+    return build_id, files
+
+
+def _write_manifest(root, data):
+    tmp_path = root / f'.manifest-{uuid.uuid4().hex[:8]}.tmp'
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, root / 'manifest.json')
+
+
+def _prune_builds(root, current):
+    builds = sorted(
+        (p for p in root.iterdir() if p.is_dir() and not p.name.startswith('.')),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for old in builds[KEEP_BUILDS:]:
+        if old.name != current:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def _read_manifest():
+    path = snapshot_root() / 'manifest.json'
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _manifest_cache['mtime'] != mtime:
+        try:
+            _manifest_cache['data'] = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+        _manifest_cache['mtime'] = mtime
+    return _manifest_cache['data']
+
+
+def schedule_rebuild(debounce=True):
+    """
+    Schedule a background rebuild. Catalog edits debounce (restart the delay)
+    so a bulk import triggers a single build; the read path only makes sure a
+    rebuild is pending, so steady traffic cannot postpone it forever.
+    """
+    global _rebuild_timer
+    if not settings.CATALOG_SNAPSHOTS_ENABLED:
+        return
+    with _rebuild_lock:
+        if _rebuild_timer is not None:
+            if not debounce:
+                return
+            _rebuild_timer.cancel()
+        _rebuild_timer = threading.Timer(settings.CATALOG_SNAPSHOT_REBUILD_DELAY, _rebuild)
+        _rebuild_timer.daemon = True
+        _rebuild_timer.start()
+
+
+def _rebuild():
+    global _rebuild_timer
+    from django.db import connection
+    with _rebuild_lock:
+        _rebuild_timer = None
+    try:
+        build_snapshots()
+    except Exception:
+        logger.exception('Catalog snapshot rebuild failed')
+    finally:
+        connection.close()
+
+
+def snapshot_response(slug, difficulty=None, question_type=None):
+    """
+    Return a streamed file response for a prebuilt question set, or None if
+    no fresh snapshot covers the request (the caller then uses the ORM).
+    The caller checks that the client accepts gzip (versioning.accepts_gzip).
+    """
+    if not settings.CATALOG_SNAPSHOTS_ENABLED:
+        return None
+    difficulty = difficulty.upper() if difficulty else ALL
+    question_type = question_type.upper() if question_type else ALL
+    if difficulty not in DIFFICULTIES or question_type not in QUESTION_TYPES:
+        return None
+
+    manifest = _read_manifest()
+    if manifest is None or manifest['catalog_version'] != get_version(CATALOG)[0]:
+        schedule_rebuild(debounce=False)
+        return None
+
+    path = snapshot_root() / manifest['build'] / slug / snapshot_filename(difficulty, question_type)
+    try:
+        blob = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+    response = FileResponse(blob, content_type='application/json')
+    response.headers.pop('Content-Disposition', None)
+    response['Content-Encoding'] = 'gzip'
+    response['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,169 @@
+"""
+Read-only spectators for battle rooms: ws/battle/<room>/watch/.
+
+Players join the room's channel-layer group, so each group_send is
+delivered once per player. Spectators don't join it. Instead, each process
+subscribes to a watched room once, through a RoomHub, and fans the frames
+out locally. A match with hundreds of viewers still adds only one group
+member per process to the players' broadcasts. No player frame ever waits
+on a spectator's socket.
+
+Frames reach the hub already encoded: RoomBatcher encodes each tick's
+batch once per wire format. The hub forwards those same bytes, so nothing
+is serialized per spectator.
+
+Each spectator has a mailbox and its own sender task:
+
+- Frames that arrive while a send is in flight are conflated. When the
+  sender gets to them, they go out as one frame, joined at the byte level
+  (battle_protocol.merge_frames).
+- A spectator that falls more than BATTLE_SPECTATOR_MAX_BACKLOG bytes
+  behind has its backlog dropped and replaced with {"type": "lagged"}.
+  A stalled viewer therefore costs bounded memory, and the client learns
+  that it missed events.
+
+Spectators see events from the moment they join. At most
+BATTLE_SPECTATOR_LIMIT spectators may watch one room per process. Beyond
+that, connections are refused with close code 4429. If a hub's
+subscription fails, its spectators are closed with 1011 and the next
+connection starts a fresh hub. Dropped and conflated frames are counted on
+/api/metrics/.
+"""
+import asyncio
+import logging
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import battle_protocol
+from .metrics import SPECTATOR_FRAMES_CONFLATED, SPECTATOR_FRAMES_DROPPED
+
+logger = logging.getLogger(__name__)
+
+LAGGED = battle_protocol.encode_frames([{'type': 'lagged'}])
+
+_hubs = {}
+
+
+class Spectator:
+    """One viewer's mailbox and sender task"""
+
+    def __init__(self, consumer, protocol):
+        self.consumer = consumer
+        self.protocol = protocol
+        self.format = battle_protocol.wire_format(protocol)
+        self.pending = []
+        self.pending_bytes = 0
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._send_loop())
+
+    def offer(self, frames):
+        frame = frames[self.format]
+        if self.pending_bytes + len(frame) > settings.BATTLE_SPECTATOR_MAX_BACKLOG:
+            dropped = sum(1 for queued in self.pending if queued is not LAGGED[self.format])
+            SPECTATOR_FRAMES_DROPPED.inc((), dropped)
+            self.pending = [LAGGED[self.format]]
+            self.pending_bytes = len(self.pending[0])
+        self.pending.append(frame)
+        self.pending_bytes += len(frame)
+        self._wakeup.set()
+
+    async def _send_loop(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            frames, self.pending, self.pending_bytes = self.pending, [], 0
+            if not frames:
+                continue
+            if len(frames) > 1:
+                SPECTATOR_FRAMES_CONFLATED.inc((), len(frames) - 1)
+            merged = battle_protocol.merge_frames(frames, self.format)
+            try:
+                await self.consumer.send(**battle_protocol.send_kwargs({self.format: merged}, self.protocol))
+            except Exception:
+                # The socket went away; disconnect() unsubscribes
+                logger.debug('spectator send failed', exc_info=True)
+                return
+
+    def close(self):
+        self._task.cancel()
+
+
+class RoomHub:
+    """This process's subscription to one room, shared by all its spectators"""
+
+    def __init__(self, room):
+        self.room = room
+        self.spectators = {}
+        self._task = None
+
+    @property
+    def full(self):
+        return len(self.spectators) >= settings.BATTLE_SPECTATOR_LIMIT
+
+    def subscribe(self, consumer, protocol):
+        self.spectators[consumer] = Spectator(consumer, protocol)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unsubscribe(self, consumer):
+        spectator = self.spectators.pop(consumer, None)
+        if spectator is not None:
+            spectator.close()
+        if not self.spectators:
+            # The next spectator starts a fresh hub
+            if _hubs.get(self.room) is self:
+                del _hubs[self.room]
+            if self._task is not None:
+                self._task.cancel()
+                self._task = None
+
+    def publish(self, frames):
+        for spectator in list(self.spectators.values()):
+            spectator.offer(frames)
+
+    def _detach(self):
+        if self._task is asyncio.current_task():
+            self._task = None
+        if _hubs.get(self.room) is self:
+            del _hubs[self.room]
+
+    async def _run(self):
+        channel_layer = get_channel_layer()
+        group = battle_protocol.group_name(self.room)
+        channel = None
+        try:
+            channel = await channel_layer.new_channel('spectate.')
+            await channel_layer.group_add(group, channel)
+            while True:
+                message = await channel_layer.receive(channel)
+                if message.get('type') == 'battle.frame':
+                    self.publish(message)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            logger.exception('spectator hub for room %s stopped', self.room)
+            # Detached first, so the viewers reconnect to a fresh hub
+            self._detach()
+            for consumer in list(self.spectators):
+                await consumer.close(code=1011)
+        finally:
+            self._detach()
+            if channel is not None:
+                await channel_layer.group_discard(group, channel)
+
+
+def is_full(room):
+    hub = _hubs.get(room)
+    return hub is not None and hub.full
+
+
+def subscribe(room, consumer, protocol):
+    """Add a spectator to the room's hub, starting one if needed; None when the room is full"""
+    hub = _hubs.get(room)
+    if hub is None:
+        hub = _hubs[room] = RoomHub(room)
+    elif hub.full:
+        return None
+    hub.subscribe(consumer, protocol)
+    return hub
@@ -0,0 +1,153 @@
+"""
+Single-node SQLite mode.
+
+SQLite allows one writer at a time; with several request threads writing
+scores concurrently the losers wait on the file lock and eventually fail with
+"database is locked". In single-node mode:
+
+* every connection is switched to WAL journaling and tuned pragmas, so
+  readers never block behind the writer (see apply_pragmas);
+* score/profile writes are funnelled through one writer thread per process
+  (SingleWriterQueue) which groups whatever is pending into one transaction,
+  paying for a single commit per batch instead of one per submit.
+
+Other processes (gunicorn workers) still contend for the lock, which
+busy_timeout absorbs.
+
+A write still queued after SQLITE_WRITE_TIMEOUT is withdrawn and the request
+gets WriteQueueBusy (503 with Retry-After). Once the writer has already
+started may still commit, so its caller waits for the outcome instead of
+reporting a failure that a client retry would turn into a duplicate.
+"""
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .db_router import note_write
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The server is busy, try again shortly.'
+    default_code = 'write_queue_busy'
+    # DRF's exception handler turns this into a Retry-After header
+    wait = 1
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """connection_created handler applying SQLITE_PRAGMAS to new connections"""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_TUNED:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+
+
+class SingleWriterQueue:
+    """Runs write callables on one dedicated thread, batched per transaction"""
+
+    def __init__(self, max_batch=100):
+        self.max_batch = max_batch
+        self._jobs = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork (threads don't survive fork)
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._jobs = queue.SimpleQueue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._loop, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        self._ensure_started()
+        future = Future()
+        self._jobs.put((future, fn, args, kwargs))
+        return future
+
+    def qsize(self):
+        return self._jobs.qsize()
+
+    def _loop(self):
+        while True:
+            batch = [self._jobs.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._execute(batch)
+
+    def _execute(self, batch):
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for future, fn, args, kwargs in batch:
+                    if not future.set_running_or_notify_cancel():
+                        outcomes.append(None)
+                        continue
+                    # A savepoint per job keeps one failure from sinking the batch
+                    try:
+                        with transaction.atomic():
+                            outcomes.append((True, fn(*args, **kwargs)))
+                    except Exception as exc:
+                        outcomes.append((False, exc))
+        except Exception as exc:
+            logger.exception('SQLite writer batch of %d failed', len(batch))
+            connection.close()
+            for future, *_ in batch:
+                if future.running():
+                    future.set_exception(exc)
+            return
+
+        # Results are only released once the batch is durable
+        for (future, *_), outcome in zip(batch, outcomes):
+            if outcome is None:
+                continue
+            ok, value = outcome
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+
+writer_queue = SingleWriterQueue()
+
+
+def single_writer_enabled():
+    return settings.SQLITE_SINGLE_WRITER and connection.vendor == 'sqlite'
+
+
+def run_write(fn, *args, **kwargs):
+    """
+    Run a write callable through the single writer when enabled, otherwise
+    inline in its own transaction. Returns the callable's result.
+    """
+    if not single_writer_enabled() or connection.in_atomic_block:
+        with transaction.atomic():
+            return fn(*args, **kwargs)
+    # The write happens on another thread; count it against this request so
+    # replica routing still pins the user to the primary.
+    note_write()
+    future = writer_queue.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=settings.SQLITE_WRITE_TIMEOUT)
+    except FutureTimeout:
+        # Withdrawn before it started, the write will never land
+        if future.cancel():
+            raise WriteQueueBusy()
+        return future.result()
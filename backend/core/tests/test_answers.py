@@ -0,0 +1,53 @@
+from django.test import SimpleTestCase, override_settings
+
+from core.answers import AnswerMatcher, max_edits, within_distance
+
+
+@override_settings(QUICK_ANSWER_FUZZY_MIN_LENGTH=5)
+class AnswerMatcherTests(SimpleTestCase):
+    def test_normalized_forms_match_exactly(self):
+        matcher = AnswerMatcher(['True'])
+        for answer in ['true', ' TRUE ', 'True.', '"true"', 't', 'Yes']:
+            self.assertTrue(matcher.matches(answer), answer)
+        self.assertFalse(matcher.matches(''))
+        self.assertFalse(matcher.matches('false'))
+
+    def test_typos_within_budget(self):
+        matcher = AnswerMatcher(['Photosynthesis'])
+        self.assertTrue(matcher.matches('photosynthsis'))
+        self.assertTrue(matcher.matches('fotosynthesis'))
+        self.assertFalse(matcher.matches('fotosynthsiss'))
+
+    def test_short_forms_are_exact(self):
+        matcher = AnswerMatcher(['Java'])
+        self.assertFalse(matcher.matches('lava'))
+
+    def test_digits_and_operators_are_exact(self):
+        cases = [
+            ('O(n^2)', 'O(n^3)'),
+            ('O(n^2)', 'O(n*2)'),
+            ('python3', 'python2'),
+            ('port 8080', 'port 8081'),
+            ('HTTP/2.0', 'HTTP/2.1'),
+            ('1024', '1025'),
+            ('a+b', 'a-b'),
+        ]
+        for accepted, answer in cases:
+            self.assertEqual(max_edits(accepted.lower()), 0, accepted)
+            self.assertFalse(AnswerMatcher([accepted]).matches(answer), (accepted, answer))
+            self.assertTrue(AnswerMatcher([accepted]).matches(accepted.upper()), accepted)
+
+    def test_answer_with_a_digit_needs_an_exact_match(self):
+        matcher = AnswerMatcher(['python'])
+        self.assertTrue(matcher.matches('pythn'))
+        self.assertFalse(matcher.matches('python3'))
+        self.assertFalse(matcher.matches('pyth0n'))
+
+
+class WithinDistanceTests(SimpleTestCase):
+    def test_bounds(self):
+        self.assertTrue(within_distance('kitten', 'kitten', 0))
+        self.assertTrue(within_distance('kitten', 'sitting', 3))
+        self.assertFalse(within_distance('kitten', 'sitting', 2))
+        self.assertFalse(within_distance('abc', 'abcdef', 2))
+        self.assertTrue(within_distance('', 'ab', 2))
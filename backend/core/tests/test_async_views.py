@@ -0,0 +1,63 @@
+import asyncio
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase, override_settings
+
+from core import async_views, versioning
+from core.models import Category, Question
+
+
+@override_settings(CATALOG_SNAPSHOTS_ENABLED=False)
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Networks')
+        for i in range(3):
+            Question.objects.create(
+                title=f'Question {i}', category=self.category, question_text=f'Which layer? ({i})',
+                options=['Link', 'Network'], correct_option=1)
+        for username in ('ann', 'ben'):
+            User.objects.create(username=username)
+        self.factory = AsyncRequestFactory()
+
+    async def test_matches_the_sync_views(self):
+        for path, view, kwargs in [
+            ('/api/leaderboard/', async_views.leaderboard, {}),
+            ('/api/categories/networks/questions/', async_views.category_questions, {'slug': 'networks'}),
+        ]:
+            expected = await self.async_client.get(path, headers={'Accept': 'application/json'})
+            response = await view(self.factory.get(path, headers={'Accept': 'application/json'}), **kwargs)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.content, expected.content, path)
+            self.assertEqual(response['ETag'], expected['ETag'], path)
+
+    async def test_revalidation(self):
+        first = await async_views.leaderboard(self.factory.get('/api/leaderboard/'))
+        request = self.factory.get('/api/leaderboard/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual((await async_views.leaderboard(request)).status_code, 304)
+        versioning.bump_version(versioning.LEADERBOARD)
+        request = self.factory.get('/api/leaderboard/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual((await async_views.leaderboard(request)).status_code, 200)
+
+    async def test_version_counters_are_read_off_the_loop(self):
+        get_version = versioning.get_version
+
+        def checked(name):
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return get_version(name)
+
+        with mock.patch.object(versioning, 'get_version', checked):
+            response = await async_views.leaderboard(self.factory.get('/api/leaderboard/'))
+        self.assertEqual(response.status_code, 200)
+
+    async def test_authentication_and_other_methods(self):
+        response = await async_views.user_profile(self.factory.get('/api/user/profile/'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        # Other methods go to the DRF view
+        expected = await self.async_client.post('/api/leaderboard/')
+        response = await async_views.leaderboard(self.factory.post('/api/leaderboard/'))
+        self.assertEqual(response.status_code, expected.status_code)
@@ -0,0 +1,72 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from core import dedup, jobs
+from core.models import Category, Job, Question
+
+TEXT = 'Which protocol resolves an IPv4 address to a MAC address on a local network?'
+OPTIONS = ['ARP', 'DNS', 'DHCP', 'ICMP']
+
+
+class SignatureTests(SimpleTestCase):
+    def test_similar_texts_agree_on_most_positions(self):
+        sig = dedup.signature(dedup.content(TEXT, OPTIONS))
+        self.assertEqual((sig.dtype, sig.shape), (np.uint32, (dedup.NUM_PERM,)))
+        self.assertTrue((sig == dedup.signature(dedup.content(TEXT.upper() + '!!', OPTIONS))).all())
+        near = dedup.signature(dedup.content(TEXT.replace('local', 'home'), OPTIONS))
+        other = dedup.signature('What does a Python list comprehension return?')
+        self.assertGreater(dedup.similarity(sig, near), 0.7)
+        self.assertLess(dedup.similarity(sig, other), 0.2)
+
+    def test_near_duplicates_share_a_band(self):
+        sig = dedup.signature(dedup.content(TEXT, OPTIONS))
+        near = dedup.signature(dedup.content(TEXT.replace('local', 'home'), OPTIONS))
+        other = dedup.signature('What does a Python list comprehension return?')
+        self.assertEqual(len(dedup.bands(sig)), dedup.BANDS)
+        self.assertTrue(set(enumerate(dedup.bands(sig))) & set(enumerate(dedup.bands(near))))
+        self.assertFalse(set(enumerate(dedup.bands(sig))) & set(enumerate(dedup.bands(other))))
+
+
+class DedupIndexTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Networks')
+        self.admin = User.objects.create(username='admin', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def question(self, text, **fields):
+        return Question.objects.create(title=text[:40], question_text=text, category=self.category, **fields)
+
+    def test_find_similar_after_save(self):
+        original = self.question(TEXT, options=OPTIONS)
+        self.question('What does a Python list comprehension return?')
+        matches = dedup.find_similar(TEXT.replace('local', 'home'), OPTIONS, threshold=0.5)
+        self.assertEqual([question_id for question_id, _ in matches], [original.id])
+        self.assertEqual(dedup.find_similar(TEXT, OPTIONS, exclude=original.id), [])
+
+    def test_report_is_read_only(self):
+        Question.objects.bulk_create([
+            Question(title='a', question_text=TEXT, options=OPTIONS, category=self.category),
+            Question(title='b', question_text=TEXT + ' (v2)', options=OPTIONS, category=self.category),
+        ])
+        response = self.client.get('/api/admin/questions/duplicates/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['unsigned'], response.data['clusters']), (2, []))
+        self.assertEqual(dedup.unsigned_count(), 2)
+
+        response = self.client.post('/api/admin/questions/duplicates/index/')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.data['queued'])
+        # A second request while the first is waiting queues nothing
+        self.assertFalse(self.client.post('/api/admin/questions/duplicates/index/').data['queued'])
+
+        dedup.index_job(list(Job.objects.filter(name=dedup.INDEX)))
+        response = self.client.get('/api/admin/questions/duplicates/')
+        self.assertEqual(response.data['unsigned'], 0)
+        self.assertEqual([[question['title'] for question in group] for group in response.data['clusters']],
+                         [['a', 'b']])
+
+    def test_index_task_is_registered(self):
+        self.assertIn(dedup.INDEX, jobs.TASKS)
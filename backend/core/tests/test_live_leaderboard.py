@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from core import live_leaderboard
+from core.models import Category, Question, Score, UserProfile
+from core.views import leaderboard_queryset
+
+
+class LoadRanksTests(TestCase):
+    def setUp(self):
+        # Ties on purpose: the board breaks them by profile id
+        points = [50, 80, 80, 10, 0, 80, 30]
+        self.users = [User.objects.create(username=f'ranked{i}') for i in range(len(points))]
+        for user, total in zip(self.users, points):
+            UserProfile.objects.filter(user=user).update(total_points=total)
+        self.admin = User.objects.create(username='ranked_admin', is_staff=True)
+
+    def expected(self, period):
+        return {
+            user_id: (rank, points)
+            for rank, (user_id, points) in enumerate(
+                leaderboard_queryset(period, limit=None).values_list('user_id', 'period_points'), 1)
+        }
+
+    def test_overall_ranks_match_the_board(self):
+        expected = self.expected('overall')
+        user_ids = [user.id for user in self.users]
+        self.assertEqual(live_leaderboard.load_ranks('overall', user_ids), expected)
+        self.assertEqual(expected[self.users[1].id], (1, 80))
+        self.assertEqual(expected[self.users[4].id], (7, 0))
+
+    def test_batches_and_subsets(self):
+        user_ids = [self.users[4].id, self.users[0].id, self.users[5].id]
+        expected = self.expected('overall')
+        with mock.patch.object(live_leaderboard, 'RANK_BATCH', 2):
+            ranks = live_leaderboard.load_ranks('overall', user_ids)
+        self.assertEqual(ranks, {user_id: expected[user_id] for user_id in user_ids})
+
+    def test_period_ranks_from_scores(self):
+        category = Category.objects.create(name='Ranks')
+        question = Question.objects.create(title='Q', category=category, question_text='Q?')
+        for user, points in [(self.users[3], 40), (self.users[6], 40), (self.users[0], 5)]:
+            Score.objects.create(user=user, question=question, points_awarded=points, is_correct=True)
+        expected = self.expected('weekly')
+        ranks = live_leaderboard.load_ranks('weekly', [user.id for user in self.users])
+        self.assertEqual(ranks, expected)
+        self.assertEqual(ranks[self.users[3].id], (1, 40))
+        self.assertEqual(ranks[self.users[6].id], (2, 40))
+        self.assertEqual(ranks[self.users[0].id], (3, 5))
+
+    def test_users_off_the_board_have_no_rank(self):
+        self.assertEqual(live_leaderboard.load_ranks('overall', [self.admin.id, 0]), {})
+        self.assertEqual(live_leaderboard.load_ranks('overall', []), {})
+
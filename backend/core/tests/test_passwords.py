@@ -0,0 +1,47 @@
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from core import passwords
+
+
+class HashPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = passwords.HashPool(workers=1, queue_size=1)
+        self.addCleanup(lambda: self.pool._executor and self.pool._executor.shutdown())
+        self.gate = threading.Event()
+        self.addCleanup(self.gate.set)
+
+    def blocked(self, value='done'):
+        return self.pool.submit('test', lambda: self.gate.wait(5) and value)
+
+    def test_rejects_past_workers_plus_queue(self):
+        running, queued = self.blocked(), self.blocked()
+        with self.assertRaises(passwords.HashPoolBusy):
+            self.blocked()
+        self.assertEqual(self.pool.pending, 2)
+
+        self.gate.set()
+        self.assertEqual((running.result(5), queued.result(5)), ('done', 'done'))
+        self.assertEqual(self.pool.pending, 0)
+        self.assertEqual(self.blocked().result(5), 'done')
+
+    def test_cancelled_hash_frees_its_slot(self):
+        running, queued = self.blocked(), self.blocked()
+        self.assertTrue(queued.cancel())
+        self.assertEqual(self.pool.pending, 1)
+        replacement = self.blocked()
+        self.gate.set()
+        self.assertEqual(replacement.result(5), 'done')
+        running.result(5)
+        self.assertEqual(self.pool.pending, 0)
+
+    @override_settings(PASSWORD_HASH_TIMEOUT=0.05)
+    def test_timeout_drops_a_queued_hash(self):
+        running, queued = self.blocked(), self.blocked()
+        with self.assertRaises(passwords.HashPoolBusy):
+            passwords._result(queued)
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(self.pool.pending, 1)
+        self.gate.set()
+        running.result(5)
@@ -0,0 +1,73 @@
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import provisioning
+from core.models import UserProfile
+
+ROSTER = """username,email,password,role
+alice,alice@example.com,s3cret-pass,
+bob,,,admin
+"""
+
+
+class RosterTests(SimpleTestCase):
+    def test_csv_and_jsonl(self):
+        rows = provisioning.parse_roster(ROSTER)
+        self.assertEqual([row['username'] for row in rows], ['alice', 'bob'])
+        rows = provisioning.parse_roster('{"username": "carol"}\n\n{"username": "dave"}\n')
+        self.assertEqual([row['username'] for row in rows], ['carol', 'dave'])
+        with self.assertRaises(provisioning.RosterError):
+            provisioning.parse_roster('name,email\nx,y\n')
+        with self.assertRaises(provisioning.RosterError):
+            provisioning.parse_roster('{"username": "carol"}\n[1]\n')
+
+    def test_validation_errors(self):
+        valid, errors = provisioning.validate([
+            {'username': 'alice'}, {'username': 'alice'}, {'username': 'bad name!'}, {'username': 'x', 'role': 'root'},
+        ])
+        self.assertEqual([row['username'] for row in valid], ['alice'])
+        self.assertEqual([error['row'] for error in errors], [2, 3, 4])
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ProvisionTests(TestCase):
+    def setUp(self):
+        self.hashed = []
+
+    def make_passwords(self, raws):
+        self.hashed.extend(raws)
+        return [hashers.make_password(raw) for raw in raws]
+
+    def provision(self, text=ROSTER):
+        return provisioning.provision(provisioning.parse_roster(text), make_passwords=self.make_passwords)
+
+    def test_creates_users_with_profiles(self):
+        result = self.provision()
+        self.assertEqual([row['username'] for row in result['created']], ['alice', 'bob'])
+        self.assertEqual((result['existing'], result['errors']), ([], []))
+        # Only generated passwords are handed back
+        alice, bob = result['created']
+        self.assertIsNone(alice['password'])
+        self.assertTrue(User.objects.get(username='alice').check_password('s3cret-pass'))
+        self.assertTrue(User.objects.get(username='bob').check_password(bob['password']))
+        self.assertEqual(dict(UserProfile.objects.values_list('user__username', 'role')),
+                         {'alice': 'user', 'bob': 'admin'})
+
+    def test_rerun_creates_nothing(self):
+        self.provision()
+        self.hashed.clear()
+        result = self.provision()
+        self.assertEqual((result['created'], result['existing']), ([], ['alice', 'bob']))
+        self.assertEqual(self.hashed, [])
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_user_registered_meanwhile_is_left_alone(self):
+        carol = User.objects.create_user(username='carol', password='theirs')
+        rows, _ = provisioning.validate([{'username': 'carol', 'role': 'admin'}, {'username': 'dave'}])
+        for row in rows:
+            row['password_hash'] = hashers.make_password('ours')
+        self.assertEqual(provisioning._insert_chunk(rows), ['dave'])
+        carol.refresh_from_db()
+        self.assertTrue(carol.check_password('theirs'))
+        self.assertEqual(carol.profile.role, 'user')
@@ -0,0 +1,57 @@
+from django.test import TestCase
+
+from core import search
+from core.models import Category, Question
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.networks = Category.objects.create(name='Networks')
+        self.python = Category.objects.create(name='Python')
+
+    def question(self, title, text='', category=None, **fields):
+        return Question.objects.create(
+            title=title, question_text=text or title, category=category or self.networks, **fields)
+
+    def test_hit_after_save_and_miss_after_delete(self):
+        question = self.question('Sliding window protocols', 'How does TCP flow control work?')
+        self.assertEqual(search.search_ids('tcp flow'), [question.id])
+        question.title = 'Congestion avoidance'
+        question.question_text = 'What does slow start do?'
+        question.save()
+        self.assertEqual(search.search_ids('tcp'), [])
+        self.assertEqual(search.search_ids('slow start'), [question.id])
+        question_id = question.id
+        question.delete()
+        self.assertEqual(search.search_ids('slow start'), [])
+        self.assertNotIn(question_id, search.search_ids('congestion'))
+
+    def test_last_word_is_a_prefix(self):
+        question = self.question('Subnetting basics', 'Split a network into subnets')
+        self.assertEqual(search.search_ids('su'), [question.id])
+        self.assertEqual(search.search_ids('split netw'), [question.id])
+        self.assertEqual(search.search_ids('netw split'), [])
+
+    def test_title_matches_rank_first_regardless_of_age(self):
+        title_match = self.question('Routing tables')
+        for i in range(5):
+            self.question(f'Question {i}', f'Which field of a packet does routing use? ({i})')
+        self.assertEqual(search.search_ids('routing')[0], title_match.id)
+        self.assertEqual(len(search.search_ids('routing')), 6)
+
+    def test_category_filter_and_paging(self):
+        ids = [self.question(f'Sockets {i}').id for i in range(3)]
+        other = self.question('Sockets in asyncio', category=self.python)
+        self.assertCountEqual(search.search_ids('sockets', category_id=self.networks.id), ids)
+        self.assertEqual(search.search_ids('sockets', category_id=self.python.id), [other.id])
+        first = search.search_ids('sockets', limit=2)
+        second = search.search_ids('sockets', limit=2, offset=2)
+        self.assertCountEqual(first + second, ids + [other.id])
+        self.assertEqual(search.next_offset(0, 2, len(first)), 2)
+        self.assertIsNone(search.next_offset(2, 2, 1))
+
+    def test_input_is_not_fts_syntax(self):
+        self.question('NOT operators', 'Boolean logic')
+        self.assertEqual(search.search_ids('"'), [])
+        self.assertEqual(len(search.search_ids('NOT AND OR')), 1)
+        self.assertEqual(search.search_ids('title:boolean'), [])
@@ -0,0 +1,95 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core import timers
+from core.models import Category, Challenge
+
+
+class TimingWheelTests(SimpleTestCase):
+    def wheel(self):
+        return timers.TimingWheel(tick=1, slots=4, levels=2, now=0)
+
+    def test_fires_at_the_due_tick(self):
+        wheel = self.wheel()
+        wheel.schedule(('a', 1), 3)
+        self.assertEqual(wheel.advance(2), [])
+        self.assertEqual([timer.key for timer in wheel.advance(3)], [('a', 1)])
+        self.assertEqual(len(wheel), 0)
+
+    def test_far_timers_cascade_down(self):
+        wheel = self.wheel()
+        # Level 1 covers ticks 4-15, the overflow list everything later
+        wheel.schedule(('a', 1), 6)
+        wheel.schedule(('a', 2), 21)
+        self.assertEqual(wheel.advance(5), [])
+        self.assertEqual([timer.key for timer in wheel.advance(6)], [('a', 1)])
+        self.assertEqual(wheel.advance(20), [])
+        self.assertEqual([timer.key for timer in wheel.advance(21)], [('a', 2)])
+
+    def test_cancel_and_move(self):
+        wheel = self.wheel()
+        wheel.schedule(('a', 1), 2)
+        wheel.schedule(('a', 2), 2)
+        self.assertTrue(wheel.cancel(('a', 1)))
+        self.assertFalse(wheel.cancel(('a', 1)))
+        wheel.schedule(('a', 2), 9)
+        self.assertEqual(wheel.advance(8), [])
+        self.assertEqual([timer.key for timer in wheel.advance(9)], [('a', 2)])
+
+
+@override_settings(CHALLENGE_ACCEPT_TIMEOUT=60, CHALLENGE_ACTIVE_TIMEOUT=600)
+class ChallengeTimersTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Timers')
+        self.user = User.objects.create(username='challenger')
+        self.wheel = timers.TimingWheel(now=timezone.now().timestamp() - 3600)
+        self.challenges = timers.ChallengeTimers(self.wheel)
+
+    def challenge(self, **fields):
+        return Challenge.objects.create(challenger=self.user, category=self.category, **fields)
+
+    def due(self, kind, challenge):
+        timer = self.wheel.timers[(kind, challenge.id)]
+        return self.wheel.origin + timer.due * self.wheel.tick
+
+    def test_first_scan_arms_open_challenges(self):
+        pending = self.challenge()
+        active = self.challenge(status='ACTIVE', started_at=timezone.now())
+        self.challenge(status='COMPLETED')
+        self.assertEqual(self.challenges.scan(), 2)
+        self.assertEqual(set(self.wheel.timers), {
+            (timers.EXPIRE_PENDING, pending.id), (timers.EXPIRE_ACTIVE, active.id)})
+        self.assertAlmostEqual(
+            self.due(timers.EXPIRE_PENDING, pending), timers.pending_deadline(pending.created_at), delta=0.1)
+        self.assertEqual(self.challenges.scan(), 0)
+
+    def test_rescan_finds_rows_a_cursor_would_miss(self):
+        self.challenge(status='ACTIVE', started_at=timezone.now())
+        self.challenges.scan()
+
+        # Started without started_at, and started earlier but committed late
+        no_start = self.challenge(status='ACTIVE')
+        started_at = timezone.now() - timedelta(minutes=5)
+        late = self.challenge(status='ACTIVE', started_at=started_at)
+        self.assertEqual(self.challenges.scan(), 2)
+        self.assertAlmostEqual(
+            self.due(timers.EXPIRE_ACTIVE, no_start), timers.active_deadline(no_start.created_at), delta=0.1)
+        self.assertAlmostEqual(
+            self.due(timers.EXPIRE_ACTIVE, late), timers.active_deadline(started_at), delta=0.1)
+
+    def test_accepted_challenge_swaps_its_timer(self):
+        challenge = self.challenge()
+        self.challenges.scan()
+        Challenge.objects.filter(id=challenge.id).update(status='ACTIVE', started_at=timezone.now())
+        self.assertEqual(self.challenges.scan(), 1)
+        self.assertEqual(set(self.wheel.timers), {(timers.EXPIRE_ACTIVE, challenge.id)})
+
+    def test_fired_but_still_open_is_rearmed(self):
+        challenge = self.challenge()
+        self.challenges.scan()
+        # As when the expiry handler failed: the timer is gone, the row is not
+        self.wheel.timers.pop((timers.EXPIRE_PENDING, challenge.id))
+        self.assertEqual(self.challenges.scan(), 1)
@@ -0,0 +1,194 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core import tournaments
+from core.models import Category, Job, Tournament, TournamentEntry, TournamentMatch, TournamentRound
+
+
+class BracketTests(SimpleTestCase):
+    def test_bracket_order(self):
+        self.assertEqual(tournaments.bracket_order(1), [1])
+        self.assertEqual(tournaments.bracket_order(2), [1, 2])
+        self.assertEqual(tournaments.bracket_order(8), [1, 8, 4, 5, 2, 7, 3, 6])
+        order = tournaments.bracket_order(64)
+        self.assertEqual(sorted(order), list(range(1, 65)))
+        # 1 and 2 are in opposite halves, so they can only meet in the final
+        self.assertIn(1, order[:32])
+        self.assertIn(2, order[32:])
+
+    def test_bracket_pairs_full(self):
+        seeds = {seed: 100 + seed for seed in range(1, 5)}
+        self.assertEqual(tournaments.bracket_pairs(seeds), [(101, 104), (102, 103)])
+
+    def test_bracket_pairs_byes_go_to_top_seeds(self):
+        seeds = {seed: 100 + seed for seed in range(1, 6)}
+        pairs = tournaments.bracket_pairs(seeds)
+        self.assertEqual(pairs, [(101, None), (104, 105), (102, None), (103, None)])
+        self.assertEqual([a for a, b in pairs if b is None], [101, 102, 103])
+
+
+class TournamentTestCase(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Tournaments')
+        self.users = [User.objects.create(username=f'player{i}') for i in range(1, 7)]
+
+    def tournament(self, players, **fields):
+        tournament = Tournament.objects.create(name='Cup', category=self.category, **fields)
+        for seed, user in enumerate(players, 1):
+            TournamentEntry.objects.create(tournament=tournament, user=user, seed=seed)
+        return tournament
+
+    def entry(self, tournament, user):
+        return TournamentEntry.objects.get(tournament=tournament, user=user)
+
+
+class SwissPairsTests(TournamentTestCase):
+    def test_top_half_meets_bottom_half(self):
+        a, b, c, d = self.users[:4]
+        tournament = self.tournament([a, b, c, d], format='SWISS')
+        self.assertEqual(tournaments.swiss_pairs(tournament), [(a.id, c.id), (b.id, d.id)])
+
+    def test_rematches_are_avoided(self):
+        a, b, c, d = self.users[:4]
+        tournament = self.tournament([a, b, c, d], format='SWISS', status='RUNNING', current_round=1)
+        TournamentMatch.objects.create(
+            tournament=tournament, round=1, table=1, player_a=a, player_b=c, winner=a, status='DONE')
+        self.assertEqual(tournaments.swiss_pairs(tournament), [(a.id, b.id), (c.id, d.id)])
+
+    def test_rematch_when_nobody_else_is_left(self):
+        a, b = self.users[:2]
+        tournament = self.tournament([a, b], format='SWISS', status='RUNNING', current_round=1)
+        TournamentMatch.objects.create(
+            tournament=tournament, round=1, table=1, player_a=a, player_b=b, winner=a, status='DONE')
+        self.assertEqual(tournaments.swiss_pairs(tournament), [(a.id, b.id)])
+
+    def test_bye_goes_to_the_lowest_ranked_without_one(self):
+        players = self.users[:5]
+        tournament = self.tournament(players, format='SWISS')
+        self.assertEqual(tournaments.swiss_pairs(tournament)[-1], (players[4].id, None))
+
+        TournamentEntry.objects.filter(tournament=tournament, user=players[4]).update(byes=1, score=1)
+        pairs = tournaments.swiss_pairs(tournament)
+        self.assertEqual(pairs[-1], (players[3].id, None))
+        self.assertEqual(sorted(user for pair in pairs for user in pair if user), sorted(u.id for u in players))
+
+    def test_bye_repeats_when_everyone_had_one(self):
+        players = self.users[:3]
+        tournament = self.tournament(players, format='SWISS')
+        TournamentEntry.objects.filter(tournament=tournament).update(byes=1)
+        self.assertEqual(tournaments.swiss_pairs(tournament)[-1], (players[2].id, None))
+
+
+class TallyTests(TournamentTestCase):
+    def play_round(self, tournament, pairs, winners):
+        tournaments._create_round(tournament, 1, pairs)
+        matches = TournamentMatch.objects.filter(tournament=tournament, round=1, status='PENDING').order_by('table')
+        results = [(match.id, winner.id) for match, winner in zip(matches, winners)]
+        recorded, errors = tournaments.report_results(tournament, results)
+        self.assertEqual(errors, [])
+        return recorded
+
+    def test_single_elimination_tally(self):
+        a, b, c, d = self.users[:4]
+        tournament = self.tournament([a, b, c, d], status='RUNNING', current_round=1)
+        recorded = self.play_round(tournament, [(a.id, d.id), (b.id, c.id)], [a, c])
+
+        self.assertEqual(tournaments.tally(recorded[:1]), 1)
+        self.assertEqual(TournamentRound.objects.get(tournament=tournament, number=1).matches_done, 1)
+        self.assertFalse(Job.objects.filter(name=tournaments.ADVANCE).exists())
+
+        self.assertEqual(tournaments.tally(recorded), 1)
+        self.assertEqual(tournaments.tally(recorded), 0)
+        self.assertEqual(TournamentRound.objects.get(tournament=tournament, number=1).matches_done, 2)
+        self.assertEqual(Job.objects.filter(name=tournaments.ADVANCE).count(), 1)
+
+        winner, loser = self.entry(tournament, c), self.entry(tournament, b)
+        self.assertEqual((winner.wins, winner.score, winner.losses, winner.eliminated), (1, 1, 0, False))
+        self.assertEqual((loser.wins, loser.score, loser.losses, loser.eliminated), (0, 0, 1, True))
+
+    def test_swiss_losers_stay_in(self):
+        a, b, c = self.users[:3]
+        tournament = self.tournament([a, b, c], format='SWISS', status='RUNNING', current_round=1)
+        recorded = self.play_round(tournament, [(a.id, b.id), (c.id, None)], [b])
+        # The bye counts as a decided match from the start
+        self.assertEqual(TournamentRound.objects.get(tournament=tournament, number=1).matches_done, 1)
+        self.assertEqual(self.entry(tournament, c).score, 1)
+
+        tournaments.tally(recorded)
+        loser = self.entry(tournament, a)
+        self.assertEqual((loser.losses, loser.eliminated), (1, False))
+        self.assertEqual(self.entry(tournament, b).score, 1)
+        self.assertEqual(TournamentRound.objects.get(tournament=tournament, number=1).matches_done, 2)
+        self.assertEqual(Job.objects.filter(name=tournaments.ADVANCE).count(), 1)
+
+
+class StartJobTests(TournamentTestCase):
+    def run_start_job(self, tournament):
+        job = tournaments.jobs.enqueue(tournaments.START, {'tournament': tournament.id})
+        tournaments.start_job([job])
+        tournament.refresh_from_db()
+
+    def test_too_few_entrants_cancels(self):
+        tournament = self.tournament(self.users[:1], starts_at=timezone.now() - timedelta(seconds=1))
+        self.run_start_job(tournament)
+        self.assertEqual(tournament.status, 'CANCELLED')
+
+    def test_other_errors_leave_the_tournament_alone(self):
+        tournament = self.tournament(self.users[:2], starts_at=timezone.now() - timedelta(seconds=1))
+        # As when an admin starts it between the job's check and its own start()
+        already_started = mock.Mock(side_effect=tournaments.TournamentError('Tournament has already started'))
+        with mock.patch.object(tournaments, 'start', already_started):
+            self.run_start_job(tournament)
+        already_started.assert_called_once_with(tournament.id)
+        self.assertEqual(tournament.status, 'REGISTRATION')
+
+    def test_starts_when_due(self):
+        tournament = self.tournament(self.users[:4], starts_at=timezone.now() - timedelta(seconds=1))
+        self.run_start_job(tournament)
+        self.assertEqual(tournament.status, 'RUNNING')
+        self.assertEqual(TournamentMatch.objects.filter(tournament=tournament, round=1).count(), 2)
+
+
+class JoinTests(TournamentTestCase):
+    def join(self, tournament, user):
+        entry, created = tournaments.join(tournament.id, user)
+        tournament.refresh_from_db()
+        return created
+
+    def test_join_counts_each_entrant_once(self):
+        tournament = self.tournament([])
+        self.assertTrue(self.join(tournament, self.users[0]))
+        self.assertFalse(self.join(tournament, self.users[0]))
+        self.assertEqual(tournament.entrant_count, 1)
+
+    def test_full_tournament_turns_joins_away(self):
+        tournament = self.tournament([], max_entrants=2)
+        self.join(tournament, self.users[0])
+        self.join(tournament, self.users[1])
+        with self.assertRaisesMessage(tournaments.TournamentError, 'Tournament is full'):
+            self.join(tournament, self.users[2])
+        self.assertEqual(tournament.entrant_count, 2)
+        self.assertEqual(TournamentEntry.objects.filter(tournament=tournament).count(), 2)
+
+    def test_leaving_frees_the_place(self):
+        tournament = self.tournament([], max_entrants=1)
+        self.join(tournament, self.users[0])
+        tournaments.leave(tournament.id, self.users[0])
+        tournament.refresh_from_db()
+        self.assertEqual(tournament.entrant_count, 0)
+        self.assertTrue(self.join(tournament, self.users[1]))
+
+    def test_no_join_after_the_start(self):
+        tournament = self.tournament([])
+        for user in self.users[:2]:
+            self.join(tournament, user)
+        tournaments.start(tournament.id)
+        with self.assertRaisesMessage(tournaments.TournamentError, 'Registration is closed'):
+            self.join(tournament, self.users[2])
+        with self.assertRaisesMessage(tournaments.TournamentError, 'Tournament has already started'):
+            tournaments.leave(tournament.id, self.users[0])
+        self.assertEqual(TournamentEntry.objects.filter(tournament=tournament, seed__isnull=True).count(), 0)
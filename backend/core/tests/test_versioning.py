@@ -0,0 +1,88 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from core import db_router, versioning
+from core.models import Category
+
+
+class AcceptsGzipTests(SimpleTestCase):
+    def accepts(self, header):
+        return versioning.accepts_gzip(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header))
+
+    def test_q_values(self):
+        self.assertTrue(self.accepts('gzip, deflate, br'))
+        self.assertTrue(self.accepts('br;q=1.0, gzip;q=0.5'))
+        self.assertFalse(self.accepts('gzip;q=0, identity'))
+        self.assertFalse(self.accepts(''))
+
+    def test_wildcard_stands_in_for_gzip(self):
+        self.assertTrue(self.accepts('*'))
+        self.assertFalse(self.accepts('*;q=0'))
+        self.assertFalse(self.accepts('gzip;q=0, *'))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Category.objects.create(name='Networks')
+
+    def revalidate(self, path):
+        first = self.client.get(path)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(path, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    def test_catalog_304_until_a_write(self):
+        first, again = self.revalidate('/api/categories/')
+        self.assertEqual(again.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Python')
+        changed = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(len(changed.json()['results']), 2)
+
+    def test_leaderboard_304_until_a_bump(self):
+        first, again = self.revalidate('/api/leaderboard/')
+        self.assertEqual(again.status_code, 304)
+        versioning.bump_version(versioning.LEADERBOARD)
+        self.assertEqual(self.client.get('/api/leaderboard/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_evicted_counter_gets_a_fresh_etag(self):
+        first = self.client.get('/api/categories/')
+        cache.clear()
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_PIN_SECONDS=10)
+class ReplicaPinningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='reader')
+
+    def age(self, name, seconds):
+        cache.set(versioning._modified_key(name), time.time() - seconds, timeout=None)
+
+    def test_recent_bump_keeps_versioned_reads_on_the_primary(self):
+        versioning.bump_version(versioning.CATALOG)
+        self.assertFalse(versioning.settled(versioning.CATALOG))
+        self.assertFalse(db_router.replica_allowed(self.user, [versioning.CATALOG]))
+        # Views that don't derive an ETag from the counter are not held back
+        self.assertTrue(db_router.replica_allowed(self.user))
+
+        self.age(versioning.CATALOG, 11)
+        self.assertTrue(db_router.replica_allowed(self.user, [versioning.CATALOG]))
+        self.assertFalse(db_router.replica_allowed(self.user, [versioning.CATALOG, versioning.LEADERBOARD]))
+
+    def test_writer_is_pinned(self):
+        self.age(versioning.CATALOG, 11)
+        db_router.pin_to_primary(self.user)
+        self.assertFalse(db_router.replica_allowed(self.user, [versioning.CATALOG]))
+        self.assertTrue(db_router.replica_allowed(User.objects.create(username='other'), [versioning.CATALOG]))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.assertFalse(db_router.replica_allowed(self.user))
@@ -0,0 +1,69 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core import answers, views, warmup
+from core.models import Category, Question
+from core.versioning import LEADERBOARD, bump_version
+
+
+class WarmStepTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        views._boards.clear()
+        self.addCleanup(views._boards.clear)
+
+    def test_answer_keys_are_compiled(self):
+        category = Category.objects.create(name='Quick')
+        for answer in ('Paris', 'Rome'):
+            Question.objects.create(
+                title=answer, category=category, question_type='QUICK', question_text='Capital?', correct_answer=answer)
+        answers._compile.cache_clear()
+        self.assertEqual(warmup.warm_answer_keys(), {'answer_keys': 2})
+        self.assertEqual(answers._compile.cache_info().currsize, 2)
+
+    def test_leaderboard_is_served_until_a_bump(self):
+        for username in ('ann', 'ben'):
+            User.objects.create(username=username)
+        self.assertEqual(warmup.warm_leaderboard(), {'leaderboard_entries': 6})
+        _, entries = views.cached_leaderboard('overall')
+        self.assertEqual(sorted(entry['username'] for entry in entries), ['ann', 'ben'])
+        bump_version(LEADERBOARD)
+        self.assertIsNone(views.cached_leaderboard('overall')[1])
+
+
+class WarmTests(TestCase):
+    def setUp(self):
+        saved = dict(warmup.state)
+        self.addCleanup(lambda: (warmup.state.clear(), warmup.state.update(saved)))
+        warmup.state.update(ready=False, running=False, steps={})
+
+    def test_failing_step_is_skipped(self):
+        def broken():
+            raise RuntimeError('no snapshot dir')
+        steps = (('broken', broken), ('fine', lambda: {'items': 1}))
+        # Closing connections would end the test's transaction
+        with mock.patch.object(warmup, 'STEPS', steps), mock.patch.object(warmup, 'connections'), \
+                mock.patch.object(warmup.gc, 'freeze'), self.assertLogs('core.warmup', 'ERROR'):
+            state = warmup.warm()
+        self.assertTrue(state['ready'])
+        self.assertEqual(state['steps']['broken'], {'error': 'no snapshot dir'})
+        self.assertEqual(state['steps']['fine']['items'], 1)
+
+    def test_ready_after_warm_up(self):
+        with mock.patch.object(warmup.threading, 'Thread') as thread:
+            self.assertEqual(self.client.get('/api/health/ready/').status_code, 503)
+            warmup.state['running'] = True
+            self.assertEqual(self.client.get('/api/health/ready/').status_code, 503)
+        # Started by the first probe only
+        thread.assert_called_once_with(target=warmup.warm, name='warmup', daemon=True)
+
+        warmup.state.update(ready=True, running=False, seconds=0.1)
+        self.assertEqual(self.client.get('/api/health/ready/').status_code, 200)
+        self.assertEqual(self.client.get('/api/health/live/').status_code, 200)
+
+    @override_settings(WARM_START=False)
+    def test_ready_without_warm_start(self):
+        self.assertEqual(self.client.get('/api/health/ready/').json(), {'status': 'ready', 'warm_start': False})
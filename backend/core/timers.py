@@ -0,0 +1,310 @@
+"""
+Hierarchical timing wheel for challenge expiry, match timeouts and battle
+question deadlines.
+
+TimingWheel keeps timers in LEVELS wheels of SLOTS slots. Level 0 slots are
+one tick wide, and each level up is SLOTS times coarser. Scheduling and
+cancelling are O(1). Each tick empties one level-0 slot, and whenever a
+level wraps, the next level's current slot is cascaded down. Millions of
+pending timers cost memory, not CPU. With the defaults (0.1 s tick, 256
+slots, 4 levels) the wheel spans about 13 years. Anything later waits in an
+overflow list.
+
+TimerService drives a wheel from asyncio and hands everything that fired in
+one tick to its kind's handler as a single batch. The DB handlers
+therefore issue one UPDATE per kind per tick, however many timers expired
+together.
+
+Two users:
+
+* the `run_timers` command (one process per deployment) arms challenge
+  acceptance expiry and match timeouts from the database, re-arms open
+  challenges that have no timer on every rescan, and cancels them in
+  batches. Deadlines derive from created_at / started_at, so a restart
+  re-arms the same deadlines;
+* battle consumers arm per-question deadlines on the worker's own service
+  (question_deadlines()), which broadcasts a deadline event to the room.
+"""
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import battle_protocol, inbox
+from .models import Challenge
+
+logger = logging.getLogger(__name__)
+
+SLOTS = 256
+LEVELS = 4
+
+EXPIRE_PENDING = 'expire_pending'
+EXPIRE_ACTIVE = 'expire_active'
+QUESTION_DEADLINE = 'question_deadline'
+
+
+class Timer:
+    __slots__ = ('key', 'due', 'payload', 'cancelled')
+
+    def __init__(self, key, due, payload):
+        self.key = key
+        self.due = due
+        self.payload = payload
+        self.cancelled = False
+
+
+class TimingWheel:
+    """
+    Timers are identified by a key such as ('expire_pending', 42). The
+    first item is the kind. Scheduling an existing key moves the timer.
+    """
+
+    def __init__(self, tick=0.1, slots=SLOTS, levels=LEVELS, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.origin = time.time() if now is None else now
+        self.current = 0
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []
+        self.timers = {}
+
+    def __len__(self):
+        return len(self.timers)
+
+    def schedule(self, key, when, payload=None):
+        """Arm (or move) a timer firing at wall-clock time `when`"""
+        self.cancel(key)
+        due = max(math.ceil((when - self.origin) / self.tick), self.current + 1)
+        timer = Timer(key, due, payload)
+        self.timers[key] = timer
+        self._place(timer)
+        return timer
+
+    def cancel(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            # Left in its slot and skipped when the slot is processed
+            timer.cancelled = True
+        return timer is not None
+
+    def _place(self, timer):
+        delta = timer.due - self.current
+        span = self.slots
+        for level in range(self.levels):
+            if delta < span:
+                width = span // self.slots
+                self.wheels[level][(timer.due // width) % self.slots].append(timer)
+                return
+            span *= self.slots
+        self.overflow.append(timer)
+
+    def advance(self, now=None):
+        """Move the wheel to `now` and return the timers that fired"""
+        now = time.time() if now is None else now
+        target = int((now - self.origin) / self.tick)
+        fired = []
+        while self.current < target:
+            self.current += 1
+            self._cascade()
+            slot = self.wheels[0][self.current % self.slots]
+            if slot:
+                self.wheels[0][self.current % self.slots] = []
+                for timer in slot:
+                    if not timer.cancelled:
+                        del self.timers[timer.key]
+                        fired.append(timer)
+        return fired
+
+    def _cascade(self):
+        width = 1
+        for level in range(1, self.levels):
+            width *= self.slots
+            if self.current % width:
+                return
+            index = (self.current // width) % self.slots
+            slot = self.wheels[level][index]
+            if slot:
+                self.wheels[level][index] = []
+                for timer in slot:
+                    if not timer.cancelled:
+                        self._place(timer)
+        if self.current % (width * self.slots) == 0 and self.overflow:
+            pending, self.overflow = self.overflow, []
+            for timer in pending:
+                if not timer.cancelled:
+                    self._place(timer)
+
+
+class TimerService:
+    """Advances a wheel every tick and dispatches fired timers by kind, in batches"""
+
+    def __init__(self, wheel, handlers):
+        self.wheel = wheel
+        self.handlers = handlers
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            await self.fire(self.wheel.advance())
+
+    async def fire(self, fired):
+        batches = defaultdict(list)
+        for timer in fired:
+            batches[timer.key[0]].append(timer)
+        for kind, timers in batches.items():
+            try:
+                await self.handlers[kind](timers)
+            except Exception:
+                logger.exception('%d %s timers failed', len(timers), kind)
+
+
+# Challenge expiry (run_timers)
+
+def _chunks(items, size=500):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def cancel_challenges(ids, from_status):
+    """One UPDATE per chunk; returns the ids that were actually cancelled"""
+    cancelled = []
+    now = timezone.now()
+    with transaction.atomic():
+        for chunk in _chunks(list(ids)):
+            # Re-checked in the same transaction: a challenge accepted just
+            # before its timer fired is no longer PENDING and is left alone
+            stale = list(Challenge.objects.select_for_update().filter(
+                id__in=chunk, status=from_status).values_list('id', flat=True))
+            if stale:
+                Challenge.objects.filter(id__in=stale).update(status='CANCELLED', completed_at=now)
+                cancelled.extend(stale)
+        # Bypasses post_save, so the inbox is told directly
+        inbox.mark_status(cancelled, 'CANCELLED')
+    return cancelled
+
+
+def pending_deadline(created_at):
+    return (created_at + timedelta(seconds=settings.CHALLENGE_ACCEPT_TIMEOUT)).timestamp()
+
+
+def active_deadline(started_at):
+    return (started_at + timedelta(seconds=settings.CHALLENGE_ACTIVE_TIMEOUT)).timestamp()
+
+
+class ChallengeTimers:
+    """Arms challenge timers from the database and keeps them in step with it"""
+
+    def __init__(self, wheel):
+        self.wheel = wheel
+
+    def scan(self):
+        """
+        Arm timers for open challenges that have none: everything on the first
+        call, then new and newly started ones. No cursor is kept, so a row
+        committed late, or started with a NULL or out-of-order started_at, is
+        still found, and a row whose timer fired but whose cancel failed is
+        re-armed. Returns how many timers were armed.
+        """
+        unarmed = defaultdict(list)
+        open_challenges = Challenge.objects.filter(status__in=['PENDING', 'ACTIVE']).order_by()
+        for status, challenge_id in open_challenges.values_list('status', 'id').iterator(chunk_size=5000):
+            kind = EXPIRE_PENDING if status == 'PENDING' else EXPIRE_ACTIVE
+            if (kind, challenge_id) not in self.wheel.timers:
+                unarmed[status].append(challenge_id)
+
+        armed = 0
+        for chunk in _chunks(unarmed['PENDING']):
+            for challenge_id, created_at in Challenge.objects.filter(
+                    id__in=chunk, status='PENDING').values_list('id', 'created_at'):
+                self.wheel.schedule((EXPIRE_PENDING, challenge_id), pending_deadline(created_at))
+                armed += 1
+        for chunk in _chunks(unarmed['ACTIVE']):
+            for challenge_id, created_at, started_at in Challenge.objects.filter(
+                    id__in=chunk, status='ACTIVE').values_list('id', 'created_at', 'started_at'):
+                self.wheel.cancel((EXPIRE_PENDING, challenge_id))
+                self.wheel.schedule((EXPIRE_ACTIVE, challenge_id), active_deadline(started_at or created_at))
+                armed += 1
+        return armed
+
+    def handlers(self):
+        async def expire(timers, from_status):
+            ids = [timer.key[1] for timer in timers]
+            cancelled = await database_sync_to_async(cancel_challenges)(ids, from_status)
+            if cancelled:
+                logger.info('expired %d %s challenges', len(cancelled), from_status.lower())
+
+        return {
+            EXPIRE_PENDING: lambda timers: expire(timers, 'PENDING'),
+            EXPIRE_ACTIVE: lambda timers: expire(timers, 'ACTIVE'),
+        }
+
+
+# Battle question deadlines (per worker)
+
+# Longest time limit a client may announce, in seconds
+QUESTION_DEADLINE_MAX = 600
+
+_question_service = None
+_room_deadlines = {}  # room -> questions with a pending deadline
+
+
+def _forget_deadline(room, question):
+    pending = _room_deadlines.get(room)
+    if pending is not None:
+        pending.discard(question)
+        if not pending:
+            del _room_deadlines[room]
+
+
+def question_deadlines():
+    """This worker's wheel for question deadlines, started on first use"""
+    global _question_service
+    if _question_service is None:
+        async def broadcast(timers):
+            channel_layer = get_channel_layer()
+            for timer in timers:
+                room, question = timer.payload
+                _forget_deadline(room, question)
+                await battle_protocol.batcher.add(
+                    channel_layer, room, [{'type': 'deadline', 'question': question}])
+
+        wheel = TimingWheel(tick=settings.TIMER_WHEEL_TICK)
+        _question_service = TimerService(wheel, {QUESTION_DEADLINE: broadcast})
+        asyncio.get_running_loop().create_task(_question_service.run())
+    return _question_service.wheel
+
+
+def arm_question_deadline(room, question, seconds):
+    """
+    Arm (or move) a client-announced deadline. Returns False, arming nothing,
+    for a question id that isn't an int or str, a time limit that isn't a
+    positive finite number, or a room already holding
+    BATTLE_ROOM_MAX_DEADLINES pending deadlines.
+    """
+    if isinstance(question, bool) or not isinstance(question, (int, str)):
+        return False
+    if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) \
+            or not math.isfinite(seconds) or seconds <= 0:
+        return False
+    pending = _room_deadlines.setdefault(room, set())
+    if question not in pending and len(pending) >= settings.BATTLE_ROOM_MAX_DEADLINES:
+        return False
+    pending.add(question)
+    question_deadlines().schedule(
+        (QUESTION_DEADLINE, room, question), time.time() + min(seconds, QUESTION_DEADLINE_MAX), (room, question))
+    return True
+
+
+def cancel_question_deadline(room, question):
+    if _question_service is not None:
+        _question_service.wheel.cancel((QUESTION_DEADLINE, room, question))
+    _forget_deadline(room, question)
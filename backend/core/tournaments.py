@@ -0,0 +1,387 @@
+"""
+Tournament bracket engine: single elimination and Swiss.
+
+A tournament takes entries while it is in REGISTRATION. start() seeds
+them, either by total points, by challenge wins or at random. Seed 1 is
+the strongest. It then creates round 1. It runs at starts_at through a
+queued job, or when an admin starts it.
+
+Every match has its own battle room, ws/battle/tournament-<id>-<match>/.
+The matches of a round are therefore played on whichever worker processes
+hold those sockets. Results come back through report_results()
+(POST /api/admin/tournaments/<id>/report/), in batches.
+
+Results are aggregated as they arrive; the round is never rescanned:
+
+- report_results() decides each match with a conditional UPDATE, so a
+  match is decided once. In the same transaction it queues one
+  `tournaments.tally` job per match.
+- Job workers (`manage.py run_jobs`; run several to spread the load) claim
+  tally jobs in batches. A batch folds its results into a few UPDATEs:
+  one per tournament for the winners, one for the losers, and one
+  matches_done increment per round. A player has one match per round, and
+  a round is only created once the previous one is fully tallied, so a
+  batch never holds two results for the same player.
+- The batch that brings matches_done up to matches_total queues a
+  `tournaments.advance` job, keyed per round so it runs once. That job
+  pairs the next round or finishes the tournament.
+
+Single elimination pads the bracket to a power of two. The byes go to the
+top seeds, and seeds are placed so that 1 and 2 can only meet in the
+final. Round r+1 pairs the winners of consecutive tables of round r.
+
+Swiss runs swiss_rounds rounds, by default ceil(log2(entrants)). Players
+are ranked by score, then seed. Within each score group the top half is
+paired against the bottom half, avoiding rematches where a greedy pass
+can. With an odd number of players, the lowest-ranked player who has not
+had a bye gets one, worth a win. Final standings are by score, then seed.
+"""
+import logging
+import math
+import random
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import jobs
+from .models import BadgeState, Tournament, TournamentEntry, TournamentMatch, TournamentRound, UserProfile
+from .sqlite import run_write
+
+logger = logging.getLogger(__name__)
+
+START = 'tournaments.start'
+TALLY = 'tournaments.tally'
+ADVANCE = 'tournaments.advance'
+
+
+class TournamentError(Exception):
+    """The tournament's state doesn't allow the operation"""
+
+
+class NotEnoughEntrants(TournamentError):
+    """Fewer than two entries at start"""
+
+
+def room_name(match):
+    """Battle room (ws/battle/<room>/) the match is played in"""
+    return f'tournament-{match.tournament_id}-{match.id}'
+
+
+def bracket_order(size):
+    """Seeds in bracket slot order for a power-of-two bracket: 1, 8, 4, 5, 2, 7, 3, 6 for 8"""
+    order = [1]
+    while len(order) < size:
+        total = 2 * len(order) + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+
+def seed_entries(tournament):
+    """Number the entries by strength; returns {seed: user_id}"""
+    entries = list(TournamentEntry.objects.filter(tournament=tournament).only('id', 'user_id'))
+    if tournament.seeding == 'RANDOM':
+        random.shuffle(entries)
+    else:
+        if tournament.seeding == 'WINS':
+            strength = BadgeState.objects.filter(user__tournament_entries__tournament=tournament).values_list(
+                'user_id', 'challenge_wins')
+        else:
+            strength = UserProfile.objects.filter(user__tournament_entries__tournament=tournament).values_list(
+                'user_id', 'total_points')
+        strength = dict(strength)
+        # Ties go to the earlier entry
+        entries.sort(key=lambda entry: (-strength.get(entry.user_id, 0), entry.id))
+    for seed, entry in enumerate(entries, 1):
+        entry.seed = seed
+    TournamentEntry.objects.bulk_update(entries, ['seed'], batch_size=1000)
+    return {entry.seed: entry.user_id for entry in entries}
+
+
+def bracket_pairs(seeds):
+    """Round 1 of single elimination: (user, user or None for a bye) in table order"""
+    size = 1 << (len(seeds) - 1).bit_length()
+    order = bracket_order(size)
+    # The first of each slot pair is the better seed, which always exists
+    return [(seeds[order[i]], seeds.get(order[i + 1])) for i in range(0, size, 2)]
+
+
+def swiss_pairs(tournament):
+    """Next Swiss round: (user, user or None for a bye), best-placed tables first"""
+    standings = list(TournamentEntry.objects.filter(tournament=tournament).order_by(
+        '-score', 'seed').values_list('user_id', 'score', 'byes'))
+    played = {
+        (min(a, b), max(a, b))
+        for a, b in TournamentMatch.objects.filter(tournament=tournament, player_b__isnull=False).values_list(
+            'player_a_id', 'player_b_id')
+    }
+    bye = None
+    if len(standings) % 2:
+        index = next((i for i in range(len(standings) - 1, -1, -1) if not standings[i][2]), len(standings) - 1)
+        bye = standings.pop(index)[0]
+
+    # Within each score group the top half meets the bottom half (1 v 5,
+    # 2 v 6, ... in a group of 8); an odd group's last player floats down
+    players, group, floater = [], [], []
+    for position, (user_id, score, _) in enumerate(standings):
+        group.append(user_id)
+        if position + 1 < len(standings) and standings[position + 1][1] == score:
+            continue
+        group = floater + group
+        floater = [group.pop()] if len(group) % 2 else []
+        half = len(group) // 2
+        players.extend(user_id for pair in zip(group[:half], group[half:]) for user_id in pair)
+        group = []
+    players.extend(floater)
+
+    paired = [False] * len(players)
+    pairs = []
+    for i, player in enumerate(players):
+        if paired[i]:
+            continue
+        paired[i] = True
+        candidates = (j for j in range(i + 1, len(players)) if not paired[j])
+        first = next(candidates)
+        opponent = first
+        # The intended opponent, else the nearest one not met before; a
+        # rematch only when nobody else is left
+        if (min(player, players[first]), max(player, players[first])) in played:
+            opponent = next(
+                (j for j in candidates if (min(player, players[j]), max(player, players[j])) not in played), first)
+        paired[opponent] = True
+        pairs.append((player, players[opponent]))
+    if bye is not None:
+        pairs.append((bye, None))
+    return pairs
+
+
+def _create_round(tournament, number, pairs):
+    now = timezone.now()
+    TournamentMatch.objects.bulk_create([
+        TournamentMatch(
+            tournament=tournament, round=number, table=table, player_a_id=a, player_b_id=b,
+            # A bye is decided (and counted) as it is created
+            winner_id=None if b else a, status='PENDING' if b else 'DONE', tallied=b is None,
+            reported_at=None if b else now,
+        )
+        for table, (a, b) in enumerate(pairs, 1)
+    ], batch_size=1000)
+    byes = [a for a, b in pairs if b is None]
+    if byes:
+        TournamentEntry.objects.filter(tournament=tournament, user_id__in=byes).update(
+            byes=F('byes') + 1, score=F('score') + 1)
+    TournamentRound.objects.create(
+        tournament=tournament, number=number, matches_total=len(pairs), matches_done=len(byes))
+    if len(byes) == len(pairs):
+        _schedule_advance(tournament.id, number)
+
+
+def _schedule_advance(tournament_id, number):
+    jobs.enqueue(ADVANCE, {'tournament': tournament_id, 'round': number},
+                 key=f'tournament:{tournament_id}:round:{number}')
+
+
+def start(tournament_id):
+    """Seed the entries and create round 1"""
+    with transaction.atomic():
+        # Locked before the entries are read: a join() waits, then finds registration closed
+        tournament = Tournament.objects.select_for_update().get(pk=tournament_id)
+        if tournament.status != 'REGISTRATION':
+            raise TournamentError('Tournament has already started')
+        seeds = seed_entries(tournament)
+        if len(seeds) < 2:
+            raise NotEnoughEntrants('At least two entrants are needed')
+        if tournament.format == 'SWISS':
+            tournament.swiss_rounds = tournament.swiss_rounds or max(1, math.ceil(math.log2(len(seeds))))
+            pairs = swiss_pairs(tournament)
+        else:
+            pairs = bracket_pairs(seeds)
+        tournament.started_at = timezone.now()
+        # Conditional on the status read above, so two starts can't both pair round 1
+        if not Tournament.objects.filter(pk=tournament.pk, status='REGISTRATION').update(
+                status='RUNNING', current_round=1, swiss_rounds=tournament.swiss_rounds,
+                started_at=tournament.started_at):
+            raise TournamentError('Tournament has already started')
+        _create_round(tournament, 1, pairs)
+    return len(pairs)
+
+
+def advance(tournament_id, number):
+    """Pair the round after `number` or finish the tournament; False when there's nothing to do"""
+    tournament = Tournament.objects.get(pk=tournament_id)
+    current = TournamentRound.objects.get(tournament=tournament, number=number)
+    if tournament.status != 'RUNNING' or tournament.current_round != number \
+            or current.matches_done < current.matches_total:
+        return False
+    now = timezone.now()
+    TournamentRound.objects.filter(pk=current.pk).update(completed_at=now)
+
+    winner = None
+    if tournament.format == 'SWISS':
+        if number >= tournament.swiss_rounds:
+            winner = TournamentEntry.objects.filter(tournament=tournament).order_by(
+                '-score', 'seed').values_list('user_id', flat=True).first()
+        else:
+            pairs = swiss_pairs(tournament)
+    else:
+        winners = list(TournamentMatch.objects.filter(tournament=tournament, round=number).order_by(
+            'table').values_list('winner_id', flat=True))
+        if len(winners) == 1:
+            winner = winners[0]
+        else:
+            pairs = list(zip(winners[::2], winners[1::2]))
+
+    if winner is not None:
+        Tournament.objects.filter(pk=tournament.pk, status='RUNNING').update(
+            status='COMPLETED', winner_id=winner, completed_at=now)
+        return True
+    # Conditional on the round read above: a concurrent advance rolls back
+    if not Tournament.objects.filter(pk=tournament.pk, status='RUNNING', current_round=number).update(
+            current_round=number + 1):
+        raise RuntimeError('tournament advanced concurrently')
+    _create_round(tournament, number + 1, pairs)
+    return True
+
+
+def join(tournament_id, user):
+    """
+    Enter `user`; returns (entry, created). The status and capacity checks
+    and the count are one conditional UPDATE of the tournament row, so
+    concurrent joins can't overfill it, and none lands once start() has
+    locked the row to seed it. Run through run_write.
+    """
+    entry = TournamentEntry.objects.filter(tournament_id=tournament_id, user=user).first()
+    if entry is not None:
+        return entry, False
+    try:
+        with transaction.atomic():
+            counted = Tournament.objects.filter(pk=tournament_id, status='REGISTRATION').filter(
+                Q(max_entrants__isnull=True) | Q(max_entrants=0) | Q(entrant_count__lt=F('max_entrants'))
+            ).update(entrant_count=F('entrant_count') + 1)
+            if not counted:
+                status = Tournament.objects.values_list('status', flat=True).get(pk=tournament_id)
+                raise TournamentError('Registration is closed' if status != 'REGISTRATION' else 'Tournament is full')
+            return TournamentEntry.objects.create(tournament_id=tournament_id, user=user), True
+    except IntegrityError:
+        # A concurrent join by the same user won; its count stands, this one rolled back
+        return TournamentEntry.objects.get(tournament_id=tournament_id, user=user), False
+
+
+def leave(tournament_id, user):
+    """Withdraw `user` before the start; the count drops in signals.py. Run through run_write."""
+    tournament = Tournament.objects.select_for_update().get(pk=tournament_id)
+    if tournament.status != 'REGISTRATION':
+        raise TournamentError('Tournament has already started')
+    TournamentEntry.objects.filter(tournament=tournament, user=user).delete()
+
+
+def cancel(tournament):
+    """Stop a tournament; results still in flight are tallied but nothing advances"""
+    return Tournament.objects.filter(pk=tournament.pk, status__in=['REGISTRATION', 'RUNNING']).update(
+        status='CANCELLED', completed_at=timezone.now()) == 1
+
+
+def report_results(tournament, results):
+    """
+    Decide matches of the current round: results are (match id, winner user
+    id) pairs. Returns (recorded match ids, [{'match', 'error'}]). A decided
+    match is reported as an error, never changed.
+    """
+    if tournament.status != 'RUNNING':
+        raise TournamentError('Tournament is not running')
+    matches = TournamentMatch.objects.filter(tournament=tournament).in_bulk([match_id for match_id, _ in results])
+    now = timezone.now()
+    recorded, errors = [], []
+    for match_id, winner_id in results:
+        match = matches.get(match_id)
+        if match is None:
+            errors.append({'match': match_id, 'error': 'No such match in this tournament'})
+        elif match.player_b_id is None or winner_id not in (match.player_a_id, match.player_b_id):
+            errors.append({'match': match_id, 'error': 'Winner must be one of the two players'})
+        elif not TournamentMatch.objects.filter(pk=match_id, status='PENDING').update(
+                status='DONE', winner_id=winner_id, reported_at=now):
+            errors.append({'match': match_id, 'error': 'Match already decided'})
+        else:
+            recorded.append(match_id)
+    jobs.enqueue_many(TALLY, [{'match': match_id} for match_id in recorded])
+    return recorded, errors
+
+
+def tally(match_ids):
+    """Fold decided matches into entry totals and round progress; returns how many were new"""
+    matches = list(TournamentMatch.objects.filter(id__in=match_ids, status='DONE', tallied=False).values_list(
+        'id', 'tournament_id', 'round', 'player_a_id', 'player_b_id', 'winner_id'))
+    if not matches:
+        return 0
+    # Conditional on the read above: a batch racing this one rolls back and retries
+    if TournamentMatch.objects.filter(id__in=[match[0] for match in matches], tallied=False).update(
+            tallied=True) != len(matches):
+        raise RuntimeError('tournament matches tallied concurrently')
+
+    winners, losers, progress = defaultdict(list), defaultdict(list), Counter()
+    for _, tournament_id, number, a, b, winner in matches:
+        winners[tournament_id].append(winner)
+        losers[tournament_id].append(b if winner == a else a)
+        progress[tournament_id, number] += 1
+    formats = dict(Tournament.objects.filter(id__in=winners).values_list('id', 'format'))
+    for tournament_id, users in winners.items():
+        TournamentEntry.objects.filter(tournament_id=tournament_id, user_id__in=users).update(
+            wins=F('wins') + 1, score=F('score') + 1)
+        knocked_out = formats[tournament_id] == 'SINGLE_ELIMINATION'
+        TournamentEntry.objects.filter(tournament_id=tournament_id, user_id__in=losers[tournament_id]).update(
+            losses=F('losses') + 1, **({'eliminated': True} if knocked_out else {}))
+
+    for (tournament_id, number), count in progress.items():
+        rounds = TournamentRound.objects.filter(tournament_id=tournament_id, number=number)
+        rounds.update(matches_done=F('matches_done') + count)
+        done, total = rounds.values_list('matches_done', 'matches_total').get()
+        if done >= total:
+            _schedule_advance(tournament_id, number)
+    return len(matches)
+
+
+def schedule_start(tournament):
+    """Queue the automatic start at starts_at; call after saving the tournament"""
+    if tournament.status != 'REGISTRATION' or tournament.starts_at is None:
+        return
+    delay = max(0.0, (tournament.starts_at - timezone.now()).total_seconds())
+    # A rescheduled tournament gets a new job; the old one finds starts_at moved
+    jobs.enqueue(START, {'tournament': tournament.id}, delay=delay,
+                 key=f'tournament:{tournament.id}:start:{tournament.starts_at.timestamp():.0f}')
+
+
+def current_match(tournament, user):
+    """The user's match in the current round, or None"""
+    return TournamentMatch.objects.filter(
+        Q(player_a=user) | Q(player_b=user), tournament=tournament, round=tournament.current_round,
+    ).select_related('player_a', 'player_b', 'winner').first()
+
+
+@jobs.task(START, batch_size=10)
+def start_job(batch):
+    for job in batch:
+        tournament = Tournament.objects.filter(pk=job.payload['tournament']).first()
+        if tournament is None or tournament.status != 'REGISTRATION' or tournament.starts_at is None \
+                or tournament.starts_at > timezone.now():
+            continue
+        try:
+            run_write(start, tournament.id)
+        except NotEnoughEntrants as exc:
+            logger.warning('Tournament %s did not start: %s', tournament.id, exc)
+            # Only a tournament still taking entries; one an admin started meanwhile keeps running
+            Tournament.objects.filter(pk=tournament.pk, status='REGISTRATION').update(
+                status='CANCELLED', completed_at=timezone.now())
+        except TournamentError as exc:
+            logger.info('Tournament %s did not start: %s', tournament.id, exc)
+
+
+@jobs.task(TALLY, batch_size=1000)
+def tally_job(batch):
+    run_write(tally, [job.payload['match'] for job in batch])
+
+
+@jobs.task(ADVANCE, batch_size=10)
+def advance_job(batch):
+    for job in batch:
+        run_write(advance, job.payload['tournament'], job.payload['round'])
@@ -1,18 +1,21 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, metrics, async_views, warmup
 
 # Public and authenticated user routes
 router = DefaultRouter()
 router.register(r'categories', views.CategoryViewSet, basename='category')
 router.register(r'questions', views.QuestionViewSet, basename='question')
 router.register(r'challenges', views.ChallengeViewSet, basename='challenge')
+router.register(r'tournaments', views.TournamentViewSet, basename='tournament')
 
 # Admin-only routes
 admin_router = DefaultRouter()
 admin_router.register(r'questions', views.AdminQuestionViewSet, basename='admin-question')
 admin_router.register(r'categories', views.AdminCategoryViewSet, basename='admin-category')
 admin_router.register(r'users', views.AdminUserViewSet, basename='admin-user')
+admin_router.register(r'tournaments', views.AdminTournamentViewSet, basename='admin-tournament')
 
 urlpatterns = [
     # Public and user routes
@@ -20,8 +23,20 @@ urlpatterns = [
     path('auth/register/', views.register_user, name='register'),
     path('user/profile/', views.user_profile, name='user-profile'),
     path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('metrics/', metrics.metrics_view, name='metrics'),
+    path('health/live/', warmup.live_view, name='health-live'),
+    path('health/ready/', warmup.ready_view, name='health-ready'),
     
-    # Admin-only routes
+    # Admin-only routes (provision ahead of the router's users/<pk>/)
+    path('admin/users/provision/', views.admin_provision_users, name='admin-users-provision'),
     path('admin/', include(admin_router.urls)),
     path('admin/dashboard/stats/', views.admin_dashboard_stats, name='admin-dashboard-stats'),
+    path('admin/profiles/', views.admin_profiles, name='admin-profiles'),
+    path('admin/profiles/toggle/', views.admin_profiling_toggle, name='admin-profiling-toggle'),
+    path('admin/profiles/token/', views.admin_profiling_token, name='admin-profiling-token'),
+    path('admin/profiles/<str:name>/', views.admin_profile_download, name='admin-profile-download'),
 ]
+
+# Native async handlers for the hot read endpoints take precedence when enabled
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_views.urlpatterns + urlpatterns
@@ -0,0 +1,179 @@
+"""
+Cheap version counters for conditional GET support.
+
+Each counter lives in the Django cache and is bumped from signal handlers
+(see signals.py) whenever the data behind it changes. Views derive their
+ETag / Last-Modified headers from the counter, so a client revalidating an
+unchanged resource gets a 304 without any ORM query or serializer work.
+
+Writes that bypass model signals (queryset.update(), bulk_create()) must call
+bump_version() themselves.
+
+The counters are only consistent across processes when the cache is shared
+and its incr() is atomic (Redis or memcached, settings.SHARED_CACHE_BACKENDS).
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.views.decorators.http import condition
+
+from .quiz_rounds import requested as issues_round
+
+CATALOG = 'catalog'
+LEADERBOARD = 'leaderboard'
+
+# Period leaderboards use a sliding window, so their representation changes
+# with time even when no score is written. Their ETag includes a time bucket.
+PERIOD_BUCKET_SECONDS = 60
+
+
+def _version_key(name):
+    return f'version:{name}'
+
+
+def _modified_key(name):
+    return f'version:{name}:modified'
+
+
+def get_version(name):
+    """Return (version, last_modified_timestamp) for a counter"""
+    keys = [_version_key(name), _modified_key(name)]
+    values = cache.get_many(keys)
+    version = values.get(keys[0])
+    modified = values.get(keys[1])
+    if version is None or modified is None:
+        # The counter was evicted (or never set). Seed it from the clock so a
+        # fresh counter can never collide with an ETag handed out earlier.
+        now = time.time()
+        cache.add(keys[0], time.time_ns(), timeout=None)
+        cache.add(keys[1], now, timeout=None)
+        values = cache.get_many(keys)
+        version = values.get(keys[0], time.time_ns())
+        modified = values.get(keys[1], now)
+    return version, modified
+
+
+def bump_version(name):
+    """Invalidate every ETag derived from the given counter"""
+    key = _version_key(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted: reseed from the clock, unless a concurrent bump just did
+        if not cache.add(key, time.time_ns(), timeout=None):
+            cache.incr(key)
+    cache.set(_modified_key(name), time.time(), timeout=None)
+
+
+def accepts_gzip(request):
+    """
+    True if Accept-Encoding allows gzip. q-values count: "gzip;q=0" refuses
+    it, and "*" stands in for a gzip that isn't listed.
+    """
+    qualities = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def settled(*names):
+    """
+    True once each counter's last bump is DATABASE_REPLICA_PIN_SECONDS old.
+    By then replicas have applied the write behind it (the lag bound the
+    per-user pin also assumes), so a body read from one matches the ETag.
+    """
+    now = time.time()
+    return all(now - get_version(name)[1] >= settings.DATABASE_REPLICA_PIN_SECONDS for name in names)
+
+
+def _etag(name, request, extra='', weak=False):
+    version, _ = get_version(name)
+    # The representation also depends on content negotiation (JSON vs the
+    # browsable API), so the Accept header is part of the tag.
+    accept = request.META.get('HTTP_ACCEPT', '')
+    raw = f'{name}:{version}:{request.get_full_path()}:{accept}:{extra}'
+    tag = '"%s"' % hashlib.sha1(raw.encode()).hexdigest()[:20]
+    return f'W/{tag}' if weak else tag
+
+
+def _last_modified(name):
+    _, modified = get_version(name)
+    return datetime.fromtimestamp(modified, tz=dt_timezone.utc)
+
+
+def catalog_etag(request, *args, **kwargs):
+    # Draws issuing a quiz round token are single use; never revalidate them
+    if issues_round(request):
+        return None
+    return _etag(CATALOG, request)
+
+
+def catalog_questions_etag(request, *args, **kwargs):
+    """
+    A category's question set may go out as the gzipped snapshot or as plain
+    JSON, so the tag names the coding the client accepts. It is weak because a
+    gzip-capable client still gets plain JSON while a snapshot is rebuilt.
+    """
+    if issues_round(request):
+        return None
+    coding = 'gzip' if accepts_gzip(request) else 'identity'
+    return _etag(CATALOG, request, coding, weak=True)
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    if issues_round(request):
+        return None
+    return _last_modified(CATALOG)
+
+
+def _leaderboard_bucket(period):
+    if period in ('daily', 'weekly'):
+        return str(int(time.time()) // PERIOD_BUCKET_SECONDS)
+    return ''
+
+
+def leaderboard_state(period):
+    """Changes whenever the board for `period` may have changed"""
+    version, _ = get_version(LEADERBOARD)
+    return f'{version}:{_leaderboard_bucket(period)}'
+
+
+def leaderboard_etag(request, *args, **kwargs):
+    return _etag(LEADERBOARD, request, _leaderboard_bucket(request.GET.get('period', 'overall')))
+
+
+def leaderboard_last_modified(request, *args, **kwargs):
+    # Sliding-window boards have no meaningful Last-Modified; rely on the ETag.
+    if _leaderboard_bucket(request.GET.get('period', 'overall')):
+        return None
+    return _last_modified(LEADERBOARD)
+
+
+def catalog_condition():
+    """Conditional GET decorator for category and question reads"""
+    return condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+
+
+def catalog_questions_condition():
+    """Conditional GET decorator for a category's question set (snapshot-aware)"""
+    return condition(etag_func=catalog_questions_etag, last_modified_func=catalog_last_modified)
+
+
+def leaderboard_condition():
+    """Conditional GET decorator for the leaderboard"""
+    return condition(etag_func=leaderboard_etag, last_modified_func=leaderboard_last_modified)
@@ -1,44 +1,81 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, Q, F
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404
 from django.utils import timezone
-from datetime import timedelta
-from .models import Category, Question, UserProfile, Score, Challenge
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from datetime import datetime, timedelta, timezone as dt_timezone
+from .models import (
+    Category, Question, UserProfile, Score, Challenge, ChallengeInboxEntry,
+    Tournament, TournamentEntry, TournamentMatch,
+)
 from .serializers import (
     CategorySerializer, QuestionSerializer, QuestionDetailSerializer,
     UserSerializer, UserProfileSerializer, RegisterSerializer,
-    ScoreSerializer, ChallengeSerializer, AnswerSubmissionSerializer,
-    AdminQuestionSerializer, AdminUserSerializer, AdminCategorySerializer
+    ScoreSerializer, ChallengeSerializer, ChallengeInboxSerializer, AnswerSubmissionSerializer,
+    AdminQuestionSerializer, AdminUserSerializer, AdminCategorySerializer,
+    TournamentSerializer, AdminTournamentSerializer, TournamentEntrySerializer,
+    TournamentRoundSerializer, TournamentMatchSerializer, TournamentResultSerializer
 )
 from .permissions import IsAdminRole, IsAdminOrReadOnly, IsUserRole
+from .versioning import (
+    CATALOG, LEADERBOARD, accepts_gzip, catalog_condition, catalog_questions_condition, leaderboard_condition,
+    leaderboard_state,
+)
+from .snapshots import snapshot_response
+from .db_router import replica_reads
+from .sqlite import run_write
+from . import answers, dedup, passwords, profiling, provisioning, quiz_rounds, search, tournaments
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
-    queryset = Category.objects.all()
+    queryset = Category.objects.annotate(question_count=Count('questions'))
     serializer_class = CategorySerializer
     lookup_field = 'slug'
     permission_classes = [IsAdminOrReadOnly]
     
+    @method_decorator([catalog_condition(), replica_reads(versions=[CATALOG])])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @method_decorator([catalog_condition(), replica_reads(versions=[CATALOG])])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
     @action(detail=True, methods=['get'])
+    @method_decorator([catalog_questions_condition(), replica_reads(versions=[CATALOG])])
     def questions(self, request, slug=None):
+        difficulty = request.query_params.get('difficulty')
+        question_type = request.query_params.get('type')
+        limit = request.query_params.get('limit')
+        issue_round = quiz_rounds.requested(request) and request.user.is_authenticated
+        
+        # Serve the prebuilt snapshot when one covers this request
+        if not limit and not issue_round and request.accepted_renderer.format == 'json' \
+                and accepts_gzip(request):
+            response = snapshot_response(slug, difficulty, question_type)
+            if response is not None:
+                return response
+        
         category = self.get_object()
         questions = category.questions.all()
         
         # Filter by difficulty if provided
-        difficulty = request.query_params.get('difficulty')
         if difficulty:
             questions = questions.filter(difficulty=difficulty.upper())
         
         # Filter by question type
-        question_type = request.query_params.get('type')
         if question_type:
             questions = questions.filter(question_type=question_type.upper())
         
         # Limit results
-        limit = request.query_params.get('limit')
         if limit:
             try:
                 questions = questions[:int(limit)]
@@ -46,11 +83,16 @@ class CategoryViewSet(viewsets.ModelViewSet):
                 pass
         
         serializer = QuestionDetailSerializer(questions, many=True)
-        return Response(serializer.data)
+        response = Response(serializer.data)
+        # Same URL as the gzipped snapshot
+        patch_vary_headers(response, ['Accept-Encoding'])
+        if issue_round:
+            quiz_rounds.attach(response, request.user, [row['id'] for row in serializer.data])
+        return response
 
 
 class QuestionViewSet(viewsets.ModelViewSet):
-    queryset = Question.objects.all()
+    queryset = Question.objects.select_related('category')
     serializer_class = QuestionSerializer
     permission_classes = [IsAdminOrReadOnly]
     
@@ -59,6 +101,42 @@ class QuestionViewSet(viewsets.ModelViewSet):
             return QuestionDetailSerializer
         return QuestionSerializer
     
+    @method_decorator([catalog_condition(), replica_reads(versions=[CATALOG])])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @method_decorator([catalog_condition(), replica_reads(versions=[CATALOG])])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=False, methods=['get'])
+    @method_decorator(replica_reads)
+    def search(self, request):
+        """
+        Full-text search over title, text, options and explanation, best match
+        first: ?q=&category=<slug>&limit=&offset=
+        """
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        category_id = None
+        slug = request.query_params.get('category')
+        if slug:
+            category_id = Category.objects.filter(slug=slug).values_list('id', flat=True).first()
+            if category_id is None:
+                return Response({'results': [], 'next_offset': None})
+        
+        questions = search.search(text, limit, offset, category_id)
+        return Response({
+            'results': QuestionSerializer(questions, many=True).data,
+            'next_offset': search.next_offset(offset, limit, len(questions)),
+        })
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def submit(self, request, pk=None):
         # Only users (not admins) can submit answers
@@ -75,7 +153,18 @@ class QuestionViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         data = serializer.validated_data
+        # Answers are timed by the server from the quiz round token; without
+        # one the client's figure is recorded but earns no speed bonus
+        timed = False
         time_taken = data.get('time_taken', 0)
+        if data.get('round'):
+            try:
+                time_taken = quiz_rounds.verify(data['round'], request.user.id, question.id)
+            except quiz_rounds.RoundError as exc:
+                return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            timed = True
+        elif settings.QUIZ_ROUND_REQUIRED:
+            return Response({'error': 'A quiz round token is required'}, status=status.HTTP_400_BAD_REQUEST)
         is_correct = False
         points_awarded = 0
         
@@ -88,9 +177,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
                 is_correct = False
         
         elif question.question_type == 'QUICK':
-            submitted_answer = data.get('answer', '').strip().lower()
-            correct_answer = (question.correct_answer or '').strip().lower()
-            is_correct = submitted_answer == correct_answer
+            is_correct = answers.is_correct(question, data.get('answer', ''))
         
         elif question.question_type == 'CODING':
             # Simple pattern matching for coding questions
@@ -105,48 +192,66 @@ class QuestionViewSet(viewsets.ModelViewSet):
         if is_correct:
             points_awarded = question.points
             # Bonus points for speed (if answered in under 30 seconds)
-            if time_taken < 30:
+            if timed and time_taken < 30:
                 points_awarded = int(points_awarded * 1.2)
         
-        # Save score
-        score = Score.objects.create(
-            user=request.user,
-            question=question,
+        # Save score and update profile points (through the single writer on SQLite)
+        total_points = run_write(
+            _record_submission,
+            user_id=request.user.id,
+            question_id=question.id,
             points_awarded=points_awarded,
             time_taken=time_taken,
             is_correct=is_correct,
             submitted_answer=data.get('answer') or data.get('code', '')[:500]
         )
         
-        # Update user profile points
-        profile = request.user.profile
-        profile.total_points += points_awarded
-        profile.save()
-        
         return Response({
             'correct': is_correct,
             'points_awarded': points_awarded,
             'time_taken': time_taken,
-            'total_points': profile.total_points,
+            'total_points': total_points,
             'explanation': question.explanation if is_correct else None
         })
 
 
+def _record_submission(user_id, question_id, points_awarded, time_taken, is_correct, submitted_answer):
+    """Persist a graded answer and return the user's new point total"""
+    Score.objects.create(
+        user_id=user_id,
+        question_id=question_id,
+        points_awarded=points_awarded,
+        time_taken=time_taken,
+        is_correct=is_correct,
+        submitted_answer=submitted_answer
+    )
+    # Atomic increment: concurrent submits by the same user can't lose points
+    UserProfile.objects.filter(user_id=user_id).update(
+        total_points=F('total_points') + points_awarded,
+        updated_at=timezone.now()
+    )
+    return UserProfile.objects.filter(user_id=user_id).values_list('total_points', flat=True).get()
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
     serializer = RegisterSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.save()
-        return Response({
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'message': 'User registered successfully'
-        }, status=status.HTTP_201_CREATED)
+        return Response(registration_data(user), status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def registration_data(user):
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'message': 'User registered successfully'
+    }
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def user_profile(request):
@@ -155,9 +260,23 @@ def user_profile(request):
 
 
 @api_view(['GET'])
+@leaderboard_condition()
+@replica_reads(versions=[LEADERBOARD])
 def leaderboard(request):
     period = request.query_params.get('period', 'overall')
+    state, leaderboard_data = cached_leaderboard(period)
+    if leaderboard_data is None:
+        leaderboard_data = [leaderboard_entry(p) for p in leaderboard_queryset(period)]
+        store_leaderboard(period, state, leaderboard_data)
     
+    return Response({
+        'period': period,
+        'leaderboard': leaderboard_data
+    })
+
+
+def leaderboard_queryset(period, limit=50):
+    """Top `limit` user profiles for the period, annotated with `period_points`"""
     # Calculate date filter based on period
     if period == 'daily':
         start_date = timezone.now() - timedelta(days=1)
@@ -167,46 +286,60 @@ def leaderboard(request):
         start_date = None
     
     # Get user profiles with points, excluding admins
-    profiles = UserProfile.objects.select_related('user').filter(role='user').all()
+    profiles = UserProfile.objects.select_related('user').filter(role='user')
     
     if start_date:
-        # Calculate points for the period
-        users_with_points = []
-        for profile in profiles:
-            period_points = Score.objects.filter(
-                user=profile.user,
-                created_at__gte=start_date
-            ).aggregate(total=Sum('points_awarded'))['total'] or 0
-            
-            users_with_points.append({
-                'id': profile.user.id,
-                'username': profile.user.username,
-                'avatar_url': profile.avatar_url,
-                'total_points': period_points,
-                'badges': profile.badges
-            })
-        
-        # Sort by period points
-        users_with_points.sort(key=lambda x: x['total_points'], reverse=True)
-        leaderboard_data = users_with_points[:50]
+        # Sum the period's scores in the same query instead of once per profile
+        profiles = profiles.annotate(period_points=Coalesce(
+            Sum('user__scores__points_awarded', filter=Q(user__scores__created_at__gte=start_date)),
+            0
+        ))
     else:
-        # Overall leaderboard
-        profiles = profiles.order_by('-total_points')[:50]
-        leaderboard_data = [
-            {
-                'id': p.user.id,
-                'username': p.user.username,
-                'avatar_url': p.avatar_url,
-                'total_points': p.total_points,
-                'badges': p.badges
-            }
-            for p in profiles
-        ]
+        profiles = profiles.annotate(period_points=F('total_points'))
     
-    return Response({
-        'period': period,
-        'leaderboard': leaderboard_data
-    })
+    profiles = profiles.order_by('-period_points', 'id')
+    return profiles[:limit] if limit else profiles
+
+
+def leaderboard_entry(profile):
+    return {
+        'id': profile.user.id,
+        'username': profile.user.username,
+        'avatar_url': profile.avatar_url,
+        'total_points': profile.period_points,
+        'badges': profile.badges
+    }
+
+
+# Per-process copy of each period's board as tuples, keyed by
+# leaderboard_state(). warmup.py fills it in the gunicorn master, so the
+# workers start with it (shared copy-on-write until the board changes).
+LEADERBOARD_PERIODS = ('overall', 'weekly', 'daily')
+_ENTRY_FIELDS = ('id', 'username', 'avatar_url', 'total_points', 'badges')
+_boards = {}
+
+
+def cached_leaderboard(period):
+    """(state, entries or None); pass the state to store_leaderboard() after a miss"""
+    state = leaderboard_state(period)
+    board = _boards.get(period)
+    if board is None or board[0] != state:
+        return state, None
+    return state, [dict(zip(_ENTRY_FIELDS, row)) for row in board[1]]
+
+
+def store_leaderboard(period, state, entries):
+    # The state was read before the rows, so a write racing the load only
+    # makes the next request reload
+    if period in LEADERBOARD_PERIODS:
+        _boards[period] = (state, tuple(tuple(entry[field] for field in _ENTRY_FIELDS) for entry in entries))
+
+
+class InboxPagination(CursorPagination):
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
 
 
 class ChallengeViewSet(viewsets.ModelViewSet):
@@ -222,7 +355,7 @@ class ChallengeViewSet(viewsets.ModelViewSet):
         
         return Challenge.objects.filter(
             Q(challenger=user) | Q(opponent=user)
-        )
+        ).select_related('challenger', 'opponent', 'category', 'winner')
     
     def perform_create(self, serializer):
         # Prevent admins from creating challenges
@@ -238,6 +371,145 @@ class ChallengeViewSet(viewsets.ModelViewSet):
         challenge = self.get_object()
         serializer = self.get_serializer(challenge)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def inbox(self, request):
+        """
+        The user's challenges from the denormalized inbox, newest first,
+        optionally for one ?status=. Keyset-paged through ?cursor=; the first
+        page also carries per-status counts. Live updates: ws/challenges/.
+        """
+        entries = ChallengeInboxEntry.objects.filter(user=request.user)
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            status_filter = status_filter.upper()
+            if status_filter not in dict(Challenge.STATUS_CHOICES):
+                return Response({'error': 'Unknown status'}, status=status.HTTP_400_BAD_REQUEST)
+            entries = entries.filter(status=status_filter)
+        
+        paginator = InboxPagination()
+        page = paginator.paginate_queryset(entries, request, view=self)
+        response = paginator.get_paginated_response(ChallengeInboxSerializer(page, many=True).data)
+        if not request.query_params.get(paginator.cursor_query_param):
+            counts = ChallengeInboxEntry.objects.filter(user=request.user).values('status').annotate(n=Count('id'))
+            response.data['counts'] = {row['status']: row['n'] for row in counts}
+        return response
+
+
+class TournamentViewSet(viewsets.ReadOnlyModelViewSet):
+    """Tournaments with their standings, rounds and matches; players join and leave here"""
+    serializer_class = TournamentSerializer
+    
+    def get_queryset(self):
+        return Tournament.objects.select_related('category', 'winner')
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsUserRole])
+    def join(self, request, pk=None):
+        tournament = self.get_object()
+        try:
+            entry, created = run_write(tournaments.join, tournament.id, request.user)
+        except tournaments.TournamentError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            TournamentEntrySerializer(entry).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @action(detail=True, methods=['post'], permission_classes=[IsUserRole])
+    def leave(self, request, pk=None):
+        tournament = self.get_object()
+        try:
+            run_write(tournaments.leave, tournament.id, request.user)
+        except tournaments.TournamentError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    @action(detail=True, methods=['get'])
+    @method_decorator(replica_reads)
+    def standings(self, request, pk=None):
+        """Entries by score, then seed (by sign-up before the start)"""
+        tournament = self.get_object()
+        entries = TournamentEntry.objects.filter(tournament=tournament).select_related('user').order_by(
+            '-score', 'seed', 'id')
+        page = self.paginate_queryset(entries)
+        return self.get_paginated_response(TournamentEntrySerializer(page, many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    def rounds(self, request, pk=None):
+        tournament = self.get_object()
+        return Response(TournamentRoundSerializer(tournament.rounds.all(), many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    @method_decorator(replica_reads)
+    def matches(self, request, pk=None):
+        """Matches of ?round= (default: the current round) in table order"""
+        tournament = self.get_object()
+        try:
+            number = int(request.query_params.get('round', tournament.current_round))
+        except ValueError:
+            return Response({'error': 'round must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        matches = TournamentMatch.objects.filter(tournament=tournament, round=number).select_related(
+            'player_a', 'player_b').order_by('table')
+        page = self.paginate_queryset(matches)
+        return self.get_paginated_response(TournamentMatchSerializer(page, many=True).data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def my_match(self, request, pk=None):
+        """The requesting player's match in the current round, with its battle room"""
+        match = tournaments.current_match(self.get_object(), request.user)
+        if match is None:
+            return Response({'error': 'No match in the current round'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(TournamentMatchSerializer(match).data)
+
+
+class AdminTournamentViewSet(viewsets.ModelViewSet):
+    """Admin-only tournament management: create, start, report results, cancel"""
+    serializer_class = AdminTournamentSerializer
+    permission_classes = [IsAdminRole]
+    
+    def get_queryset(self):
+        return Tournament.objects.select_related('category', 'winner')
+    
+    @action(detail=True, methods=['post'])
+    def start(self, request, pk=None):
+        """Seed the entrants and pair round 1 now, without waiting for starts_at"""
+        tournament = self.get_object()
+        try:
+            run_write(tournaments.start, tournament.id)
+        except tournaments.TournamentError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(self.get_object()).data)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        tournament = self.get_object()
+        if not tournaments.cancel(tournament):
+            return Response({'error': 'Tournament has already finished'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(self.get_object()).data)
+    
+    @action(detail=True, methods=['post'])
+    def report(self, request, pk=None):
+        """
+        Decide matches: {"results": [{"match": id, "winner": user id}, ...]}.
+        Results are tallied by the job workers; the round advances once its
+        last match is counted.
+        """
+        tournament = self.get_object()
+        results = TournamentResultSerializer(data=request.data.get('results'), many=True)
+        results.is_valid(raise_exception=True)
+        if len(results.validated_data) > settings.TOURNAMENT_REPORT_MAX_RESULTS:
+            return Response(
+                {'error': f'At most {settings.TOURNAMENT_REPORT_MAX_RESULTS} results per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            recorded, errors = run_write(
+                tournaments.report_results, tournament,
+                [(result['match'], result['winner']) for result in results.validated_data]
+            )
+        except tournaments.TournamentError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'recorded': len(recorded), 'errors': errors})
 
 
 # Admin-only ViewSets for CRUD operations
@@ -248,7 +520,52 @@ class AdminQuestionViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminRole]
     pagination_class = None  # Disable pagination for admin
     
+    def create(self, request, *args, **kwargs):
+        """Create a question, refusing near-duplicates of existing ones unless ?force=1"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if request.query_params.get('force') not in ('1', 'true'):
+            matches = dedup.find_similar(
+                serializer.validated_data['question_text'], serializer.validated_data.get('options'))
+            if matches:
+                found = Question.objects.in_bulk([question_id for question_id, _ in matches])
+                return Response({
+                    'error': 'Near-duplicate of existing questions; resend with ?force=1 to create anyway',
+                    'duplicates': [
+                        {'id': question_id, 'title': found[question_id].title, 'similarity': round(score, 3)}
+                        for question_id, score in matches if question_id in found
+                    ],
+                }, status=status.HTTP_400_BAD_REQUEST)
+        self.perform_create(serializer)
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+    
+    @action(detail=False, methods=['get'])
+    def duplicates(self, request):
+        """
+        Clusters of near-duplicate questions already in the bank. Read-only:
+        questions saved without signals (bulk loads) are counted as
+        `unsigned` and left out until duplicates/index/ has signed them.
+        """
+        try:
+            threshold = float(request.query_params.get('threshold', settings.DEDUP_THRESHOLD))
+        except ValueError:
+            return Response({'error': 'threshold must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'threshold': threshold,
+            'unsigned': dedup.unsigned_count(),
+            'clusters': dedup.report(threshold),
+        })
+    
+    @action(detail=False, methods=['post'], url_path='duplicates/index')
+    def index_duplicates(self, request):
+        """Queue signing of the unsigned questions for the job workers"""
+        job = run_write(dedup.schedule_index)
+        return Response({'queued': job is not None, 'unsigned': dedup.unsigned_count()},
+                        status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=False, methods=['get'])
+    @method_decorator(replica_reads)
     def stats(self, request):
         """Get question statistics"""
         total = Question.objects.count()
@@ -266,12 +583,13 @@ class AdminQuestionViewSet(viewsets.ModelViewSet):
 
 class AdminCategoryViewSet(viewsets.ModelViewSet):
     """Admin-only viewset for full CRUD on categories"""
-    queryset = Category.objects.all()
+    queryset = Category.objects.annotate(question_count=Count('questions'))
     serializer_class = AdminCategorySerializer
     permission_classes = [IsAdminRole]
     pagination_class = None  # Disable pagination for admin
     
     @action(detail=False, methods=['get'])
+    @method_decorator(replica_reads)
     def stats(self, request):
         """Get category statistics"""
         categories_with_counts = Category.objects.annotate(
@@ -300,6 +618,7 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         return User.objects.all()
     
     @action(detail=False, methods=['get'])
+    @method_decorator(replica_reads)
     def stats(self, request):
         """Get user statistics"""
         total_users = User.objects.count()
@@ -355,8 +674,46 @@ class AdminUserViewSet(viewsets.ModelViewSet):
         })
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminRole])
+def admin_provision_users(request):
+    """
+    Create users from a roster: a multipart `roster` file, a text/csv or
+    application/x-ndjson body, or JSON {"users": [...]}. Re-posting the same
+    roster creates nothing. Generated passwords are only returned here.
+    """
+    content_type = request.content_type.split(';')[0].strip()
+    try:
+        if content_type == 'multipart/form-data' and 'roster' in request.FILES:
+            upload = request.FILES['roster']
+            fmt = 'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else None
+            rows = provisioning.parse_roster(upload.read().decode('utf-8-sig'), fmt)
+        elif content_type == 'application/json':
+            rows = request.data.get('users') if isinstance(request.data, dict) else None
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                return Response({'error': 'users must be a list of objects'}, status=status.HTTP_400_BAD_REQUEST)
+        elif content_type in ('text/csv', 'application/x-ndjson', 'application/jsonl'):
+            fmt = 'csv' if content_type == 'text/csv' else 'jsonl'
+            rows = provisioning.parse_roster(request.body.decode('utf-8-sig'), fmt)
+        else:
+            return Response({'error': 'Send a roster file, CSV, JSONL or JSON'}, status=status.HTTP_400_BAD_REQUEST)
+    except (provisioning.RosterError, UnicodeDecodeError) as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    if len(rows) > settings.PROVISION_MAX_ROWS:
+        return Response(
+            {'error': f'At most {settings.PROVISION_MAX_ROWS} users per request; use manage.py provision_users'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    # One chunk and the shared hash pool: a 503 from the pool (HashPoolBusy)
+    # comes before any insert, so no generated password is lost
+    result = provisioning.provision(
+        rows, chunk_size=settings.PROVISION_MAX_ROWS, make_passwords=passwords.make_passwords)
+    return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
+
 @api_view(['GET'])
 @permission_classes([IsAdminRole])
+@replica_reads
 def admin_dashboard_stats(request):
     """Get overall platform statistics for admin dashboard"""
     total_users = User.objects.count()
@@ -383,3 +740,75 @@ def admin_dashboard_stats(request):
         'top_performers': [{'username': p.user.username, 'points': p.total_points} for p in top_users],
     })
 
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def admin_profiles(request):
+    """List captured request profiles and the current profiling toggle"""
+    return Response({
+        'toggle': profiling.get_toggle(),
+        'profiles': [
+            {
+                'name': p.name,
+                'format': 'pstats' if p.suffix == '.prof' else 'collapsed',
+                'size': stat.st_size,
+                'created_at': datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc),
+            }
+            for p, stat in profiling.profile_stats()
+        ],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminRole])
+def admin_profile_download(request, name):
+    """Download one profile file"""
+    # Only serve names that are actually listed, never arbitrary paths
+    match = next((p for p in profiling.list_profiles() if p.name == name), None)
+    if match is None:
+        raise Http404
+    try:
+        blob = open(match, 'rb')
+    except FileNotFoundError:
+        # Pruned since the listing
+        raise Http404
+    return FileResponse(blob, as_attachment=True, filename=match.name)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminRole])
+def admin_profiling_toggle(request):
+    """Enable or disable sampled profiling for some views"""
+    enabled = bool(request.data.get('enabled'))
+    mode = request.data.get('mode', 'cprofile')
+    views = request.data.get('views') or []
+    try:
+        sample_rate = float(request.data.get('sample_rate', 1.0))
+        minutes = float(request.data.get('minutes', 10))
+    except (TypeError, ValueError):
+        return Response({'error': 'sample_rate and minutes must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if mode not in profiling.MODES:
+        return Response({'error': f'Invalid mode. Must be one of {list(profiling.MODES)}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(views, list) or not 0 < sample_rate <= 1 or not 0 < minutes <= 24 * 60:
+        return Response(
+            {'error': 'views must be a list, sample_rate in (0, 1], minutes in (0, 1440]'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    toggle = profiling.set_toggle(enabled, views=views, sample_rate=sample_rate, mode=mode, minutes=minutes)
+    return Response({'toggle': toggle})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminRole])
+def admin_profiling_token(request):
+    """Mint a signed X-Profile-Token header value for profiling individual requests"""
+    mode = request.data.get('mode', 'cprofile')
+    if mode not in profiling.MODES:
+        return Response({'error': f'Invalid mode. Must be one of {list(profiling.MODES)}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'header': 'X-Profile-Token',
+        'token': profiling.make_token(mode),
+        'expires_in': settings.PROFILING_TOKEN_MAX_AGE,
+    })
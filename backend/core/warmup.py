@@ -0,0 +1,151 @@
+"""
+Warm start before the gunicorn workers fork.
+
+A freshly forked worker would otherwise pay for its first requests itself:
+URL resolution imports every view module, the catalog snapshot manifest is
+parsed on first read, each QUICK question's answer matcher is compiled on
+first submit, and the leaderboard is queried on first view. After a deploy
+that happens in every worker at once, which shows up as a latency spike.
+
+warm() does that work once, in the master (gunicorn.conf.py, with
+preload_app). Then it closes the database connections, which must not be
+shared with the children, and moves everything it built into the permanent
+GC generation (gc.freeze). The cyclic collector then never touches those
+objects, so the workers keep sharing their pages copy-on-write instead of
+dirtying them on the first collection.
+
+What is loaded, in a compact form:
+
+- catalog: the snapshot manifest (snapshots.py), and one read of every
+  snapshot file so they are in the page cache;
+- answer keys: compiled matchers (answers.py) for up to the matcher cache's
+  size of QUICK questions, most recent first;
+- leaderboard: each period's board as tuples (views.cached_leaderboard).
+
+All of it is still checked against the version counters on use, so a
+catalog edit or a new score during or after warm-up is never served stale.
+
+Readiness (GET /api/health/ready/) is 503 until warm() has finished. Under
+a server that never calls it (runserver, a single uvicorn), the first probe
+starts it on a background thread. With WARM_START off there is no warm-up
+and the process is ready at once. Liveness (GET /api/health/live/) is
+always 200.
+"""
+import gc
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.urls import get_resolver
+
+from . import answers, snapshots, views
+from .models import Question
+from .versioning import CATALOG, get_version
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+state = {'ready': False, 'running': False, 'finished_at': None, 'steps': {}}
+
+
+def warm_urls():
+    # Imports every view module and builds the reverse lookup tables
+    resolver = get_resolver()
+    resolver.reverse_dict
+    return {'url_patterns': len(resolver.url_patterns)}
+
+
+def warm_catalog():
+    manifest = snapshots._read_manifest()
+    if manifest is None or manifest['catalog_version'] != get_version(CATALOG)[0]:
+        # Stale or missing: requests fall back to the ORM until the rebuild
+        return {'snapshot_files': 0}
+    files = 0
+    for path in (snapshots.snapshot_root() / manifest['build']).rglob('*'):
+        if path.is_file():
+            with open(path, 'rb') as blob:
+                while blob.read(1 << 20):
+                    pass
+            files += 1
+    return {'snapshot_files': files}
+
+
+def warm_answer_keys():
+    limit = answers._compile.cache_info().maxsize
+    questions = Question.objects.filter(question_type='QUICK').only(
+        'id', 'correct_answer', 'answer_aliases').order_by('-id')[:limit]
+    count = 0
+    for question in questions.iterator(chunk_size=1000):
+        answers.matcher_for(question)
+        count += 1
+    return {'answer_keys': count}
+
+
+def warm_leaderboard():
+    entries = 0
+    for period in views.LEADERBOARD_PERIODS:
+        board_state = views.leaderboard_state(period)
+        rows = [views.leaderboard_entry(profile) for profile in views.leaderboard_queryset(period)]
+        views.store_leaderboard(period, board_state, rows)
+        entries += len(rows)
+    return {'leaderboard_entries': entries}
+
+
+STEPS = (
+    ('urls', warm_urls),
+    ('catalog', warm_catalog),
+    ('answer_keys', warm_answer_keys),
+    ('leaderboard', warm_leaderboard),
+)
+
+
+def warm():
+    """Run every warm-up step; a failing step is logged and skipped, not fatal"""
+    with _lock:
+        if state['ready'] or state['running']:
+            return state
+        state['running'] = True
+    started = time.perf_counter()
+    steps = {}
+    try:
+        for name, step in STEPS:
+            step_started = time.perf_counter()
+            try:
+                steps[name] = dict(step(), seconds=round(time.perf_counter() - step_started, 3))
+            except Exception as exc:
+                logger.exception('Warm-up step %s failed', name)
+                steps[name] = {'error': str(exc)}
+    finally:
+        # Forked children must open their own connections
+        connections.close_all()
+        gc.collect()
+        gc.freeze()
+        state.update(
+            steps=steps, running=False, ready=True, finished_at=time.time(),
+            seconds=round(time.perf_counter() - started, 3),
+        )
+    logger.info('Warm start finished in %.2fs: %s', state['seconds'], steps)
+    return state
+
+
+def ensure_warming():
+    """Start warm() on a background thread if nothing has run it yet"""
+    if state['ready'] or state['running'] or not settings.WARM_START:
+        return
+    threading.Thread(target=warm, name='warmup', daemon=True).start()
+
+
+def live_view(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def ready_view(request):
+    if not settings.WARM_START:
+        return JsonResponse({'status': 'ready', 'warm_start': False})
+    ensure_warming()
+    if not state['ready']:
+        return JsonResponse({'status': 'warming'}, status=503)
+    return JsonResponse({'status': 'ready', 'seconds': state['seconds'], 'steps': state['steps']})
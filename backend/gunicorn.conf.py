@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for the ASGI app (see the Dockerfile).
+
+The app is imported once in the master (preload_app) and warmed up there
+before any worker is forked, so every worker starts with the catalog,
+answer keys and leaderboard already loaded, sharing those pages with the
+master copy-on-write. See core/warmup.py.
+
+More than one worker needs the shared cache (settings.SHARED_CACHE_BACKENDS)
+and a shared channel layer (CHANNEL_REDIS_URL); the master refuses to start
+otherwise.
+"""
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', '4'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+
+
+def require_shared_backends(settings, count):
+    # Per-process version counters would leave workers serving stale catalogs
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in settings.SHARED_CACHE_BACKENDS:
+        raise RuntimeError(
+            f'{count} workers need a shared cache with atomic counters, not {backend}: set '
+            'CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and CACHE_LOCATION, '
+            'or GUNICORN_WORKERS=1'
+        )
+    # Websocket clients on different workers could never see each other
+    layer = settings.CHANNEL_LAYERS['default']['BACKEND']
+    if layer == 'channels.layers.InMemoryChannelLayer':
+        raise RuntimeError(
+            f'{count} workers need a shared channel layer, not {layer}: set CHANNEL_REDIS_URL, '
+            'or GUNICORN_WORKERS=1'
+        )
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before the first fork
+    from django.conf import settings
+
+    if server.num_workers > 1:
+        require_shared_backends(settings, server.num_workers)
+    if settings.WARM_START:
+        from core import warmup
+        result = warmup.warm()
+        server.log.info('Warm start done in %.2fs: %s', result['seconds'], result['steps'])
@@ -88,6 +88,12 @@ export const categoryAPI = {
     const response = await api.get(`/categories/${slug}/questions/`, { params });
     return response.data;
   },
+
+  // Draws a quiz round; the token lets the server time each answer
+  drawRound: async (slug, params = {}) => {
+    const response = await api.get(`/categories/${slug}/questions/`, { params: { ...params, round: 1 } });
+    return { questions: response.data, round: response.headers['x-quiz-round'] || null };
+  },
 };
 
 export const questionAPI = {
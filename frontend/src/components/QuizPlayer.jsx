@@ -10,6 +10,7 @@ function QuizPlayer() {
   const navigate = useNavigate();
   const { user, updateUser } = useAuth();
   const [questions, setQuestions] = useState([]);
+  const [round, setRound] = useState(null);
   const [currentIndex, setCurrentIndex] = useState(0);
   const [selectedAnswer, setSelectedAnswer] = useState(null);
   const [codeAnswer, setCodeAnswer] = useState('');
@@ -42,8 +43,9 @@ function QuizPlayer() {
 
   const fetchQuestions = async () => {
     try {
-      const data = await categoryAPI.getQuestions(slug, { limit: 10 });
-      setQuestions(data);
+      const data = await categoryAPI.drawRound(slug, { limit: 10 });
+      setQuestions(data.questions);
+      setRound(data.round);
       setLoading(false);
     } catch (error) {
       console.error('Failed to fetch questions:', error);
@@ -105,6 +107,9 @@ function QuizPlayer() {
 
     try {
       let payload = { time_taken: timer };
+      if (round) {
+        payload.round = round;
+      }
 
       if (question.question_type === 'MCQ') {
         payload.answer = selectedAnswer;